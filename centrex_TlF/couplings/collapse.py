@@ -3,6 +3,7 @@ import copy
 import numpy as np
 from centrex_TlF.couplings.branching import calculate_BR
 from centrex_TlF.couplings.utils_compact import compact_C_array, compact_C_array_indices
+from centrex_TlF.states.basis import as_basis
 from centrex_TlF.states.utils import QuantumSelector, get_indices_quantumnumbers
 from centrex_TlF.states.utils_compact import compact_QN_coupled_indices
 from tqdm import tqdm
@@ -41,14 +42,16 @@ def collapse_matrices(
     # Initialize list of collapse matrices
     C_list = []
 
+    basis = as_basis(QN)
+    indices_ground = basis.indices_of(ground_states)
+
     # Start looping over ground and excited states
     for excited_state in tqdm(excited_states, disable=not progress):
-        j = QN.index(excited_state)
+        j = basis.index(excited_state)
         BRs = calculate_BR(excited_state, ground_states)
         if np.sum(BRs) > 1:
             print(f"Warning: Branching ratio sum > 1, difference = {np.sum(BRs)-1:.2e}")
-        for ground_state, BR in zip(ground_states, BRs):
-            i = QN.index(ground_state)
+        for i, BR in zip(indices_ground, BRs):
 
             if np.sqrt(BR) > tol:
                 # Initialize the coupling matrix
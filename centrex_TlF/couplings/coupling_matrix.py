@@ -10,6 +10,7 @@ from centrex_TlF.couplings.matrix_elements import (
 from centrex_TlF.couplings.utils import generate_D, select_main_states
 from centrex_TlF.couplings.utils_multiprocessing import multi_coupling_matrix
 from centrex_TlF.couplings.utils_sqlite import check_states_in_ED_ME_coupled
+from centrex_TlF.states.basis import Basis, as_basis
 from centrex_TlF.states.utils import check_approx_state_exact_state, find_exact_states
 from centrex_TlF.transitions.utils import assert_transition_coupled_allowed
 
@@ -37,7 +38,7 @@ def generate_coupling_matrix(
     calculate_coupling_matrix.
 
     Args:
-        QN (list): list of basis states
+        QN (list, Basis): list of basis states
         ground_states (list): list of ground states coupling to excited states
         excited_states (list): list of excited states
         pol_vec (np.ndarray, optional): polarization vector. Defaults to
@@ -50,7 +51,8 @@ def generate_coupling_matrix(
     Returns:
         np.ndarray: optical coupling matrix
     """
-    assert isinstance(QN, list), "QN required to be of type list"
+    assert isinstance(QN, (list, Basis)), "QN required to be of type list or Basis"
+    QN = as_basis(QN)
 
     # check if states are pre-cached
     Jg = np.unique(
@@ -74,10 +76,9 @@ def generate_coupling_matrix(
         H = np.zeros((len(QN), len(QN)), dtype=complex)
 
         # start looping over ground and excited states
-        for ground_state in ground_states:
-            i = QN.index(ground_state)
-            for excited_state in excited_states:
-                j = QN.index(excited_state)
+        indices_excited = QN.indices_of(excited_states)
+        for i, ground_state in zip(QN.indices_of(ground_states), ground_states):
+            for j, excited_state in zip(indices_excited, excited_states):
 
                 # calculate matrix element and add it to the Hamiltonian
                 H[i, j] = generate_ED_ME_mixed_state(
@@ -109,7 +110,7 @@ def calculate_coupling_matrix(
     """calculate optical coupling matrix for given ground and excited states
 
     Args:
-        QN (list): list of basis states
+        QN (list, Basis): list of basis states
         ground_states (list): list of ground states coupling to excited states
         excited_states (list): list of excited states
         pol_vec (np.ndarray, optional): polarization vector. Defaults to
@@ -122,7 +123,8 @@ def calculate_coupling_matrix(
     Returns:
         np.ndarray: optical coupling matrix
     """
-    assert isinstance(QN, list), "QN required to be of type list"
+    assert isinstance(QN, (list, Basis)), "QN required to be of type list or Basis"
+    QN = as_basis(QN)
 
     if nprocs > 1:
         with multiprocessing.Pool(nprocs) as pool:
@@ -136,10 +138,9 @@ def calculate_coupling_matrix(
         H = np.zeros((len(QN), len(QN)), dtype=complex)
 
         # start looping over ground and excited states
-        for ground_state in ground_states:
-            i = QN.index(ground_state)
-            for excited_state in excited_states:
-                j = QN.index(excited_state)
+        indices_excited = QN.indices_of(excited_states)
+        for i, ground_state in zip(QN.indices_of(ground_states), ground_states):
+            for j, excited_state in zip(indices_excited, excited_states):
 
                 # calculate matrix element and add it to the Hamiltonian
                 H[i, j] = calculate_ED_ME_mixed_state(
@@ -156,6 +157,36 @@ def calculate_coupling_matrix(
     return H
 
 
+def _find_exact_states(
+    ground_main_approx,
+    excited_main_approx,
+    ground_states_approx,
+    excited_states_approx,
+    H_rot,
+    QN,
+    V_ref,
+):
+    """Find the eigenstates of H_rot closest to the approximate main, ground and
+    excited states, diagonalizing H_rot only once
+
+    Returns:
+        tuple: ground main, excited main, ground states and excited states
+    """
+    states = find_exact_states(
+        [
+            ground_main_approx,
+            excited_main_approx,
+            *ground_states_approx,
+            *excited_states_approx,
+        ],
+        H_rot,
+        QN,
+        V_ref=V_ref,
+    )
+    n_ground = len(ground_states_approx)
+    return states[0], states[1], states[2 : 2 + n_ground], states[2 + n_ground :]
+
+
 def generate_coupling_field(
     ground_main_approx,
     excited_main_approx,
@@ -170,10 +201,15 @@ def generate_coupling_field(
     absolute_coupling=1e-6,
     nprocs=2,
 ):
-    ground_states = find_exact_states(ground_states_approx, H_rot, QN, V_ref=V_ref)
-    excited_states = find_exact_states(excited_states_approx, H_rot, QN, V_ref=V_ref)
-    ground_main = find_exact_states([ground_main_approx], H_rot, QN, V_ref=V_ref)[0]
-    excited_main = find_exact_states([excited_main_approx], H_rot, QN, V_ref=V_ref)[0]
+    ground_main, excited_main, ground_states, excited_states = _find_exact_states(
+        ground_main_approx,
+        excited_main_approx,
+        ground_states_approx,
+        excited_states_approx,
+        H_rot,
+        QN,
+        V_ref,
+    )
 
     check_approx_state_exact_state(ground_main_approx, ground_main)
     check_approx_state_exact_state(excited_main_approx, excited_main)
@@ -224,10 +260,15 @@ def calculate_coupling_field(
     absolute_coupling=1e-6,
     nprocs=2,
 ):
-    ground_states = find_exact_states(ground_states_approx, H_rot, QN, V_ref=V_ref)
-    excited_states = find_exact_states(excited_states_approx, H_rot, QN, V_ref=V_ref)
-    ground_main = find_exact_states([ground_main_approx], H_rot, QN, V_ref=V_ref)[0]
-    excited_main = find_exact_states([excited_main_approx], H_rot, QN, V_ref=V_ref)[0]
+    ground_main, excited_main, ground_states, excited_states = _find_exact_states(
+        ground_main_approx,
+        excited_main_approx,
+        ground_states_approx,
+        excited_states_approx,
+        H_rot,
+        QN,
+        V_ref,
+    )
 
     check_approx_state_exact_state(ground_main_approx, ground_main)
     check_approx_state_exact_state(excited_main_approx, excited_main)
@@ -314,10 +355,15 @@ def generate_coupling_field_automatic(
         ground_states_approx, excited_states_approx, pol_main
     )
 
-    ground_states = find_exact_states(ground_states_approx, H_rot, QN, V_ref=V_ref)
-    excited_states = find_exact_states(excited_states_approx, H_rot, QN, V_ref=V_ref)
-    ground_main = find_exact_states([ground_main_approx], H_rot, QN, V_ref=V_ref)[0]
-    excited_main = find_exact_states([excited_main_approx], H_rot, QN, V_ref=V_ref)[0]
+    ground_main, excited_main, ground_states, excited_states = _find_exact_states(
+        ground_main_approx,
+        excited_main_approx,
+        ground_states_approx,
+        excited_states_approx,
+        H_rot,
+        QN,
+        V_ref,
+    )
 
     check_approx_state_exact_state(ground_main_approx, ground_main)
     check_approx_state_exact_state(excited_main_approx, excited_main)
@@ -404,10 +450,15 @@ def calculate_coupling_field_automatic(
     ground_main_approx, excited_main_approx = select_main_states(
         ground_states_approx, excited_states_approx, pol_main
     )
-    ground_states = find_exact_states(ground_states_approx, H_rot, QN, V_ref=V_ref)
-    excited_states = find_exact_states(excited_states_approx, H_rot, QN, V_ref=V_ref)
-    ground_main = find_exact_states([ground_main_approx], H_rot, QN, V_ref=V_ref)[0]
-    excited_main = find_exact_states([excited_main_approx], H_rot, QN, V_ref=V_ref)[0]
+    ground_main, excited_main, ground_states, excited_states = _find_exact_states(
+        ground_main_approx,
+        excited_main_approx,
+        ground_states_approx,
+        excited_states_approx,
+        H_rot,
+        QN,
+        V_ref,
+    )
 
     check_approx_state_exact_state(ground_main_approx, ground_main)
     check_approx_state_exact_state(excited_main_approx, excited_main)
@@ -4,6 +4,7 @@ from centrex_TlF.couplings.utils_sqlite import (
     retrieve_ED_ME_coupled_sqlite_single_rme,
 )
 from centrex_TlF.hamiltonian.utils import sixj_f, threej_f
+from centrex_TlF.hamiltonian.wigner import wigner_3j, wigner_6j
 
 
 def calculate_ED_ME_mixed_state(
@@ -23,20 +24,20 @@ def calculate_ED_ME_mixed_state(
     Returns:
         complex: matrix element between bra and ket
     """
-    ME = 0
     bra = bra.transform_to_omega_basis()
     ket = ket.transform_to_omega_basis()
 
     if normalize_pol:
         pol_vec = np.asarray(pol_vec) / np.linalg.norm(pol_vec)
 
-    for amp_bra, basis_bra in bra.data:
-        for amp_ket, basis_ket in ket.data:
-            ME += (
-                amp_bra.conjugate()
-                * amp_ket
-                * ED_ME_coupled(basis_bra, basis_ket, pol_vec=pol_vec, rme_only=reduced)
-            )
+    if not bra.data or not ket.data:
+        return 0
+
+    # evaluate the matrix elements between all pairs of components at once
+    amps_bra, basis_bra = zip(*bra.data)
+    amps_ket, basis_ket = zip(*ket.data)
+    MEs = ED_ME_coupled_arrays(basis_bra, basis_ket, pol_vec=pol_vec, rme_only=reduced)
+    ME = np.conjugate(amps_bra) @ MEs @ np.asarray(amps_ket)
 
     return ME
 
@@ -150,3 +151,85 @@ def ED_ME_coupled(bra, ket, pol_vec=np.array([1, 1, 1]), rme_only=False):
 
     # return the matrix element
     return ME
+
+
+def ED_ME_coupled_arrays(bras, kets, pol_vec=np.array([1, 1, 1]), rme_only=False):
+    """calculate electric dipole matrix elements between all pairs of coupled
+    basis states in bras and kets, see ED_ME_coupled
+
+    Args:
+        bras (list): coupled basis states
+        kets (list): coupled basis states
+        pol_vec (np.ndarray, optional): polarization vector.
+                                        Defaults to np.array([1,1,1]).
+        rme_only (bool, optional): set True to return only reduced matrix
+                                    element, otherwise angular component is
+                                    included. Defaults to False.
+
+    Returns:
+        np.ndarray: electric dipole matrix elements, shape (len(bras), len(kets))
+    """
+
+    def quantum_numbers(states, name, axis):
+        values = np.array([getattr(state, name) for state in states], dtype=float)
+        return values[:, np.newaxis] if axis == 0 else values[np.newaxis, :]
+
+    def parity(exponent):
+        return 1 - 2 * (np.rint(exponent) % 2)
+
+    # find quantum numbers for ground state
+    F = quantum_numbers(bras, "F", 0)
+    mF = quantum_numbers(bras, "mF", 0)
+    J = quantum_numbers(bras, "J", 0)
+    F1 = quantum_numbers(bras, "F1", 0)
+    I1 = quantum_numbers(bras, "I1", 0)
+    I2 = quantum_numbers(bras, "I2", 0)
+    Omega = quantum_numbers(bras, "Omega", 0)
+
+    # find quantum numbers for excited state
+    Fp = quantum_numbers(kets, "F", 1)
+    mFp = quantum_numbers(kets, "mF", 1)
+    Jp = quantum_numbers(kets, "J", 1)
+    F1p = quantum_numbers(kets, "F1", 1)
+    Omegap = quantum_numbers(kets, "Omega", 1)
+
+    # calculate the reduced matrix element
+    q = Omega - Omegap
+    ME = (
+        parity(F1 + J + Fp + F1p + I1 + I2)
+        * np.sqrt((2 * F + 1) * (2 * Fp + 1) * (2 * F1p + 1) * (2 * F1 + 1))
+        * wigner_6j(F1p, Fp, I2, F, F1, 1)
+        * wigner_6j(Jp, F1p, I1, F1, J, 1)
+        * parity(J - Omega)
+        * np.sqrt((2 * J + 1) * (2 * Jp + 1))
+        * wigner_3j(J, 1, Jp, -Omega, q, Omegap)
+        * (np.abs(q) < 2)
+    ).astype(complex)
+
+    # if we want the complete matrix element, calculate angular part
+    if not rme_only:
+
+        # elements of the polarization vector in spherical basis, indexed by
+        # p + 1
+        p_vec = np.array(
+            [
+                -1 / np.sqrt(2) * (pol_vec[0] + 1j * pol_vec[1]),
+                pol_vec[2],
+                +1 / np.sqrt(2) * (pol_vec[0] - 1j * pol_vec[1]),
+            ]
+        )
+
+        # calculate the value of p that connects the states
+        p = mF - mFp
+        p = p * (np.abs(p) <= 1)
+        # multiply RME by the angular part
+        ME = (
+            ME
+            * parity(F - mF)
+            * wigner_3j(F, 1, Fp, -mF, p, mFp)
+            * p_vec[np.rint(p).astype(int) + 1]
+            * (np.abs(mF - mFp) <= 1)
+        )
+
+    # return the matrix elements
+    return ME
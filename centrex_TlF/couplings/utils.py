@@ -3,6 +3,7 @@ from typing import Union
 
 import numpy as np
 from centrex_TlF.states import State
+from centrex_TlF.states.basis import as_basis
 from centrex_TlF.transitions.utils import check_transition_coupled_allowed
 from centrex_TlF.utils import (
     calculate_power_from_rabi_gaussian_beam,
@@ -78,6 +79,7 @@ def generate_superoperator(A, B):
 
 
 def generate_D(H, QN, ground_main, excited_main, excited_states, Δ=0):
+    QN = as_basis(QN)
     # find transition frequency
     ig = QN.index(ground_main)
     ie = QN.index(excited_main)
@@ -88,8 +90,7 @@ def generate_D(H, QN, ground_main, excited_main, excited_states, Δ=0):
 
     # shift matrix
     D = np.zeros(H.shape, H.dtype)
-    for excited_state in excited_states:
-        idx = QN.index(excited_state)
+    for idx in QN.indices_of(excited_states):
         D[idx, idx] -= ω
 
     return D
@@ -107,6 +108,7 @@ def generate_total_hamiltonian(H_int, QN, couplings):
     Returns:
         np.ndarray; complex: rotating frame Hamiltonian
     """
+    QN = as_basis(QN)
     H_rot = H_int.copy()
     for coupling in couplings:
         gnd_idx = QN.index(coupling["ground main"])
@@ -1,12 +1,13 @@
 import numpy as np
 from centrex_TlF.couplings.matrix_elements import calculate_ED_ME_mixed_state
+from centrex_TlF.states.basis import as_basis
 
 
 def multi_coupling_matrix(QN, ground_state, excited_states, pol_vec, reduced):
+    QN = as_basis(QN)
     H = np.zeros((len(QN), len(QN)), dtype=complex)
     i = QN.index(ground_state)
-    for excited_state in excited_states:
-        j = QN.index(excited_state)
+    for j, excited_state in zip(QN.indices_of(excited_states), excited_states):
 
         # calculate matrix element and add it to the Hamiltonian
         H[i, j] = calculate_ED_ME_mixed_state(
@@ -1,7 +1,5 @@
-import json
-from pathlib import Path
-
 import numpy as np
+from centrex_TlF.hamiltonian.utils_cache import pre_calculated_manifest
 
 
 def retrieve_ED_ME_coupled_sqlite_single_rme(a, b, pol_vec, con):
@@ -57,11 +55,7 @@ def retrieve_ED_ME_coupled_sqlite_single(a, b, pol_vec, con):
 
 
 def check_states_in_ED_ME_coupled(Jg, Je, pol_vec):
-    # load json
-    path = Path(__file__).parent.parent / "pre_calculated"
-    js = path / "precalculated.json"
-    with open(js) as json_file:
-        f = json.load(json_file)
+    f = pre_calculated_manifest()
 
     # check if ground state J is pre-cached
     if not np.all(J in f["matrix_elements"]["X"] for J in Jg):
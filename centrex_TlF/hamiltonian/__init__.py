@@ -1,19 +1,47 @@
+from . import wigner
+from .wigner import *
+
+from . import utils_cache
+from .utils_cache import *
+
+from . import wigner_table
+from .wigner_table import *
+
 from . import utils
 from .utils import *
 
+from . import utils_store
+from .utils_store import *
+
 from . import basis_transform
 from .basis_transform import *
 
+from . import operator_registry
+from .operator_registry import *
+
+from . import sparse_operators
+from .sparse_operators import *
+
 from . import generate_hamiltonian
 from .generate_hamiltonian import *
 
 from . import generate_reduced_hamiltonian
 from .generate_reduced_hamiltonian import *
 
+from . import field_scans
+from .field_scans import *
+
 from . import hamiltonian_terms_uncoupled
 from . import hamiltonian_B_terms_coupled
 
-__all__ = utils.__all__.copy()
+__all__ = wigner.__all__.copy()
+__all__ += utils_cache.__all__.copy()
+__all__ += wigner_table.__all__.copy()
+__all__ += utils.__all__.copy()
+__all__ += utils_store.__all__.copy()
 __all__ += basis_transform.__all__.copy()
+__all__ += operator_registry.__all__.copy()
+__all__ += sparse_operators.__all__.copy()
 __all__ += generate_hamiltonian.__all__.copy()
 __all__ += generate_reduced_hamiltonian.__all__.copy()
+__all__ += field_scans.__all__.copy()
@@ -1,38 +1,174 @@
-import multiprocessing
-from pathlib import Path
-
 import numpy as np
-from centrex_TlF.hamiltonian.utils_multiprocessing import multi_transformation_matrix
-from centrex_TlF.hamiltonian.utils_sqlite import (
-    retrieve_S_transform_uncoupled_to_coupled_sqlite,
+import scipy.sparse
+from centrex_TlF.hamiltonian.utils_multiprocessing import (
+    blocks,
+    create_pool,
+    multi_transformation_matrix,
 )
+from centrex_TlF.hamiltonian.wigner import clebsch_gordan
+from centrex_TlF.states.states import CoupledBasisState, UncoupledBasisState
 from tqdm import tqdm
 
-__all__ = ["generate_transform_matrix", "calculate_transform_matrix"]
+__all__ = [
+    "generate_transform_matrix",
+    "calculate_transform_matrix",
+    "generate_transform_matrix_uncoupled_to_coupled",
+    "generate_uncoupled_basis",
+    "generate_coupled_basis",
+]
 
 
 def generate_transform_matrix(basis1, basis2, progress=False):
     """
     Function that generates a transform matrix that takes Hamiltonian expressed
     in basis1 to basis2: H_2 = S.conj().T @ H_1 @ S
-    Retrieved from a pre-calculated sqlite3 database.
+    Calculated from Clebsch-Gordan coefficients, one basis has to consist of
+    UncoupledBasisStates and the other of CoupledBasisStates.
 
     inputs:
     basis1 = list of basis states that defines basis1
     basis2 = list of basis states that defines basis2
-    progress = boolean to display tqdm progress bar
+    progress = unused, kept for compatibility
 
     returns:
     S = transformation matrix that takes Hamiltonian (or any operator) from
     basis1 to basis2
     """
-    path = Path(__file__).parent.parent / "pre_calculated"
-    db = path / "transformation.db"
-
     # Check that the two bases have the same dimension
     assert len(basis1) == len(basis2), "Bases don't have the same dimension"
 
-    return retrieve_S_transform_uncoupled_to_coupled_sqlite(basis1, basis2, db)
+    if all(isinstance(s, CoupledBasisState) for s in basis1):
+        S = generate_transform_matrix_uncoupled_to_coupled(basis2, basis1)
+        return S.conj().T.toarray()
+    return generate_transform_matrix_uncoupled_to_coupled(basis1, basis2).toarray()
+
+
+def _uncoupled_components(basis_coupled):
+    """Find the components of coupled basis states in the uncoupled basis, in
+    the order used by CoupledBasisState.transform_to_uncoupled
+
+    Args:
+        basis_coupled (list): CoupledBasisStates
+
+    Returns:
+        tuple: arrays with the index of the coupled basis state, J, mJ, I1, m1,
+                I2, m2 and the amplitude of each component
+    """
+    F, mF, F1, J, I1, I2 = (
+        np.array([getattr(s, name) for s in basis_coupled], dtype=float)
+        for name in ["F", "mF", "F1", "J", "I1", "I2"]
+    )
+
+    # enumerate all projections mJ, m1 and m2 of each coupled basis state
+    n_m1 = np.rint(2 * I1 + 1).astype(int)
+    n_m2 = np.rint(2 * I2 + 1).astype(int)
+    counts = np.rint(2 * J + 1).astype(int) * n_m1 * n_m2
+    column = np.repeat(np.arange(len(basis_coupled)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    F, mF, F1, J, I1, I2, n_m1, n_m2 = (
+        x[column] for x in (F, mF, F1, J, I1, I2, n_m1, n_m2)
+    )
+    mJ = -J + k // (n_m1 * n_m2)
+    m1 = -I1 + (k // n_m2) % n_m1
+    m2 = -I2 + k % n_m2
+    mF1 = mJ + m1
+
+    amps = clebsch_gordan(J, mJ, I1, m1, F1, mF1) * clebsch_gordan(
+        F1, mF1, I2, m2, F, mF
+    )
+    order = np.lexsort((m2, m1, mJ, mF1, column))
+    order = order[amps[order] != 0]
+    return tuple(x[order] for x in (column, J, mJ, I1, m1, I2, m2, amps))
+
+
+def generate_transform_matrix_uncoupled_to_coupled(basis_uncoupled, basis_coupled):
+    """Generate the sparse matrix S[i,j] = <uncoupled_i|coupled_j> that
+    transforms from an uncoupled basis to a coupled basis, calculated for all
+    basis states at once from Clebsch-Gordan coefficients.
+
+    Args:
+        basis_uncoupled (list): UncoupledBasisStates
+        basis_coupled (list): CoupledBasisStates
+
+    Returns:
+        scipy.sparse.csr_matrix: transformation matrix
+    """
+    column, J, mJ, I1, m1, I2, m2, amps = _uncoupled_components(basis_coupled)
+
+    # look up the components in the uncoupled basis by their quantum numbers
+    rows = {s._quantum_numbers: i for i, s in enumerate(basis_uncoupled)}
+    labels = [(s.Omega, s.P, s.electronic_state) for s in basis_coupled]
+    quantum_numbers = zip(*(x.tolist() for x in (J, mJ, I1, m1, I2, m2)))
+    row = np.array(
+        [
+            rows.get(qn + labels[j], -1)
+            for qn, j in zip(quantum_numbers, column.tolist())
+        ],
+        dtype=int,
+    )
+    present = row >= 0
+    return scipy.sparse.csr_matrix(
+        (amps[present].astype(complex), (row[present], column[present])),
+        shape=(len(basis_uncoupled), len(basis_coupled)),
+    )
+
+
+def generate_uncoupled_basis(basis_coupled):
+    """Generate the uncoupled basis states that make up a set of coupled basis
+    states, in order of appearance
+
+    Args:
+        basis_coupled (list): CoupledBasisStates
+
+    Returns:
+        list: UncoupledBasisStates
+    """
+    column, J, mJ, I1, m1, I2, m2, _ = _uncoupled_components(basis_coupled)
+    labels = [(s.Omega, s.P, s.electronic_state) for s in basis_coupled]
+    quantum_numbers = zip(*(x.tolist() for x in (J, mJ, I1, m1, I2, m2)))
+    unique = {}
+    for qn, j in zip(quantum_numbers, column.tolist()):
+        unique.setdefault(qn + labels[j])
+    return [
+        UncoupledBasisState(
+            J, mJ, I1, m1, I2, m2, Omega=Omega, P=P, electronic_state=electronic
+        )
+        for J, mJ, I1, m1, I2, m2, Omega, P, electronic in unique
+    ]
+
+
+def generate_coupled_basis(basis_uncoupled):
+    """Generate all coupled basis states with the J, I1, I2, Omega, P and
+    electronic state of a set of uncoupled basis states
+
+    Args:
+        basis_uncoupled (list): UncoupledBasisStates
+
+    Returns:
+        list: CoupledBasisStates
+    """
+    labels = dict.fromkeys(
+        (s.J, s.I1, s.I2, s.Omega, s.P, s.electronic_state) for s in basis_uncoupled
+    )
+    QN = []
+    for J, I1, I2, Omega, P, electronic in labels:
+        for F1 in np.arange(np.abs(J - I1), J + I1 + 1):
+            for F in np.arange(np.abs(F1 - I2), F1 + I2 + 1):
+                for mF in np.arange(-F, F + 1):
+                    QN.append(
+                        CoupledBasisState(
+                            F,
+                            mF,
+                            F1,
+                            J,
+                            I1,
+                            I2,
+                            Omega=Omega,
+                            P=P,
+                            electronic_state=electronic,
+                        )
+                    )
+    return QN
 
 
 def calculate_transform_matrix(basis1, basis2, progress=False, nprocs=2):
@@ -55,14 +191,17 @@ def calculate_transform_matrix(basis1, basis2, progress=False, nprocs=2):
     # Check that the two bases have the same dimension
     assert len(basis1) == len(basis2), "Bases don't have the same dimension"
 
-    # multiprocessing
+    # multiprocessing, workers calculate contiguous blocks of rows and return
+    # the nonzero elements
     if nprocs > 1:
-        with multiprocessing.Pool(nprocs) as pool:
-            result = pool.starmap(
-                multi_transformation_matrix,
-                [(i, state1, basis2) for i, state1 in enumerate(basis1)],
+        with create_pool(nprocs, basis1, basis2) as pool:
+            triplets = pool.starmap(
+                multi_transformation_matrix, blocks(len(basis1), nprocs)
             )
-        S = np.sum(result, axis=0)
+        rows, columns, values = (np.concatenate(x) for x in zip(*triplets))
+        S = scipy.sparse.coo_matrix(
+            (values, (rows, columns)), shape=(len(basis1), len(basis2))
+        ).toarray()
 
     else:
         # Initialize S
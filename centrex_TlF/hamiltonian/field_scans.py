@@ -0,0 +1,266 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from centrex_TlF.hamiltonian.basis_transform import (
+    generate_coupled_basis,
+    generate_transform_matrix,
+)
+from centrex_TlF.hamiltonian.utils import block_indices, eigh_blocked
+from scipy.optimize import linear_sum_assignment
+
+__all__ = ["field_scan", "track_field_scan"]
+
+# Hamiltonian terms that are multiplied by a field component, other terms are
+# field free
+FIELD_TERMS = {
+    "HSx": ("E", 0),
+    "HSy": ("E", 1),
+    "HSz": ("E", 2),
+    "HZx": ("B", 0),
+    "HZy": ("B", 1),
+    "HZz": ("B", 2),
+}
+
+
+def _field_array(field, size):
+    field = np.asarray(field, dtype=float)
+    if field.ndim == 1:
+        field = np.broadcast_to(field, (size, 3))
+    assert field.shape == (size, 3), "fields have to be of shape (3,) or (M, 3)"
+    return field
+
+
+def _field_terms(H_terms, E_array, B_array):
+    """Stack the Hamiltonian terms in 2π⋅Hz, with the field free terms summed
+    into the first term, and the coefficient of each term for each field value
+
+    Returns:
+        tuple: terms of shape (K, N, N) and coefficients of shape (M, K)
+    """
+    E_array, B_array = np.asarray(E_array), np.asarray(B_array)
+    size = max(len(field) if field.ndim == 2 else 1 for field in [E_array, B_array])
+    fields = {"E": _field_array(E_array, size), "B": _field_array(B_array, size)}
+
+    field_free = sum(
+        np.asarray(H) for name, H in H_terms.items() if name not in FIELD_TERMS
+    )
+    names = [name for name in FIELD_TERMS if name in H_terms]
+    terms = 2 * np.pi * np.stack([field_free] + [H_terms[name] for name in names])
+    coefficients = np.ones((size, len(terms)))
+    for i, name in enumerate(names):
+        field, component = FIELD_TERMS[name]
+        coefficients[:, i + 1] = fields[field][:, component]
+    return terms, coefficients
+
+
+def field_scan(
+    H_terms, E_array, B_array, energies_only=False, chunk_size=256, nthreads=1
+):
+    """Calculate energies and eigenstates for many electric and magnetic field
+    values. The Hamiltonians of a chunk of field values are built with a single
+    tensor contraction of the field components and the Hamiltonian terms, and
+    diagonalized with a batched eigh, separately for each block of states that
+    isn't coupled by the applied fields (see block_indices).
+
+    Args:
+        H_terms (dict): Hamiltonian terms, e.g. from
+                        generate_uncoupled_hamiltonian_X. HSx, HSy, HSz and HZx,
+                        HZy, HZz are multiplied by the field components, the
+                        other terms are field free.
+        E_array (np.ndarray): electric fields of shape (M, 3) or (3,) [V/cm]
+        B_array (np.ndarray): magnetic fields of shape (M, 3) or (3,) [G]
+        energies_only (bool, optional): only calculate the energies, which
+                                        saves memory. Defaults to False.
+        chunk_size (int, optional): number of field values diagonalized at
+                                    once. Defaults to 256.
+        nthreads (int, optional): number of threads diagonalizing chunks in
+                                    parallel. Defaults to 1.
+
+    Returns:
+        tuple: energies of shape (M, N) and eigenvectors of shape (M, N, N) in
+                2π⋅Hz, eigenvectors are in the columns. Only the energies if
+                energies_only.
+    """
+    terms, coefficients = _field_terms(H_terms, E_array, B_array)
+    size = len(coefficients)
+    N = terms.shape[-1]
+    energies = np.empty((size, N))
+    if not energies_only:
+        eigenvectors = np.empty((size, N, N), dtype=complex)
+
+    # blocks of states that aren't coupled by the field free terms or the
+    # applied fields, e.g. different mF for fields along z
+    blocks = block_indices(terms[np.any(coefficients != 0, axis=0)])
+    block_terms = [terms[:, indices[:, None], indices] for indices in blocks]
+
+    def diagonalize(start):
+        stop = min(start + chunk_size, size)
+        D = np.empty((stop - start, N))
+        if not energies_only:
+            V = np.zeros((stop - start, N, N), dtype=complex)
+        column = 0
+        for indices, terms_block in zip(blocks, block_terms):
+            H = np.tensordot(coefficients[start:stop], terms_block, axes=1)
+            columns = slice(column, column + len(indices))
+            if energies_only:
+                D[:, columns] = np.linalg.eigvalsh(H)
+            else:
+                D[:, columns], V[:, indices, columns] = np.linalg.eigh(H)
+            column += len(indices)
+
+        order = np.argsort(D, axis=1, kind="stable")
+        energies[start:stop] = np.take_along_axis(D, order, axis=1)
+        if not energies_only:
+            eigenvectors[start:stop] = np.take_along_axis(V, order[:, None, :], axis=2)
+
+    starts = range(0, size, chunk_size)
+    if nthreads > 1:
+        # LAPACK releases the GIL, so chunks are diagonalized in parallel
+        with ThreadPoolExecutor(nthreads) as executor:
+            list(executor.map(diagonalize, starts))
+    else:
+        for start in starts:
+            diagonalize(start)
+
+    if energies_only:
+        return energies
+    return energies, eigenvectors
+
+
+def _align_degenerate(D, V, V_previous, degeneracy_tol):
+    """Rotate the eigenvectors of each degenerate subspace onto the previous
+    eigenvectors that lie mostly within that subspace, eigenvectors of a
+    degenerate subspace are otherwise an arbitrary basis of the subspace
+
+    Returns:
+        np.ndarray: eigenvectors
+    """
+    V = V.copy()
+    edges = np.nonzero(np.diff(D) > degeneracy_tol)[0] + 1
+    for subspace in np.split(np.arange(len(D)), edges):
+        if len(subspace) == 1:
+            continue
+        overlaps = V[:, subspace].conj().T @ V_previous
+        weights = np.sum(np.abs(overlaps) ** 2, axis=0)
+        previous = np.argsort(weights)[-len(subspace) :]
+        # unitary closest to the overlaps with the selected previous vectors
+        A, _, Bh = np.linalg.svd(overlaps[:, previous])
+        V[:, subspace] = V[:, subspace] @ (A @ Bh)
+    return V
+
+
+def _match(D, V, V_previous, degeneracy_tol):
+    """Order eigenvectors by the previous eigenvectors they overlap with, with
+    the assignment that maximizes the total overlap
+
+    Returns:
+        tuple: energies, eigenvectors and the smallest overlap
+    """
+    V = _align_degenerate(D, V, V_previous, degeneracy_tol)
+    overlaps = np.abs(V_previous.conj().T @ V) ** 2
+    _, columns = linear_sum_assignment(overlaps, maximize=True)
+    return D[columns], V[:, columns], overlaps[np.arange(len(D)), columns].min()
+
+
+def _track(terms, start, stop, V_start, threshold, refinements, degeneracy_tol):
+    """Eigenstates at the field coefficients stop, ordered by the eigenvectors
+    V_start at start. The step is halved while the overlap between matched
+    eigenvectors is below threshold, at most refinements times.
+
+    Returns:
+        tuple: energies, eigenvectors and the smallest overlap
+    """
+    D, V = eigh_blocked(np.tensordot(stop, terms, axes=1))
+    D, V, overlap = _match(D, V, V_start, degeneracy_tol)
+    if overlap < threshold and refinements > 0:
+        middle = (start + stop) / 2
+        args = (threshold, refinements - 1, degeneracy_tol)
+        _, V_middle, _ = _track(terms, start, middle, V_start, *args)
+        return _track(terms, middle, stop, V_middle, *args)
+    return D, V, overlap
+
+
+def track_field_scan(
+    H_terms,
+    E_array,
+    B_array,
+    QN=None,
+    threshold=0.5,
+    max_refinements=4,
+    degeneracy_tol=1e-3,
+    energies_only=False,
+):
+    """Follow eigenstates adiabatically through a sequence of electric and
+    magnetic field values. The eigenstates at zero field are labelled by the
+    basis states, and at each field value the eigenvectors are matched to
+    those of the previous field value by maximal overlap assignment. Where the
+    overlap of a matched pair drops below threshold, e.g. at avoided
+    crossings, the field step is halved.
+
+    Args:
+        H_terms (dict): Hamiltonian terms, see field_scan
+        E_array (np.ndarray): electric fields of shape (M, 3) or (3,) [V/cm]
+        B_array (np.ndarray): magnetic fields of shape (M, 3) or (3,) [G]
+        QN (list, optional): basis states of H_terms, uncoupled basis states
+                                are labelled by the coupled basis states with
+                                the same J. Defaults to None, which labels the
+                                eigenstates by the index of a basis state.
+        threshold (float, optional): smallest overlap |<ψ_i|ψ_i'>|² between
+                                    eigenstates at consecutive field values.
+                                    Defaults to 0.5.
+        max_refinements (int, optional): maximum number of times a field step
+                                        is halved. Defaults to 4.
+        degeneracy_tol (float, optional): energy difference below which
+                                            eigenstates are degenerate [Hz].
+                                            Defaults to 1e-3.
+        energies_only (bool, optional): only return the energies. Defaults to
+                                        False.
+
+    Returns:
+        tuple: energies of shape (M, N) in 2π⋅Hz, eigenvectors of shape
+                (M, N, N) and the labels of the eigenstates, the eigenstate in
+                column k at each field value is the one labelled by labels[k].
+                Without eigenvectors if energies_only.
+    """
+    terms, coefficients = _field_terms(H_terms, E_array, B_array)
+    N = terms.shape[-1]
+    degeneracy_tol = 2 * np.pi * degeneracy_tol
+
+    if QN is None:
+        reference, labels = np.eye(N), list(range(N))
+    elif all(s.isCoupled for s in QN):
+        reference, labels = np.eye(N), list(QN)
+    else:
+        labels = generate_coupled_basis(QN)
+        assert len(labels) == N, "supply all uncoupled basis states of each J"
+        reference = generate_transform_matrix(QN, labels)
+
+    # eigenstates at zero field, labelled by the basis states
+    previous = np.zeros(terms.shape[0])
+    previous[0] = 1
+    D, V = eigh_blocked(terms[0])
+    D, V, _ = _match(D, V, reference, degeneracy_tol)
+
+    energies = np.empty((len(coefficients), N))
+    if not energies_only:
+        eigenvectors = np.empty((len(coefficients), N, N), dtype=complex)
+    smallest_overlap = 1
+    for i, current in enumerate(coefficients):
+        D, V, overlap = _track(
+            terms, previous, current, V, threshold, max_refinements, degeneracy_tol
+        )
+        smallest_overlap = min(smallest_overlap, overlap)
+        energies[i] = D
+        if not energies_only:
+            eigenvectors[i] = V
+        previous = current
+
+    if smallest_overlap < threshold:
+        logging.warning(
+            f"overlap of tracked eigenstates down to {smallest_overlap:.2f}, "
+            "use smaller field steps or more refinements"
+        )
+    if energies_only:
+        return energies, labels
+    return energies, eigenvectors, labels
@@ -1,8 +1,10 @@
 import logging
-import multiprocessing
 from pathlib import Path
 
+import centrex_TlF.constants.constants_B as cst_B
+import centrex_TlF.constants.constants_X as cst_X
 import numpy as np
+import scipy.sparse
 from centrex_TlF.hamiltonian.hamiltonian_B_terms_coupled import (
     H_LD,
     H_c_Tl,
@@ -12,22 +14,34 @@ from centrex_TlF.hamiltonian.hamiltonian_B_terms_coupled import (
     Hrot_B,
     HZz_B,
 )
-from centrex_TlF.hamiltonian.hamiltonian_terms_uncoupled import (
-    Hff_X_alt,
-    HSx,
-    HSy,
-    HSz,
-    HZx_X,
-    HZy_X,
-    HZz_X,
+from centrex_TlF.hamiltonian import (
+    hamiltonian_B_terms_coupled,
+    quantum_operators,
+    sparse_operators,
+    wigner,
+    wigner_table,
+)
+from centrex_TlF.hamiltonian.operator_registry import get_operator, operator_key
+from centrex_TlF.hamiltonian.sparse_operators import SparseOperators
+from centrex_TlF.hamiltonian.utils import (
+    _matrix_elements_column,
+    _registry_positions,
+    sixj_f,
+    threej_f,
+)
+from centrex_TlF.hamiltonian.utils_cache import cached_terms
+from centrex_TlF.hamiltonian.utils_multiprocessing import (
+    blocks,
+    create_pool,
+    multi_HMatElems,
 )
-from centrex_TlF.hamiltonian.utils_multiprocessing import multi_HMatElems
 from centrex_TlF.hamiltonian.utils_sqlite import (
     check_states_coupled_hamiltonian_B,
     check_states_uncoupled_hamiltonian_X,
     retrieve_coupled_hamiltonian_B_sqlite,
     retrieve_uncoupled_hamiltonian_X_sqlite,
 )
+from centrex_TlF.hamiltonian.utils_store import pre_calculated_store
 from tqdm import tqdm
 
 __all__ = [
@@ -38,30 +52,70 @@ __all__ = [
 ]
 
 
-def HMatElems(H, QN, progress=False, nprocs=1):
-    if nprocs > 1:
-        with multiprocessing.Pool(nprocs) as pool:
-            result = pool.starmap(
-                multi_HMatElems, [(H.__name__, i, a, QN) for i, a in enumerate(QN)]
-            )
-            result = np.sum(result, axis=0)
+def HMatElems(H, QN, progress=False, nprocs=1, pool=None):
+    """Calculate the matrix of an operator in the basis QN. H is applied once to
+    each basis state and the components of the result are looked up in the
+    basis, the lower triangle is the conjugate of the upper triangle.
+
+    Args:
+        H (callable, str): operator acting on a basis state, or the key it is
+                            registered under, see register_operator
+        QN (list, np.ndarray, Basis): basis states
+        progress (bool, optional): display tqdm progress bar. Defaults to False.
+        nprocs (int, optional): number of processes. Defaults to 1.
+        pool (multiprocessing.Pool, optional): pool created with create_pool for
+                                                QN, reused instead of creating a
+                                                new pool. H has to be a built-in
+                                                operator or supplied to
+                                                create_pool. Defaults to None.
+
+    Returns:
+        np.ndarray: matrix with elements <QN[i]|H|QN[j]>
+    """
+    if pool is None and nprocs > 1:
+        # only H is sent to the workers, unregistered operators under a key
+        # that is only valid in this pool
+        if isinstance(H, str):
+            H = get_operator(H)
+        try:
+            key = operator_key(H)
+        except KeyError:
+            key = f"HMatElems.{id(H)}"
+        with create_pool(nprocs, QN, operators={key: H}) as pool:
+            return HMatElems(key, QN, nprocs=nprocs, pool=pool)
+
+    if pool is not None:
+        # workers calculate contiguous blocks of columns and return the
+        # nonzero elements, keys are looked up in the registry of the workers
+        key = H if isinstance(H, str) else operator_key(H)
+        tasks = [(key, start, stop) for start, stop in blocks(len(QN), nprocs)]
+        triplets = pool.starmap(multi_HMatElems, tasks)
+        rows, cols, values = (np.concatenate(x) for x in zip(*triplets))
     else:
-        result = np.zeros((len(QN), len(QN)), dtype=complex)
-        for i, a in tqdm(enumerate(QN), total=len(QN), disable=not progress):
-            for j in range(i, len(QN)):
-                b = QN[j]
-                val = (1 * a) @ H(b)
-                result[i, j] = val
-                if i != j:
-                    result[j, i] = np.conjugate(val)
-    return result
+        if isinstance(H, str):
+            H = get_operator(H)
+        positions = _registry_positions(QN)
+        columns = [
+            _matrix_elements_column(H, j, QN, positions)
+            for j in tqdm(range(len(QN)), disable=not progress)
+        ]
+        rows = np.concatenate([np.zeros(0, dtype=int)] + [r for r, _ in columns])
+        values = np.concatenate([np.zeros(0, dtype=complex)] + [v for _, v in columns])
+        cols = np.repeat(np.arange(len(QN)), [r.size for r, _ in columns])
+
+    upper = scipy.sparse.coo_matrix(
+        (values, (rows, cols)), shape=(len(QN), len(QN))
+    ).toarray()
+    return upper + np.triu(upper, 1).conj().T
 
 
 def generate_uncoupled_hamiltonian_X(QN, nprocs=1):
     """
     Generate the uncoupled X state hamiltonian for the supplied set of
     basis states.
-    Retrieved from a pre-calculated sqlite3 database
+    Retrieved from a pre-calculated sqlite3 database, or its memory-mapped copy.
+    Hamiltonians that are not pre-calculated are cached after calculating, see
+    cached_terms
 
     Args:
         QN (array): array of UncoupledBasisStates
@@ -75,24 +129,42 @@ def generate_uncoupled_hamiltonian_X(QN, nprocs=1):
     pre_cached = check_states_uncoupled_hamiltonian_X(QN)
 
     if pre_cached:
+        # memory-mapped copy of the database, see MatrixStore
+        store = pre_calculated_store("uncoupled_hamiltonian_X")
+        if store is not None:
+            return store.retrieve(QN)
+
         path = Path(__file__).parent.parent / "pre_calculated"
         db = path / "uncoupled_hamiltonian_X.db"
-
         return retrieve_uncoupled_hamiltonian_X_sqlite(QN, db)
     else:
-        logging.warning(
-            "X state Hamiltonian not pre-cached for supplied states, calculating"
+
+        def calculate():
+            logging.warning(
+                "X state Hamiltonian not pre-cached for supplied states, calculating"
+            )
+            return calculate_uncoupled_hamiltonian_X(QN, nprocs)
+
+        # calculated terms are stored in the cache directory for later calls
+        return cached_terms(
+            "uncoupled_hamiltonian_X",
+            QN,
+            ["Hff", "HSx", "HSy", "HSz", "HZx", "HZy", "HZz"],
+            calculate,
+            constants=(cst_X,),
+            sources=_TERM_SOURCES["uncoupled_hamiltonian_X"],
         )
-        return calculate_uncoupled_hamiltonian_X(QN, nprocs)
 
 
 def calculate_uncoupled_hamiltonian_X(QN, nprocs=1):
     """Calculate the uncoupled X state hamiltonian for the supplies set of
     basis states.
-    Calculated directly from supplied basis states
+    Calculated directly from supplied basis states, with the terms evaluated as
+    products of sparse angular momentum operator matrices, see SparseOperators
 
     Args:
         QN (array): array of UncoupledBasisStates
+        nprocs (int, optional): unused, kept for compatibility
 
     Returns:
         dict: dictionary with all X state hamiltonian terms
@@ -100,21 +172,29 @@ def calculate_uncoupled_hamiltonian_X(QN, nprocs=1):
     for qn in QN:
         assert qn.isUncoupled, "supply list with UncoupledBasisStates"
 
-    return {
-        "Hff": HMatElems(Hff_X_alt, QN, nprocs=nprocs),
-        "HSx": HMatElems(HSx, QN, nprocs=nprocs),
-        "HSy": HMatElems(HSy, QN, nprocs=nprocs),
-        "HSz": HMatElems(HSz, QN, nprocs=nprocs),
-        "HZx": HMatElems(HZx_X, QN, nprocs=nprocs),
-        "HZy": HMatElems(HZy_X, QN, nprocs=nprocs),
-        "HZz": HMatElems(HZz_X, QN, nprocs=nprocs),
-    }
+    operators = SparseOperators(QN)
+    H = {}
+    for name, term in [
+        ("Hff", sparse_operators.Hff_X_alt),
+        ("HSx", sparse_operators.HSx),
+        ("HSy", sparse_operators.HSy),
+        ("HSz", sparse_operators.HSz),
+        ("HZx", sparse_operators.HZx_X),
+        ("HZy", sparse_operators.HZy_X),
+        ("HZz", sparse_operators.HZz_X),
+    ]:
+        # hermitian from the upper triangle, as in HMatElems
+        matrix = operators.project(term(operators)).astype(complex)
+        H[name] = np.triu(matrix) + np.triu(matrix, 1).conj().T
+    return H
 
 
 def generate_coupled_hamiltonian_B(QN, nprocs=1):
     """Calculate the coupled B state hamiltonian for the supplied set of
     basis states.
-    Retrieved from a pre-calculated sqlite3 database
+    Retrieved from a pre-calculated sqlite3 database, or its memory-mapped copy.
+    Hamiltonians that are not pre-calculated are cached after calculating, see
+    cached_terms
 
     Args:
         QN (array): array of UncoupledBasisStates
@@ -128,26 +208,68 @@ def generate_coupled_hamiltonian_B(QN, nprocs=1):
     pre_cached = check_states_coupled_hamiltonian_B(QN)
 
     if pre_cached:
+        # memory-mapped copy of the database, see MatrixStore
+        store = pre_calculated_store("coupled_hamiltonian_B")
+        if store is not None:
+            return store.retrieve(QN)
+
         path = Path(__file__).parent.parent / "pre_calculated"
         db = path / "coupled_hamiltonian_B.db"
-
         return retrieve_coupled_hamiltonian_B_sqlite(QN, db)
     else:
-        logging.warning(
-            "B state Hamiltonian not pre-cached for supplied states, calculating"
+
+        def calculate():
+            logging.warning(
+                "B state Hamiltonian not pre-cached for supplied states, calculating"
+            )
+            return calculate_coupled_hamiltonian_B(QN, nprocs)
+
+        # calculated terms are stored in the cache directory for later calls
+        return cached_terms(
+            "coupled_hamiltonian_B",
+            QN,
+            ["Hrot", "H_mhf_Tl", "H_mhf_F", "H_LD", "H_cp1_Tl", "H_c_Tl", "HZz"],
+            calculate,
+            constants=(cst_B,),
+            sources=_TERM_SOURCES["coupled_hamiltonian_B"],
         )
-        return calculate_coupled_hamiltonian_B(QN, nprocs)
 
 
 def calculate_coupled_hamiltonian_B(QN, nprocs=1):
     for qn in QN:
         assert qn.isCoupled, "supply list withCoupledBasisStates"
-    return {
-        "Hrot": HMatElems(Hrot_B, QN, nprocs=nprocs),
-        "H_mhf_Tl": HMatElems(H_mhf_Tl, QN, nprocs=nprocs),
-        "H_mhf_F": HMatElems(H_mhf_F, QN, nprocs=nprocs),
-        "H_LD": HMatElems(H_LD, QN, nprocs=nprocs),
-        "H_cp1_Tl": HMatElems(H_cp1_Tl, QN, nprocs=nprocs),
-        "H_c_Tl": HMatElems(H_c_Tl, QN, nprocs=nprocs),
-        "HZz": HMatElems(HZz_B, QN, nprocs=nprocs),
+    terms = {
+        "Hrot": Hrot_B,
+        "H_mhf_Tl": H_mhf_Tl,
+        "H_mhf_F": H_mhf_F,
+        "H_LD": H_LD,
+        "H_cp1_Tl": H_cp1_Tl,
+        "H_c_Tl": H_c_Tl,
+        "HZz": HZz_B,
     }
+    if nprocs > 1:
+        # share a single pool between all terms
+        operators = {operator_key(H): H for H in terms.values()}
+        with create_pool(nprocs, QN, operators=operators) as pool:
+            return {
+                name: HMatElems(H, QN, nprocs=nprocs, pool=pool)
+                for name, H in terms.items()
+            }
+    return {name: HMatElems(H, QN) for name, H in terms.items()}
+
+
+# code that calculates the terms, part of the term cache keys, see cached_terms
+_TERM_SOURCES = {
+    "uncoupled_hamiltonian_X": (calculate_uncoupled_hamiltonian_X, sparse_operators),
+    "coupled_hamiltonian_B": (
+        calculate_coupled_hamiltonian_B,
+        HMatElems,
+        _matrix_elements_column,
+        hamiltonian_B_terms_coupled,
+        quantum_operators,
+        sixj_f,
+        threej_f,
+        wigner,
+        wigner_table,
+    ),
+}
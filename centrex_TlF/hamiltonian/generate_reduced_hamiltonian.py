@@ -1,15 +1,27 @@
+import sys
+
 import centrex_TlF
+import centrex_TlF.constants.constants_B as cst_B
+import centrex_TlF.constants.constants_X as cst_X
 import centrex_TlF.states as states
 import numpy as np
 import scipy
 import scipy.linalg
+from centrex_TlF.hamiltonian import (
+    basis_transform, generate_hamiltonian, hamiltonian_B_terms_coupled,
+    quantum_operators, sparse_operators, utils, utils_sqlite, utils_store,
+    wigner, wigner_table)
 from centrex_TlF.hamiltonian.basis_transform import generate_transform_matrix
 from centrex_TlF.hamiltonian.generate_hamiltonian import (
     generate_coupled_hamiltonian_B, generate_uncoupled_hamiltonian_X)
 from centrex_TlF.hamiltonian.utils import (
+    _as_real, eigh_blocked, eigh_incremental, eigh_partial,
     generate_coupled_hamiltonian_B_function,
     generate_uncoupled_hamiltonian_X_function, matrix_to_states,
     reduced_basis_hamiltonian, reorder_evecs)
+from centrex_TlF.hamiltonian.utils_cache import (
+    cached_result, constants_fingerprint, pre_calculated_fingerprint,
+    source_fingerprint, states_fingerprint)
 
 __all__ = [
     "generate_reduced_X_hamiltonian",
@@ -21,12 +33,35 @@ __all__ = [
 
 
 def generate_diagonalized_hamiltonian(
-    hamiltonian, keep_order=True, return_V_ref=False, rtol=None
+    hamiltonian,
+    keep_order=True,
+    return_V_ref=False,
+    rtol=None,
+    nthreads=1,
+    window=None,
+    V_start=None,
+    atol=2 * np.pi,
 ):
-    D, V = np.linalg.eigh(hamiltonian)
+    assert window is None or V_start is None, "supply one of window or V_start"
+    if window is not None:
+        # only the eigenstates with energies within the window, V has a column
+        # for each of them, see eigh_partial
+        D, V = eigh_partial(hamiltonian, window=window)
+    elif V_start is not None:
+        # eigenstates updated from those of a nearby Hamiltonian, e.g. V of the
+        # previous point of a field ramp, to within a residual norm atol [2π Hz]
+        # and diagonalized fully otherwise, see eigh_incremental
+        D, V = eigh_incremental(hamiltonian, V_start, atol, nthreads=nthreads)
+    else:
+        # blocks of states that aren't coupled, e.g. different mF for fields
+        # along z, are diagonalized separately
+        D, V = eigh_blocked(hamiltonian, nthreads=nthreads)
     if keep_order:
-        V_ref = np.eye(V.shape[0])
-        D, V = reorder_evecs(V, D, V_ref)
+        D, V = reorder_evecs(V, D, np.eye(V.shape[0]))
+        # reference in the basis of the returned eigenstates, the basis of
+        # hamiltonian_diagonalized, e.g. for find_exact_states; for a window it
+        # only contains the eigenstates within the window
+        V_ref = np.eye(V.shape[1])
 
     hamiltonian_diagonalized = V.conj().T @ hamiltonian @ V
     if rtol:
@@ -52,7 +87,8 @@ def generate_reduced_X_hamiltonian(
     )
     H_X_uc = generate_uncoupled_hamiltonian_X(QN)
     H_X_uc = generate_uncoupled_hamiltonian_X_function(H_X_uc)
-    S_transform = generate_transform_matrix(QN, ground_states_approx)
+    # Clebsch-Gordan coefficients are real, keeps H_X real without y fields
+    S_transform = _as_real(generate_transform_matrix(QN, ground_states_approx))
 
     H_X = S_transform.conj().T @ H_X_uc(E, B) @ S_transform
     if rtol:
@@ -86,19 +122,11 @@ def generate_reduced_B_hamiltonian(
     Jmax=3,
 ):
     # need to generate other states because excited states are mixed
-    Ps = [-1, 1]
-    I_F = 1 / 2
-    I_Tl = 1 / 2
-    QN_B = [
-        centrex_TlF.CoupledBasisState(
-            F, mF, F1, J, I_F, I_Tl, P=P, Omega=1, electronic_state="B"
+    QN_B = states.Basis.from_quantum_numbers(
+        states.generate_coupled_quantum_numbers(
+            np.arange(Jmin, Jmax + 1), "B", Ps=[-1, 1], Ωs=1
         )
-        for J in np.arange(Jmin, Jmax + 1)
-        for F1 in np.arange(np.abs(J - I_F), J + I_F + 1)
-        for F in np.arange(np.abs(F1 - I_Tl), F1 + I_Tl + 1)
-        for mF in np.arange(-F, F + 1)
-        for P in Ps
-    ]
+    )
 
     for qn in excited_states_approx:
         assert qn.isCoupled, "supply list of CoupledBasisStates"
@@ -131,12 +159,16 @@ def compose_reduced_hamiltonian(H_X_red, H_B_red, element_limit=0.1):
 
 
 def generate_total_reduced_hamiltonian(
-    ground_states_approx, excited_states_approx, Jmin=None, Jmax=None, rtol=None
+    ground_states_approx,
+    excited_states_approx,
+    Jmin=None,
+    Jmax=None,
+    rtol=None,
+    E=np.array([0, 0, 0]),
+    B=np.array([0, 0, 0.001]),
+    cache=True,
+    cache_to_disk=False,
 ):
-    ground_states, H_X_red = generate_reduced_X_hamiltonian(
-        ground_states_approx, rtol=rtol
-    )
-
     # Js to include for rotational mixing in B state
     Jexc = np.unique([s.J for s in excited_states_approx])
     if not Jmin:
@@ -145,11 +177,51 @@ def generate_total_reduced_hamiltonian(
     if not Jmax:
         Jmax = np.max(Jexc) + 1
 
-    excited_states, H_B_red = generate_reduced_B_hamiltonian(
-        excited_states_approx, Jmin=Jmin, Jmax=Jmax, rtol=rtol
-    )
+    def calculate():
+        ground_states, H_X_red = generate_reduced_X_hamiltonian(
+            ground_states_approx, E=E, B=B, rtol=rtol
+        )
+        excited_states, H_B_red = generate_reduced_B_hamiltonian(
+            excited_states_approx, E=E, B=B, Jmin=Jmin, Jmax=Jmax, rtol=rtol
+        )
 
-    H_int, V_ref_int = compose_reduced_hamiltonian(H_X_red, H_B_red)
+        H_int, V_ref_int = compose_reduced_hamiltonian(H_X_red, H_B_red)
+
+        QN = list(np.append(ground_states, excited_states))
+        return ground_states, excited_states, QN, H_int, V_ref_int
+
+    if not cache:
+        return calculate()
+
+    # memoized on all inputs, e.g. for repeated generate_OBE_system calls with
+    # the same SystemParameters, and the code and pre-calculated data used,
+    # see cached_result
+    sources = [
+        sys.modules[__name__],
+        basis_transform,
+        generate_hamiltonian,
+        hamiltonian_B_terms_coupled,
+        quantum_operators,
+        sparse_operators,
+        utils,
+        utils_sqlite,
+        utils_store,
+        wigner,
+        wigner_table,
+        states.generate_states,
+        states.utils,
+    ]
+    key = "|".join(
+        [
+            states_fingerprint(ground_states_approx),
+            states_fingerprint(excited_states_approx),
+            repr(np.asarray(E, dtype=float).tolist()),
+            repr(np.asarray(B, dtype=float).tolist()),
+            repr((int(Jmin), int(Jmax), None if rtol is None else float(rtol))),
+            constants_fingerprint(cst_X, cst_B),
+            source_fingerprint(*sources),
+            pre_calculated_fingerprint(),
+        ]
+    )
+    return cached_result("reduced_hamiltonian", key, calculate, to_disk=cache_to_disk)
 
-    QN = list(np.append(ground_states, excited_states))
-    return ground_states, excited_states, QN, H_int, V_ref_int
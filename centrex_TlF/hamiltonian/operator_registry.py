@@ -0,0 +1,140 @@
+import functools
+
+import centrex_TlF.hamiltonian.hamiltonian_B_terms_coupled as terms_coupled
+import centrex_TlF.hamiltonian.hamiltonian_terms_uncoupled as terms_uncoupled
+
+__all__ = [
+    "register_operator",
+    "get_operator",
+    "operator_key",
+    "registered_operators",
+]
+
+# Hamiltonian term operators by key, operators act on a single basis state and
+# return a State
+_operators = {}
+
+# keys of the registered operators by id of the operator
+_keys = {}
+
+
+def register_operator(key, function=None, **constants):
+    """Register a Hamiltonian term operator under a key, so that it can be
+    looked up by worker processes and used as a cache key. Keyword arguments
+    are bound to the operator, e.g. to use custom constants:
+
+        register_operator("Hc1_fit", Hc1, c1=14.2e3)
+
+    Without function, returns a decorator that registers the decorated
+    operator.
+
+    Args:
+        key (str): key of the operator
+        function (callable, optional): operator acting on a basis state.
+                                        Defaults to None.
+
+    Returns:
+        callable: registered operator
+    """
+    if function is None:
+        return lambda function: register_operator(key, function, **constants)
+    assert callable(function), "operator has to be callable"
+    if constants:
+        function = functools.partial(function, **constants)
+    _operators[key] = function
+    _keys[id(function)] = key
+    return function
+
+
+def get_operator(key):
+    """Return the operator registered under key
+
+    Args:
+        key (str): key of the operator
+
+    Returns:
+        callable: operator
+    """
+    try:
+        return _operators[key]
+    except KeyError:
+        raise KeyError(f"no operator registered under {key}") from None
+
+
+def operator_key(function):
+    """Return the key of a registered operator
+
+    Args:
+        function (callable, str): operator or its key
+
+    Returns:
+        str: key of the operator
+    """
+    if isinstance(function, str):
+        get_operator(function)
+        return function
+    key = _keys.get(id(function))
+    if key is None or _operators.get(key) is not function:
+        # registered under several keys, and one of them was replaced
+        key = next((k for k, f in _operators.items() if f is function), None)
+    if key is None:
+        raise KeyError(
+            f"operator {function!r} is not registered, register it with "
+            "register_operator to look it up by key"
+        )
+    return key
+
+
+def registered_operators():
+    """Return the registered operators
+
+    Returns:
+        dict: operators by key
+    """
+    return _operators.copy()
+
+
+# built-in terms, keyed by the basis they act on and their name
+for _name in [
+    "Hrot_B",
+    "H_LD",
+    "H_mhf_Tl",
+    "H_mhf_F",
+    "H_c_Tl",
+    "H_cp1_Tl",
+    "HZz_B",
+]:
+    register_operator(f"coupled.{_name}", getattr(terms_coupled, _name))
+
+for _name in [
+    "Hrot_X",
+    "Hc1",
+    "Hc2",
+    "Hc4",
+    "Hc3a",
+    "Hc3b",
+    "Hc3c",
+    "Hc3",
+    "Hff_X",
+    "H_LD",
+    "H_c1p",
+    "H_mhf_Tl",
+    "H_mhf_F",
+    "HZx_X",
+    "HZy_X",
+    "HZz_X",
+    "HZx_B",
+    "HZy_B",
+    "HZz_B",
+    "HSx",
+    "HSy",
+    "HSz",
+    "R10",
+    "R1m",
+    "R1p",
+    "HI1R",
+    "HI2R",
+    "Hc3_alt",
+    "Hff_X_alt",
+]:
+    register_operator(f"uncoupled.{_name}", getattr(terms_uncoupled, _name))
@@ -0,0 +1,431 @@
+import centrex_TlF.constants.constants_X as cst_X
+import numpy as np
+import scipy.sparse
+from centrex_TlF.states.basis import UNCOUPLED_BASIS_FIELDS
+
+__all__ = ["SparseOperators"]
+
+########################################################
+# Elementary operators acting on arrays of uncoupled basis states, each returns
+# a list of (amplitudes, quantum numbers) for the components of the result
+########################################################
+
+
+def _shifted(qn, **shifts):
+    ket = qn.copy()
+    for name, shift in shifts.items():
+        ket[name] = qn[name] + shift
+    return ket
+
+
+def _J2(qn):
+    return [(qn["J"] * (qn["J"] + 1), qn)]
+
+
+def _J4(qn):
+    return [((qn["J"] * (qn["J"] + 1)) ** 2, qn)]
+
+
+def _J6(qn):
+    return [((qn["J"] * (qn["J"] + 1)) ** 3, qn)]
+
+
+def _Jz(qn):
+    return [(qn["mJ"], qn)]
+
+
+def _I1z(qn):
+    return [(qn["m1"], qn)]
+
+
+def _I2z(qn):
+    return [(qn["m2"], qn)]
+
+
+def _raising(j, m):
+    return np.sqrt((j - m) * (j + m + 1))
+
+
+def _lowering(j, m):
+    return np.sqrt((j + m) * (j - m + 1))
+
+
+def _Jp(qn):
+    return [(_raising(qn["J"], qn["mJ"]), _shifted(qn, mJ=1))]
+
+
+def _Jm(qn):
+    return [(_lowering(qn["J"], qn["mJ"]), _shifted(qn, mJ=-1))]
+
+
+def _I1p(qn):
+    return [(_raising(qn["I1"], qn["m1"]), _shifted(qn, m1=1))]
+
+
+def _I1m(qn):
+    return [(_lowering(qn["I1"], qn["m1"]), _shifted(qn, m1=-1))]
+
+
+def _I2p(qn):
+    return [(_raising(qn["I2"], qn["m2"]), _shifted(qn, m2=1))]
+
+
+def _I2m(qn):
+    return [(_lowering(qn["I2"], qn["m2"]), _shifted(qn, m2=-1))]
+
+
+def _rotational(qn, dJ, dmJ):
+    # states of different J have the parity of the X state
+    ket = _shifted(qn, J=dJ, mJ=dmJ)
+    ket["P"] = (-1.0) ** ket["J"]
+    return ket
+
+
+def _R10(qn):
+    J, mJ = qn["J"], qn["mJ"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        amp1 = np.sqrt(2) * np.sqrt((J - mJ) * (J + mJ) / (8 * J ** 2 - 2))
+        amp2 = np.sqrt(2) * np.sqrt(
+            (J - mJ + 1) * (J + mJ + 1) / (6 + 8 * J * (J + 2))
+        )
+    return [(amp1, _rotational(qn, -1, 0)), (amp2, _rotational(qn, 1, 0))]
+
+
+def _R1m(qn):
+    J, mJ = qn["J"], qn["mJ"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        amp1 = -0.5 * np.sqrt(2) * np.sqrt((J + mJ) * (J + mJ - 1) / (4 * J ** 2 - 1))
+        amp2 = (
+            0.5
+            * np.sqrt(2)
+            * np.sqrt((J - mJ + 1) * (J - mJ + 2) / (3 + 4 * J * (J + 2)))
+        )
+    return [(amp1, _rotational(qn, -1, -1)), (amp2, _rotational(qn, 1, -1))]
+
+
+def _R1p(qn):
+    J, mJ = qn["J"], qn["mJ"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        amp1 = -0.5 * np.sqrt(2) * np.sqrt((J - mJ) * (J - mJ - 1) / (4 * J ** 2 - 1))
+        amp2 = (
+            0.5
+            * np.sqrt(2)
+            * np.sqrt((J + mJ + 1) * (J + mJ + 2) / (3 + 4 * J * (J + 2)))
+        )
+    return [(amp1, _rotational(qn, -1, 1)), (amp2, _rotational(qn, 1, 1))]
+
+
+# operators with the same names as in quantum_operators and
+# hamiltonian_terms_uncoupled
+_OPERATORS = {
+    "J2": _J2,
+    "J4": _J4,
+    "J6": _J6,
+    "Jz": _Jz,
+    "I1z": _I1z,
+    "I2z": _I2z,
+    "Jp": _Jp,
+    "Jm": _Jm,
+    "I1p": _I1p,
+    "I1m": _I1m,
+    "I2p": _I2p,
+    "I2m": _I2m,
+    "R10": _R10,
+    "R1m": _R1m,
+    "R1p": _R1p,
+}
+
+
+def _keys(qn):
+    """Hashable rows of a quantum number array, with undefined quantum numbers
+    replaced so that they compare equal
+    """
+    qn = qn.copy()
+    for name in ["Omega", "P"]:
+        qn[name][np.isnan(qn[name])] = np.inf
+    return qn.tolist()
+
+
+def _quantum_number_array(basis):
+    """Quantum number array of uncoupled basis states, see
+    Basis.from_quantum_numbers
+    """
+    table = getattr(basis, "_table", None)
+    if table is not None and table.dtype == UNCOUPLED_BASIS_FIELDS:
+        return table
+
+    def number(value):
+        return np.nan if value is None else value
+
+    return np.array(
+        [
+            (
+                s.J,
+                s.mJ,
+                s.I1,
+                s.m1,
+                s.I2,
+                s.m2,
+                number(s.Omega),
+                number(s.P),
+                s.electronic_state or "",
+            )
+            for s in basis
+        ],
+        dtype=UNCOUPLED_BASIS_FIELDS,
+    )
+
+
+class SparseOperators:
+    """Angular momentum operators acting on uncoupled basis states as sparse
+    matrices, e.g. operators["Jp"] or operators["R10"]. Composite operators are
+    products and sums of these matrices.
+
+    The matrices act on an extended basis, consisting of the supplied basis and
+    all states reached from it by applying up to depth operators. Products of up
+    to depth + 1 operators projected onto the supplied basis with project are
+    then identical to applying the operators to one basis state at a time.
+
+    Args:
+        basis (list, np.ndarray, Basis): UncoupledBasisStates
+        depth (int, optional): number of operator applications the extended
+                                basis is closed under. Defaults to 3.
+    """
+
+    def __init__(self, basis, depth=3):
+        table = _quantum_number_array(basis)
+        self._positions = {}
+        for key in _keys(table):
+            self._positions.setdefault(key, len(self._positions))
+        self._basis_positions = np.array(
+            [self._positions[key] for key in _keys(table)], dtype=int
+        )
+
+        # extend the basis with the states reached by the operators
+        tables = [table[np.unique(self._basis_positions, return_index=True)[1]]]
+        frontier = tables[0]
+        for _ in range(depth):
+            new = []
+            for operator in _OPERATORS.values():
+                for amps, kets in operator(frontier):
+                    kets = kets[amps != 0]
+                    added = []
+                    for i, key in enumerate(_keys(kets)):
+                        if key not in self._positions:
+                            self._positions[key] = len(self._positions)
+                            added.append(i)
+                    new.append(kets[added])
+            frontier = np.concatenate(new)
+            if frontier.size == 0:
+                break
+            tables.append(frontier)
+        self.quantum_numbers = np.concatenate(tables)
+        self._matrices = {}
+
+    def __len__(self):
+        return len(self.quantum_numbers)
+
+    def __getitem__(self, name):
+        matrix = self._matrices.get(name)
+        if matrix is None:
+            matrix = self._matrix(_OPERATORS[name])
+            self._matrices[name] = matrix
+        return matrix
+
+    def _matrix(self, operator):
+        rows, columns, values = [], [], []
+        for amps, kets in operator(self.quantum_numbers):
+            positions = np.array(
+                [self._positions.get(key, -1) for key in _keys(kets)], dtype=int
+            )
+            # components outside the extended basis are dropped
+            keep = (amps != 0) & (positions >= 0)
+            rows.append(positions[keep])
+            columns.append(np.nonzero(keep)[0])
+            values.append(amps[keep])
+        return scipy.sparse.csr_matrix(
+            (np.concatenate(values), (np.concatenate(rows), np.concatenate(columns))),
+            shape=(len(self), len(self)),
+        )
+
+    def diagonal(self, values):
+        """Diagonal operator with the supplied value for each state of the
+        extended basis
+
+        Args:
+            values (np.ndarray): values, e.g. a function of
+                                operators.quantum_numbers["J"]
+
+        Returns:
+            scipy.sparse.csr_matrix: diagonal operator
+        """
+        return scipy.sparse.diags(values, format="csr")
+
+    def project(self, operator):
+        """Matrix elements of an operator between the states of the supplied
+        basis
+
+        Args:
+            operator (scipy.sparse.spmatrix): operator on the extended basis
+
+        Returns:
+            np.ndarray: matrix with elements <basis_i|operator|basis_j>
+        """
+        positions = self._basis_positions
+        return operator.tocsr()[positions][:, positions].toarray()
+
+
+########################################################
+# X state Hamiltonian terms as sparse matrices on the extended basis of
+# operators, see hamiltonian_terms_uncoupled
+########################################################
+
+
+def Hrot_X(operators):
+    return cst_X.B_rot_X * operators["J2"]
+
+
+def Hc1(operators, c1=cst_X.c1):
+    return c1 * (
+        operators["I1z"] @ operators["Jz"]
+        + (1 / 2)
+        * (operators["I1p"] @ operators["Jm"] + operators["I1m"] @ operators["Jp"])
+    )
+
+
+def Hc2(operators, c2=cst_X.c2):
+    return c2 * (
+        operators["I2z"] @ operators["Jz"]
+        + (1 / 2)
+        * (operators["I2p"] @ operators["Jm"] + operators["I2m"] @ operators["Jp"])
+    )
+
+
+def Hc4(operators, c4=cst_X.c4):
+    return c4 * (
+        operators["I1z"] @ operators["I2z"]
+        + (1 / 2)
+        * (operators["I1p"] @ operators["I2m"] + operators["I1m"] @ operators["I2p"])
+    )
+
+
+def _J_factor(operators):
+    # 1 / ((2J + 3) (2J - 1)) of the state the operator acts on
+    J = operators.quantum_numbers["J"]
+    return operators.diagonal(1 / ((2 * J + 3) * (2 * J - 1)))
+
+
+def Hc3a(operators, c1=cst_X.c1, c2=cst_X.c2, c3=cst_X.c3):
+    return (
+        15 * c3 / c1 / c2 * Hc1(operators) @ Hc2(operators) @ _J_factor(operators)
+    )
+
+
+def Hc3b(operators, c1=cst_X.c1, c2=cst_X.c2, c3=cst_X.c3):
+    return (
+        15 * c3 / c2 / c1 * Hc2(operators) @ Hc1(operators) @ _J_factor(operators)
+    )
+
+
+def Hc3c(operators, c3=cst_X.c3, c4=cst_X.c4, B_rot=cst_X.B_rot_X):
+    return (
+        -10
+        * c3
+        / c4
+        / B_rot
+        * Hc4(operators)
+        @ Hrot_X(operators)
+        @ _J_factor(operators)
+    )
+
+
+def Hff_X(operators):
+    return (
+        Hrot_X(operators)
+        + Hc1(operators)
+        + Hc2(operators)
+        + Hc3a(operators)
+        + Hc3b(operators)
+        + Hc3c(operators)
+        + Hc4(operators)
+    )
+
+
+def HI1R(operators):
+    return (
+        operators["I1z"] @ operators["R10"]
+        + (operators["I1p"] @ operators["R1m"] - operators["I1m"] @ operators["R1p"])
+        / np.sqrt(2)
+    )
+
+
+def HI2R(operators):
+    return (
+        operators["I2z"] @ operators["R10"]
+        + (operators["I2p"] @ operators["R1m"] - operators["I2m"] @ operators["R1p"])
+        / np.sqrt(2)
+    )
+
+
+def Hc3_alt(operators, c3=cst_X.c3, c4=cst_X.c4):
+    H1 = HI1R(operators)
+    H2 = HI2R(operators)
+    return 5 * c3 / c4 * Hc4(operators) - 15 * c3 / 2 * (H1 @ H2 + H2 @ H1)
+
+
+def Hff_X_alt(operators):
+    return (
+        Hrot_X(operators)
+        + Hc1(operators)
+        + Hc2(operators)
+        + Hc3_alt(operators)
+        + Hc4(operators)
+    )
+
+
+def _Zeeman_X(
+    operators, Jq, I1q, I2q, μ_J=cst_X.μ_J, μ_Tl=cst_X.μ_Tl, μ_F=cst_X.μ_F
+):
+    qn = operators.quantum_numbers
+    with np.errstate(divide="ignore"):
+        # the rotational term vanishes for J = 0
+        J_inverse = np.where(qn["J"] != 0, 1 / qn["J"], 0)
+    return (
+        -μ_J * Jq @ operators.diagonal(J_inverse)
+        - μ_Tl * I1q @ operators.diagonal(1 / qn["I1"])
+        - μ_F * I2q @ operators.diagonal(1 / qn["I2"])
+    )
+
+
+def HZx_X(operators):
+    return _Zeeman_X(
+        operators,
+        0.5 * (operators["Jp"] + operators["Jm"]),
+        0.5 * (operators["I1p"] + operators["I1m"]),
+        0.5 * (operators["I2p"] + operators["I2m"]),
+    )
+
+
+def HZy_X(operators):
+    return _Zeeman_X(
+        operators,
+        -0.5j * (operators["Jp"] - operators["Jm"]),
+        -0.5j * (operators["I1p"] - operators["I1m"]),
+        -0.5j * (operators["I2p"] - operators["I2m"]),
+    )
+
+
+def HZz_X(operators):
+    return _Zeeman_X(operators, operators["Jz"], operators["I1z"], operators["I2z"])
+
+
+def HSx(operators, D_TlF=cst_X.D_TlF):
+    return -D_TlF * (operators["R1m"] - operators["R1p"]) / np.sqrt(2)
+
+
+def HSy(operators, D_TlF=cst_X.D_TlF):
+    return -D_TlF * 1j * (operators["R1m"] + operators["R1p"]) / np.sqrt(2)
+
+
+def HSz(operators, D_TlF=cst_X.D_TlF):
+    return -D_TlF * operators["R10"]
@@ -1,8 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 
 import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+from centrex_TlF.hamiltonian.wigner_table import wigner_3j_table, wigner_6j_table
+from centrex_TlF.states.basis import as_basis, basis_registry
 from centrex_TlF.states.states import State
-from sympy.physics.wigner import wigner_3j, wigner_6j
+from scipy.sparse.csgraph import connected_components
 
 __all__ = [
     "reorder_evecs",
@@ -10,6 +15,10 @@ __all__ = [
     "generate_coupled_hamiltonian_B_function",
     "matrix_to_states",
     "reduced_basis_hamiltonian",
+    "block_indices",
+    "eigh_blocked",
+    "eigh_partial",
+    "eigh_incremental",
     "threej_f",
     "sixj_f",
 ]
@@ -17,12 +26,12 @@ __all__ = [
 
 @lru_cache(maxsize=int(1e6))
 def threej_f(j1, j2, j3, m1, m2, m3):
-    return complex(wigner_3j(j1, j2, j3, m1, m2, m3))
+    return complex(wigner_3j_table(j1, j2, j3, m1, m2, m3))
 
 
 @lru_cache(maxsize=int(1e6))
 def sixj_f(j1, j2, j3, j4, j5, j6):
-    return complex(wigner_6j(j1, j2, j3, j4, j5, j6))
+    return complex(wigner_6j_table(j1, j2, j3, j4, j5, j6))
 
 
 def reorder_evecs(V_in, E_in, V_ref):
@@ -48,79 +57,106 @@ def reorder_evecs(V_in, E_in, V_ref):
     return E_out, V_out
 
 
+def _as_real(H):
+    """Return the real part of a matrix if its imaginary part is zero, so that
+    products and diagonalization use real arithmetic
+
+    Args:
+        H (np.ndarray): matrix
+
+    Returns:
+        np.ndarray: real matrix, or H if it has a nonzero imaginary part
+    """
+    H = np.asarray(H)
+    if np.iscomplexobj(H) and not np.any(H.imag):
+        return H.real.copy()
+    return H
+
+
 def generate_uncoupled_hamiltonian_X_function(H):
-    ham_func = (
-        lambda E, B: 2
-        * np.pi
-        * (
-            H["Hff"]
-            + E[0] * H["HSx"]
-            + E[1] * H["HSy"]
-            + E[2] * H["HSz"]
-            + B[0] * H["HZx"]
-            + B[1] * H["HZy"]
-            + B[2] * H["HZz"]
-        )
-    )
+    """Return a function of the electric field E [V/cm] and magnetic field B
+    [G] that evaluates the X state Hamiltonian in 2π⋅Hz. Terms multiplied by a
+    zero field component are skipped, so the matrix is real (float64) if the
+    fields have no y components.
+
+    Args:
+        H (dict): X state Hamiltonian terms, see
+                    generate_uncoupled_hamiltonian_X
+
+    Returns:
+        callable: Hamiltonian as a function of E and B
+    """
+    terms = {name: _as_real(term) for name, term in H.items()}
+    names = ["HSx", "HSy", "HSz", "HZx", "HZy", "HZz"]
+
+    def ham_func(E, B):
+        H_total = terms["Hff"]
+        for name, field in zip(names, [*E, *B]):
+            if field != 0:
+                H_total = H_total + field * terms[name]
+        return 2 * np.pi * H_total
+
     return ham_func
 
 
 def generate_coupled_hamiltonian_B_function(H):
-    ham_func = (
-        lambda E, B: 2
-        * np.pi
-        * (
-            H["Hrot"]
-            + H["H_mhf_Tl"]
-            + H["H_mhf_F"]
-            + H["H_LD"]
-            + H["H_cp1_Tl"]
-            + H["H_c_Tl"]
-            + 0.01 * H["HZz"]
+    """Return a function of the electric field E [V/cm] and magnetic field B
+    [G] that evaluates the B state Hamiltonian in 2π⋅Hz, real (float64) if
+    all terms are real. The fields are currently not used, the Zeeman term is
+    evaluated at 0.01 G.
+
+    Args:
+        H (dict): B state Hamiltonian terms, see generate_coupled_hamiltonian_B
+
+    Returns:
+        callable: Hamiltonian as a function of E and B
+    """
+    terms = {name: _as_real(term) for name, term in H.items()}
+
+    def ham_func(E, B):
+        return (
+            2
+            * np.pi
+            * (
+                terms["Hrot"]
+                + terms["H_mhf_Tl"]
+                + terms["H_mhf_F"]
+                + terms["H_LD"]
+                + terms["H_cp1_Tl"]
+                + terms["H_c_Tl"]
+                + 0.01 * terms["HZz"]
+            )
         )
-    )
+
     return ham_func
 
 
-def matrix_to_states(V, QN, E=None):
-    """Turn a matrix of eigenvectors into a list of state objects
+def matrix_to_states(V, QN, E=None, tol=0):
+    """Turn a matrix of eigenvectors into a list of state objects. The
+    amplitudes of the states are views of a single sign corrected copy of V
+    where possible.
 
     Args:
         V (np.ndarray): array with columns corresponding to eigenvectors
         QN (list): list of State objects
         E (list, optional): list of energies corresponding to the states.
                             Defaults to None.
+        tol (float, optional): components with an absolute amplitude not larger
+                                than tol are omitted. Defaults to 0.
 
     Returns:
         list: list of eigenstates expressed as State objects
     """
-    # find dimensions of matrix
-    matrix_dimensions = V.shape
-
-    # initialize a list for storing eigenstates
-    eigenstates = []
-
-    for i in range(0, matrix_dimensions[1]):
-        # find state vector
-        state_vector = V[:, i]
+    V = np.asarray(V, dtype=complex)
 
-        # ensure that largest component has positive sign
-        index = np.argmax(np.abs(state_vector))
-        state_vector = state_vector * np.sign(state_vector[index])
+    # ensure that largest component of each state has positive sign
+    index = np.argmax(np.abs(V), axis=0)
+    V = V * np.sign(V[index, np.arange(V.shape[1])])
 
-        data = []
-
-        # get data in correct format for initializing state object
-        for j, amp in enumerate(state_vector):
-            data.append((amp, QN[j]))
-
-        # store the state in the list
-        state = State(data)
-
-        if E is not None:
-            state.energy = E[i]
-
-        eigenstates.append(state)
+    eigenstates = State._from_columns(V, QN, tol=tol)
+    if E is not None:
+        for state, energy in zip(eigenstates, E):
+            state.energy = energy
 
     # return the list of states
     return eigenstates
@@ -130,7 +166,7 @@ def reduced_basis_hamiltonian(basis_ori, H_ori, basis_red):
     """Generate Hamiltonian for a sub-basis of the original basis
 
     Args:
-        basis_ori (list): list of states of original basis
+        basis_ori (list, Basis): list of states of original basis
         H_ori (np.ndarray): original Hamiltonian
         basis_red (list): list of states of sub-basis
 
@@ -139,17 +175,304 @@ def reduced_basis_hamiltonian(basis_ori, H_ori, basis_red):
     """
 
     # Determine the indices of each of the reduced basis states
-    index_red = np.zeros(len(basis_red), dtype=int)
-    for i, state_red in enumerate(basis_red):
-        index_red[i] = basis_ori.index(state_red)
+    index_red = as_basis(basis_ori).indices_of(basis_red)
 
-    # Initialize matrix for Hamiltonian in reduced basis
-    H_red = np.zeros((len(basis_red), len(basis_red)), dtype=complex)
-
-    # Loop over reduced basis states and pick out the correct matrix elements
-    # for the Hamiltonian in the reduced basis
-    for i, state_i in enumerate(basis_red):
-        for j, state_j in enumerate(basis_red):
-            H_red[i, j] = H_ori[index_red[i], index_red[j]]
+    # Pick out the correct matrix elements for the Hamiltonian in the reduced
+    # basis
+    H_red = np.asarray(H_ori, dtype=complex)[np.ix_(index_red, index_red)]
 
     return H_red
+
+
+def block_indices(H):
+    """Find the blocks of a matrix that is block diagonal up to a permutation,
+    e.g. a Hamiltonian that conserves mF, as the connected components of its
+    nonzero elements
+
+    Args:
+        H (np.ndarray): matrix, or a stack of matrices with a common block
+                        structure
+
+    Returns:
+        list: arrays with the indices of each block, in ascending order
+    """
+    nonzero = np.asarray(H) != 0
+    if nonzero.ndim == 3:
+        nonzero = nonzero.any(axis=0)
+    rows, columns = np.nonzero(nonzero)
+    graph = scipy.sparse.coo_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, columns)), shape=nonzero.shape
+    )
+    _, labels = connected_components(graph, directed=False)
+    order = np.argsort(labels, kind="stable")
+    return np.split(order, np.cumsum(np.bincount(labels))[:-1])
+
+
+def eigh_blocked(H, nthreads=1):
+    """Eigenvalues and eigenvectors of a hermitian matrix, diagonalizing each
+    block of a block diagonal matrix independently, see block_indices. The
+    result is ordered by eigenvalue, as np.linalg.eigh.
+
+    Args:
+        H (np.ndarray): hermitian matrix
+        nthreads (int, optional): number of threads diagonalizing blocks in
+                                    parallel. Defaults to 1.
+
+    Returns:
+        tuple: eigenvalues and eigenvectors, eigenvectors are in the columns
+    """
+    H = np.asarray(H)
+    blocks = block_indices(H)
+    if len(blocks) == 1:
+        return np.linalg.eigh(H)
+
+    # blocks of equal size, e.g. +mF and -mF, are diagonalized in a single
+    # batched eigh
+    groups = {}
+    for indices in blocks:
+        groups.setdefault(len(indices), []).append(indices)
+    groups = [np.stack(group) for group in groups.values()]
+
+    def diagonalize(indices):
+        return np.linalg.eigh(H[indices[:, :, None], indices[:, None, :]])
+
+    if nthreads > 1:
+        with ThreadPoolExecutor(nthreads) as executor:
+            results = list(executor.map(diagonalize, groups))
+    else:
+        results = [diagonalize(indices) for indices in groups]
+
+    # place the eigenvectors of each block directly in the columns of their
+    # eigenvalues in ascending order
+    D = np.concatenate([D_group.ravel() for D_group, _ in results])
+    order = np.argsort(D, kind="stable")
+    columns = np.empty_like(order)
+    columns[order] = np.arange(len(order))
+    V = np.zeros(H.shape, dtype=np.result_type(H.dtype, float))
+    start = 0
+    for indices, (D_group, V_group) in zip(groups, results):
+        stop = start + D_group.size
+        columns_group = columns[start:stop].reshape(D_group.shape)
+        V[indices[:, :, None], columns_group[:, None, :]] = V_group
+        start = stop
+    return D[order], V
+
+
+def _eigsh(H, k, sigma):
+    """k eigenpairs of a sparse hermitian matrix closest to sigma, with
+    shift-invert Lanczos, or dense eigh if k is close to the dimension
+
+    Returns:
+        tuple: eigenvalues and eigenvectors
+    """
+    if k >= H.shape[0] - 1:
+        D, V = np.linalg.eigh(H.toarray())
+        order = np.argsort(np.abs(D - sigma), kind="stable")[:k]
+        return D[order], V[:, order]
+
+    # factoring H - sigma I fails if sigma is exactly an eigenvalue, e.g. the
+    # energy of a reference vector that is an eigenvector of a diagonal H; sigma
+    # is then moved off the eigenvalue by a small fraction of the spectral scale
+    scale = max(abs(sigma), abs(H).max()) or 1.0
+    for shift in [0, 1e-10, 1e-8, 1e-6]:
+        try:
+            D, V = scipy.sparse.linalg.eigsh(
+                H, k=k, sigma=sigma + shift * scale, which="LM"
+            )
+            break
+        except RuntimeError:
+            if shift == 1e-6:
+                raise
+    order = np.argsort(D)
+    return D[order], V[:, order]
+
+
+def eigh_partial(H, k=6, sigma=None, window=None, reference=None):
+    """Selected eigenvalues and eigenvectors of a hermitian matrix, calculated
+    with sparse shift-invert Lanczos (scipy.sparse.linalg.eigsh), so the cost
+    scales with the number of requested eigenpairs instead of the cube of the
+    dimension. The eigenpairs are selected by one of
+
+    - sigma: the k eigenpairs closest to sigma
+    - window: all eigenpairs with eigenvalues within (E_min, E_max)
+    - reference: the eigenpair with the largest overlap with each reference
+                    vector, searched among the k eigenpairs closest to the
+                    energy of the reference vector, and more if the overlap is
+                    below 1/2
+
+    Args:
+        H (np.ndarray, scipy.sparse.spmatrix): hermitian matrix
+        k (int, optional): number of eigenpairs. Defaults to 6.
+        sigma (float, optional): energy to find eigenpairs around. Defaults to
+                                    None.
+        window (tuple, optional): energy window (E_min, E_max). Defaults to
+                                    None.
+        reference (np.ndarray, optional): reference vectors in the columns.
+                                            Defaults to None.
+
+    Returns:
+        tuple: eigenvalues and eigenvectors in the columns, in ascending order
+                of the eigenvalues, or in the order of the reference vectors
+    """
+    assert (
+        sum(x is not None for x in [sigma, window, reference]) == 1
+    ), "supply one of sigma, window or reference"
+    H = scipy.sparse.csc_matrix(H)
+    N = H.shape[0]
+    k = min(k, N)
+
+    if sigma is not None:
+        return _eigsh(H, k, sigma)
+
+    if window is not None:
+        E_min, E_max = window
+        sigma = (E_min + E_max) / 2
+        # all eigenvalues within the window are found once an eigenvalue
+        # outside of it is
+        while True:
+            D, V = _eigsh(H, k, sigma)
+            if k == N or np.abs(D - sigma).max() > (E_max - E_min) / 2:
+                break
+            k = min(2 * k, N)
+        inside = (D >= E_min) & (D <= E_max)
+        return D[inside], V[:, inside]
+
+    reference = np.asarray(reference).reshape(N, -1)
+    eigenvalues, eigenvectors = [], []
+    for vector in reference.T:
+        vector = vector / np.linalg.norm(vector)
+        energy = np.real(vector.conj() @ (H @ vector))
+        k_vector = k
+        while True:
+            D, V = _eigsh(H, k_vector, energy)
+            overlaps = np.abs(vector.conj() @ V) ** 2
+            if k_vector == N or overlaps.max() > 0.5:
+                break
+            k_vector = min(2 * k_vector, N)
+        eigenvalues.append(D[np.argmax(overlaps)])
+        eigenvectors.append(V[:, np.argmax(overlaps)])
+    return np.array(eigenvalues), np.stack(eigenvectors, axis=1)
+
+
+def eigh_incremental(H, V_start, atol, eta=0.1, max_iterations=4, nthreads=1):
+    """Eigenvalues and eigenvectors of a hermitian matrix, updated from the
+    eigenvectors of a nearby matrix, e.g. the previous point of a slow field
+    ramp. In the starting basis H is nearly diagonal; the basis is refined with
+    first-order perturbative rotations, and clusters of (nearly) degenerate
+    states that are mixed strongly are diagonalized exactly (Rayleigh-Ritz
+    within the cluster). The residual norm |H v - E v| of each eigenvector
+    bounds the error of its eigenvalue; when it exceeds atol after
+    max_iterations, or the starting basis is too far off, H is diagonalized
+    with eigh_blocked instead.
+
+    Args:
+        H (np.ndarray): hermitian matrix
+        V_start (np.ndarray): orthonormal starting vectors in the columns,
+                                e.g. the eigenvectors of the previous matrix
+        atol (float): maximum residual norm of the eigenvectors, in the units
+                        of H
+        eta (float, optional): maximum first-order mixing amplitude
+                                |H_ij / (H_jj - H_ii)| of a perturbative
+                                rotation, more strongly mixed states are
+                                diagonalized as a cluster. Defaults to 0.1.
+        max_iterations (int, optional): maximum number of refinements.
+                                        Defaults to 4.
+        nthreads (int, optional): number of threads for the fallback, see
+                                    eigh_blocked. Defaults to 1.
+
+    Returns:
+        tuple: eigenvalues and eigenvectors, eigenvectors are in the columns,
+                in ascending order of the eigenvalues
+    """
+    H = np.asarray(H)
+    H_sparse = scipy.sparse.csr_matrix(H)
+    N = H.shape[0]
+    identity = np.eye(N)
+    V_start = np.asarray(V_start)
+    V = V_start.astype(np.result_type(H.dtype, V_start.dtype, float))
+    for _ in range(max_iterations + 1):
+        A = V.conj().T @ (H_sparse @ V)
+        D = np.diag(A).real.copy()
+        np.fill_diagonal(A, 0)
+        if np.linalg.norm(A, axis=0).max() <= atol:
+            order = np.argsort(D, kind="stable")
+            return D[order], V[:, order]
+
+        # couplings below atol / N add at most atol / sqrt(N) to a residual and
+        # are dropped, strongly mixed states are rotated exactly within their
+        # cluster until the remaining couplings are perturbative
+        A[np.abs(A) <= atol / N] = 0
+        gaps = D[None, :] - D[:, None]
+        strong = np.abs(A) > eta * np.abs(gaps)
+        for _ in range(max_iterations):
+            if not strong.any():
+                break
+            _, labels = connected_components(
+                scipy.sparse.coo_matrix(strong), directed=False
+            )
+            counts = np.bincount(labels)
+            if counts.max() > N // 2:
+                break
+            for label in np.nonzero(counts > 1)[0]:
+                cluster = np.nonzero(labels == label)[0]
+                A[cluster, cluster] = D[cluster]
+                _, U = np.linalg.eigh(A[np.ix_(cluster, cluster)])
+                A[:, cluster] = A[:, cluster] @ U
+                A[cluster, :] = U.conj().T @ A[cluster, :]
+                V[:, cluster] = V[:, cluster] @ U
+                # only the diagonal of the cluster was restored and rotated
+                D[cluster] = A[cluster, cluster].real
+                A[cluster, cluster] = 0
+            A[np.abs(A) <= atol / N] = 0
+            gaps = D[None, :] - D[:, None]
+            strong = np.abs(A) > eta * np.abs(gaps)
+        if strong.any():
+            break
+
+        # first-order rotation K is anti-hermitian up to rounding errors, which
+        # are removed because the Cayley transform Q = (1 - K/2)^-1 (1 + K/2)
+        # is only unitary for exactly anti-hermitian K; V Q is calculated as
+        # 2 V (1 - K/2)^-1 - V with a single solve
+        K = np.divide(A, gaps, out=np.zeros_like(A), where=A != 0)
+        K = (K - K.conj().T) / 2
+        V = 2 * np.linalg.solve((identity - K / 2).T, V.T).T - V
+    return eigh_blocked(H, nthreads=nthreads)
+
+
+def _registry_positions(QN):
+    """Return the position in QN of each basis registry index, the first
+    occurrence for duplicate basis states
+    """
+    positions = {}
+    for position, index in enumerate(basis_registry.register_states(QN).tolist()):
+        positions.setdefault(index, position)
+    return positions
+
+
+def _matrix_elements_column(H, j, QN, positions):
+    """Matrix elements <QN[i]|H|QN[j]> for i <= j, calculated by applying H to
+    QN[j] once and looking up the positions of its components in the basis
+
+    Args:
+        H (callable): operator acting on a basis state
+        j (int): position of the ket in QN
+        QN (list, Basis): basis states
+        positions (dict): position in QN of each basis registry index, see
+                            _registry_positions
+
+    Returns:
+        tuple: arrays with the row indices i and the matrix elements
+    """
+    b = QN[j]
+    Hb = 1 * H(b)
+    if Hb._indices.size == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=complex)
+    if Hb._basis_flags() != (b.isCoupled, b.isCoupled):
+        # components in the other basis (coupled or uncoupled) require a basis
+        # transformation, calculate the inner products directly
+        rows = np.arange(j + 1)
+        values = np.array([(1 * QN[i]) @ Hb for i in rows], dtype=complex)
+        return rows, values
+    rows = np.array([positions.get(index, -1) for index in Hb._indices.tolist()])
+    keep = (rows >= 0) & (rows <= j)
+    return rows[keep].astype(int), Hb._amps[keep]
@@ -0,0 +1,411 @@
+import collections
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import numbers
+import os
+import pickle
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse
+
+__all__ = [
+    "get_cache_dir",
+    "basis_fingerprint",
+    "states_fingerprint",
+    "constants_fingerprint",
+    "source_fingerprint",
+    "pre_calculated_fingerprint",
+    "cached_terms",
+    "cached_result",
+    "evict_cache",
+    "load_cached_file",
+    "pre_calculated_manifest",
+    "pre_calculated_transitions",
+    "preload_pre_calculated",
+]
+
+# environment variable that overrides the location of the cache directory, set
+# it to an empty string to disable caching to disk
+CACHE_DIR_ENV = "CENTREX_TLF_CACHE_DIR"
+
+# environment variable with the maximum size of the term cache in MB
+CACHE_SIZE_ENV = "CENTREX_TLF_CACHE_SIZE"
+CACHE_SIZE = 1024
+
+# directory with the pre-calculated data shipped with the package
+PRE_CALCULATED_DIR = Path(__file__).parent.parent / "pre_calculated"
+
+# contents of files loaded with load_cached_file by path, with the modification
+# time and size of the file when it was loaded
+_file_cache = {}
+
+# part of every term cache key, increment when the calculation of terms changes
+TERM_CACHE_VERSION = 1
+
+# part of every result cache key, increment when a cached calculation changes
+RESULT_CACHE_VERSION = 1
+
+# maximum number of results kept in memory by cached_result
+RESULT_CACHE_SIZE = 32
+
+# pickled results of cached_result by key, in order of use
+_result_cache = collections.OrderedDict()
+
+
+def get_cache_dir(subdirectory=None):
+    """Return the directory used to cache calculated quantities on disk,
+    ~/.cache/centrex_TlF unless overridden by the CENTREX_TLF_CACHE_DIR
+    environment variable. The directory is created if it does not exist.
+
+    Args:
+        subdirectory (str, optional): subdirectory of the cache directory.
+                                        Defaults to None.
+
+    Returns:
+        Path: cache directory, None if caching to disk is disabled or the
+                directory can't be created
+    """
+    path = os.environ.get(CACHE_DIR_ENV)
+    if path is None:
+        path = Path.home() / ".cache" / "centrex_TlF"
+    elif path == "":
+        return None
+    path = Path(path)
+    if subdirectory is not None:
+        path = path / subdirectory
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+    except OSError as error:
+        logging.warning(f"can't create cache directory {path}: {error}")
+        return None
+    return path
+
+
+def basis_fingerprint(QN):
+    """Return a hash of the quantum numbers of a set of basis states
+
+    Args:
+        QN (list, np.ndarray, Basis): basis states
+
+    Returns:
+        str: hexadecimal sha256 hash
+    """
+    digest = hashlib.sha256()
+    for state in QN:
+        digest.update(repr(_quantum_numbers_key(state)).encode())
+    return digest.hexdigest()
+
+
+def states_fingerprint(states):
+    """Return a hash of a set of states, basis states or superpositions of
+    basis states (State)
+
+    Args:
+        states (list, np.ndarray): states
+
+    Returns:
+        str: hexadecimal sha256 hash
+    """
+    digest = hashlib.sha256()
+    for state in states:
+        if hasattr(state, "_quantum_numbers"):
+            key = _quantum_numbers_key(state)
+        else:
+            key = [(complex(amp), _quantum_numbers_key(s)) for amp, s in state.data]
+        digest.update(repr(key).encode())
+    return digest.hexdigest()
+
+
+def _quantum_numbers_key(state):
+    return tuple(
+        float(x) if isinstance(x, numbers.Number) else x
+        for x in state._quantum_numbers
+    )
+
+
+def constants_fingerprint(*modules):
+    """Return a hash of the numerical constants defined in modules, e.g.
+    centrex_TlF.constants.constants_X
+
+    Returns:
+        str: hexadecimal sha256 hash
+    """
+    constants = [
+        (module.__name__, name, float(value))
+        for module in modules
+        for name, value in sorted(vars(module).items())
+        if isinstance(value, numbers.Number) and not name.startswith("_")
+    ]
+    return hashlib.sha256(repr(constants).encode()).hexdigest()
+
+
+def source_fingerprint(*objects):
+    """Return a hash of the source code of modules and functions, e.g. the
+    Hamiltonian term operators, so that cached results are calculated again
+    when the code changes. functools.partial objects are hashed by their
+    function and bound arguments.
+
+    Returns:
+        str: hexadecimal sha256 hash
+    """
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(_source(obj).encode())
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _source(obj):
+    if isinstance(obj, functools.partial):
+        return _source(obj.func) + repr((obj.args, sorted(obj.keywords.items())))
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        # no source available, e.g. for compiled functions
+        name = getattr(obj, "__qualname__", repr(obj))
+        return f"{getattr(obj, '__module__', None)}.{name}"
+
+
+def pre_calculated_fingerprint():
+    """Return a hash of the names, modification times and sizes of the
+    pre-calculated data files shipped with the package, so that results
+    derived from them are calculated again when they are updated
+
+    Returns:
+        str: hexadecimal sha256 hash
+    """
+    files = []
+    for file in sorted(PRE_CALCULATED_DIR.iterdir()):
+        if file.suffix in [".db", ".json", ".pickle"]:
+            stat = file.stat()
+            files.append((file.name, stat.st_mtime_ns, stat.st_size))
+    return hashlib.sha256(repr(files).encode()).hexdigest()
+
+
+def cached_terms(name, QN, terms, calculate, constants=(), sources=()):
+    """Return Hamiltonian terms from the term cache in the cache directory, or
+    calculate and write them to the cache. Each term is stored in a file named
+    by the hash of the Hamiltonian name, the basis, the term name, the
+    constants and the source code that calculates the terms, so files are
+    never modified once written; they are written to a temporary file and moved
+    into place, which makes the cache safe for concurrent processes.
+
+    Args:
+        name (str): name of the Hamiltonian
+        QN (list, np.ndarray, Basis): basis states
+        terms (list): names of the terms
+        calculate (callable): function without arguments that returns a
+                                dictionary with the matrix of each term
+        constants (tuple, optional): modules with the constants used by the
+                                        terms, see constants_fingerprint.
+                                        Defaults to ().
+        sources (tuple, optional): modules and functions that calculate the
+                                    terms, see source_fingerprint. Defaults
+                                    to ().
+
+    Returns:
+        dict: dictionary with the matrix of each term
+    """
+    cache_dir = get_cache_dir("hamiltonian")
+    if cache_dir is None:
+        return calculate()
+
+    version = "-".join(
+        [
+            str(TERM_CACHE_VERSION),
+            constants_fingerprint(*constants),
+            source_fingerprint(*sources),
+        ]
+    )
+    basis = basis_fingerprint(QN)
+    paths = {}
+    for term in terms:
+        key = f"{name}|{basis}|{term}|{version}"
+        paths[term] = cache_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.npz"
+    try:
+        H = {
+            term: scipy.sparse.load_npz(path).toarray() for term, path in paths.items()
+        }
+    except (OSError, ValueError, zipfile.BadZipFile):
+        H = None
+    if H is not None:
+        for path in paths.values():
+            # mark as recently used for eviction
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return H
+
+    H = calculate()
+    for term, path in paths.items():
+        try:
+            with tempfile.NamedTemporaryFile(
+                dir=cache_dir, suffix=".tmp", delete=False
+            ) as f:
+                scipy.sparse.save_npz(
+                    f, scipy.sparse.csr_matrix(np.asarray(H[term])), compressed=False
+                )
+            os.replace(f.name, path)
+        except OSError as error:
+            logging.warning(f"can't write {term} to the term cache: {error}")
+    evict_cache(cache_dir)
+    return H
+
+
+def cached_result(name, key, calculate, to_disk=False):
+    """Return the result of a calculation from an in-memory cache of the
+    RESULT_CACHE_SIZE most recently used results, optionally from a pickle in
+    the cache directory, or calculate and cache it. Results are stored pickled,
+    so every call returns a new copy that can be modified freely. The key has
+    to describe every input of the calculation, including the versions of the
+    code and data it uses, e.g. with source_fingerprint and
+    pre_calculated_fingerprint.
+
+    Args:
+        name (str): name of the calculation, also the subdirectory of the cache
+                    directory
+        key (str): canonical description of all inputs of the calculation
+        calculate (callable): function without arguments that returns the
+                                result
+        to_disk (bool, optional): cache results to disk as well, see
+                                    get_cache_dir. Defaults to False.
+
+    Returns:
+        object: result of calculate
+    """
+    key = f"{name}|{key}|{RESULT_CACHE_VERSION}"
+    key = hashlib.sha256(key.encode()).hexdigest()
+    if key in _result_cache:
+        _result_cache.move_to_end(key)
+        return pickle.loads(_result_cache[key])
+
+    cache_dir = get_cache_dir(name) if to_disk else None
+    path = None if cache_dir is None else cache_dir / f"{key}.pickle"
+    data = None
+    if path is not None:
+        try:
+            data = path.read_bytes()
+            result = pickle.loads(data)
+            # mark as recently used for eviction
+            os.utime(path)
+        except (OSError, EOFError, AttributeError, pickle.UnpicklingError):
+            # missing, or written by an incompatible version
+            data = None
+
+    if data is None:
+        result = calculate()
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        if path is not None:
+            try:
+                with tempfile.NamedTemporaryFile(
+                    dir=cache_dir, suffix=".tmp", delete=False
+                ) as f:
+                    f.write(data)
+                os.replace(f.name, path)
+            except OSError as error:
+                logging.warning(f"can't write {name} to the cache: {error}")
+            evict_cache(cache_dir)
+
+    _result_cache[key] = data
+    while len(_result_cache) > RESULT_CACHE_SIZE:
+        _result_cache.popitem(last=False)
+    return result
+
+
+def evict_cache(path, max_size=None):
+    """Remove the least recently used files of a cache directory until it is
+    smaller than max_size, and temporary files that were abandoned more than
+    an hour ago
+
+    Args:
+        path (Path): cache directory
+        max_size (float, optional): maximum size in MB. Defaults to None, which
+                                    uses CENTREX_TLF_CACHE_SIZE or 1024 MB.
+    """
+    if max_size is None:
+        max_size = float(os.environ.get(CACHE_SIZE_ENV, CACHE_SIZE))
+    files = []
+    for file in Path(path).iterdir():
+        try:
+            stat = file.stat()
+            if file.suffix == ".tmp":
+                if stat.st_mtime < time.time() - 3600:
+                    file.unlink()
+            elif file.is_file():
+                files.append((stat.st_mtime, stat.st_size, file))
+        except OSError:
+            # removed by another process
+            continue
+    size = sum(size for _, size, _ in files)
+    for _, file_size, file in sorted(files, key=lambda x: x[0]):
+        if size <= max_size * 1024 ** 2:
+            break
+        try:
+            file.unlink()
+        except OSError:
+            pass
+        size -= file_size
+
+
+def load_cached_file(path, load):
+    """Return the contents of a file, loaded once per process and kept in
+    memory until the file is modified. The contents are shared between calls
+    and should not be modified.
+
+    Args:
+        path (str, Path): path to the file
+        load (callable): function that loads the contents from a binary file
+                            object, e.g. pickle.load
+
+    Returns:
+        object: contents of the file
+    """
+    path = Path(path)
+    stat = path.stat()
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _file_cache.get(path)
+    if cached is None or cached[0] != version:
+        with open(path, "rb") as f:
+            cached = (version, load(f))
+        _file_cache[path] = cached
+    return cached[1]
+
+
+def pre_calculated_manifest():
+    """Return the contents of precalculated.json, which lists the quantum
+    numbers included in the pre-calculated data, see load_cached_file
+
+    Returns:
+        dict: pre-calculated quantum numbers by database
+    """
+    return load_cached_file(PRE_CALCULATED_DIR / "precalculated.json", json.load)
+
+
+def pre_calculated_transitions():
+    """Return the contents of transitions.pickle, the field free states and
+    Hamiltonian used for transition frequencies, see load_cached_file
+
+    Returns:
+        dict: states QN and Hamiltonian H
+    """
+    return load_cached_file(PRE_CALCULATED_DIR / "transitions.pickle", pickle.load)
+
+
+def preload_pre_calculated():
+    """Load the pre-calculated manifest and transitions into memory, e.g.
+    before creating worker processes, which then inherit them when forked
+    """
+    pre_calculated_manifest()
+    try:
+        pre_calculated_transitions()
+    except FileNotFoundError:
+        # transitions.pickle is generated separately, see pre_calculate.py
+        pass
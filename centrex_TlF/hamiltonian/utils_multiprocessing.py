@@ -1,42 +1,128 @@
+import multiprocessing
+
 import numpy as np
-from centrex_TlF.hamiltonian.hamiltonian_terms_uncoupled import (
-    Hff_X,
-    HSx,
-    HSy,
-    HSz,
-    HZx_X,
-    HZy_X,
-    HZz_X,
-    Hff_X_alt,
+from centrex_TlF.hamiltonian.operator_registry import _operators, get_operator
+from centrex_TlF.hamiltonian.utils import (
+    _matrix_elements_column,
+    _registry_positions,
 )
-from centrex_TlF.hamiltonian.hamiltonian_B_terms_coupled import (
-    Hrot_B,
-    H_mhf_Tl,
-    H_mhf_F,
-    H_LD,
-    H_cp1_Tl,
-    H_c_Tl,
-    HZz_B,
+from centrex_TlF.hamiltonian.wigner_table import (
+    clebsch_gordan_table,
+    wigner_3j_table,
+    wigner_6j_table,
 )
 
 
-def multi_transformation_matrix(i, state1, basis2):
-    transform = np.zeros((len(basis2), len(basis2)))
+# basis states of a worker process, set by the pool initializer so that they are
+# sent to each worker once instead of with every task
+_worker_data = {}
+
+
+def initialize_worker(basis1, basis2=None, operators=None):
+    """Pool initializer that stores the basis states in the worker process
+
+    Args:
+        basis1 (list): basis states
+        basis2 (list, optional): second set of basis states, used for
+                                transformation matrices. Defaults to None.
+        operators (dict, optional): operators by key, added to the registry
+                                    of the worker so that they can be looked
+                                    up by key. Defaults to None.
+    """
+    if operators is not None:
+        _operators.update(operators)
+    _worker_data["basis1"] = basis1
+    _worker_data["basis2"] = basis2
+    # registry indices are only valid within a single process
+    _worker_data["positions"] = _registry_positions(basis1)
+
+
+def create_pool(nprocs, basis1, basis2=None, operators=None):
+    """Create a process pool whose workers hold the supplied basis states and
+    operators, see initialize_worker. Only the supplied operators are sent to
+    the workers, the built-in operators are registered when the workers import
+    centrex_TlF.
+
+    Args:
+        nprocs (int): number of processes
+        basis1 (list): basis states
+        basis2 (list, optional): second set of basis states. Defaults to None.
+        operators (dict, optional): operators by key that the workers look up,
+                                    they have to be picklable. Defaults to None.
+
+    Returns:
+        multiprocessing.Pool: process pool
+    """
+    return multiprocessing.Pool(
+        nprocs,
+        initializer=initialize_worker,
+        initargs=(basis1, basis2, operators),
+    )
+
+
+def blocks(size, nprocs):
+    """Split range(size) into contiguous blocks, a few per process
+
+    Args:
+        size (int): number of elements
+        nprocs (int): number of processes
+
+    Returns:
+        list: (start, stop) of each block
+    """
+    edges = np.linspace(0, size, min(size, 4 * nprocs) + 1).astype(int)
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+
+def _flush_coefficient_tables():
+    # worker processes don't run atexit handlers, write out new coefficients
+    # after every task instead
+    for table in [wigner_3j_table, wigner_6j_table, clebsch_gordan_table]:
+        table.flush()
+
+
+def multi_transformation_matrix(start, stop):
+    """Nonzero elements state1 @ state2 of the transformation matrix for rows
+    start to stop, with the bases stored by initialize_worker
 
-    for j, state2 in enumerate(basis2):
-        transform[i, j] = state1 @ state2
+    Returns:
+        tuple: arrays with rows, columns and values
+    """
+    basis1 = _worker_data["basis1"]
+    basis2 = _worker_data["basis2"]
+    rows, columns, values = [], [], []
+    for i in range(start, stop):
+        state1 = basis1[i]
+        for j, state2 in enumerate(basis2):
+            value = state1 @ state2
+            if value != 0:
+                rows.append(i)
+                columns.append(j)
+                values.append(value)
+    _flush_coefficient_tables()
+    return (
+        np.array(rows, dtype=int),
+        np.array(columns, dtype=int),
+        np.array(values, dtype=complex),
+    )
 
-    return transform
 
+def multi_HMatElems(key, start, stop):
+    """Matrix elements of the operator registered under key in the upper
+    triangle of columns start to stop, with the basis stored by
+    initialize_worker
 
-def multi_HMatElems(H, i, a, QN):
-    nstates = len(QN)
-    result = np.zeros((nstates, nstates), dtype=complex)
-    H = eval(H)
-    for j in range(i, nstates):
-        b = QN[j]
-        val = (1 * a) @ H(b)
-        result[i, j] = val
-        if i != j:
-            result[j, i] = np.conjugate(val)
-    return result
+    Returns:
+        tuple: arrays with rows, columns and values
+    """
+    H = get_operator(key)
+    QN = _worker_data["basis1"]
+    positions = _worker_data["positions"]
+    rows, columns, values = [], [], []
+    for j in range(start, stop):
+        r, v = _matrix_elements_column(H, j, QN, positions)
+        rows.append(r)
+        columns.append(np.full(r.size, j))
+        values.append(v)
+    _flush_coefficient_tables()
+    return np.concatenate(rows), np.concatenate(columns), np.concatenate(values)
@@ -1,76 +1,102 @@
-import json
+import os
 import sqlite3
 import numpy as np
 from pathlib import Path
+from centrex_TlF.hamiltonian.utils_cache import pre_calculated_manifest
 
 
-def retrieve_uncoupled_hamiltonian_X_sqlite(QN, db):
-    con = sqlite3.connect(db)
+# read-only connections to the pre-calculated databases, shared between calls and
+# opened once per process
+_connections = {}
+
+
+def connect_read_only(db):
+    """Return a shared read-only connection to a sqlite3 database
+
+    Args:
+        db (str, Path): path to the database
+
+    Returns:
+        sqlite3.Connection: connection to the database
+    """
+    key = (os.getpid(), str(Path(db).absolute()))
+    if key not in _connections:
+        uri = Path(key[1]).as_uri() + "?mode=ro"
+        _connections[key] = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    return _connections[key]
+
+
+def retrieve_hamiltonian_sqlite(QN, db, terms, quantum_numbers):
+    """Retrieve Hamiltonian terms from a pre-calculated sqlite3 database, with
+    one query per term for all rows within the J values of QN. The rows are
+    mapped to basis states by their quantum numbers and the lower triangle is
+    the conjugate of the upper triangle.
+
+    Args:
+        QN (list): basis states
+        db (str, Path): path to the database
+        terms (list): names of the term tables
+        quantum_numbers (list): names of the quantum numbers that identify a
+                                basis state in the tables
+
+    Returns:
+        dict: dictionary with the matrix of each term
+    """
+    indices = {}
+    for i, s in enumerate(QN):
+        key = tuple(float(getattr(s, name)) for name in quantum_numbers)
+        indices.setdefault(key, []).append(i)
+    Js = sorted({int(s.J) for s in QN})
+
+    n = len(quantum_numbers)
+    columns = [f"{name}₁" for name in quantum_numbers]
+    columns += [f"{name}₂" for name in quantum_numbers]
+    placeholders = ", ".join("?" * len(Js))
+
+    cur = connect_read_only(db).cursor()
     H = {}
-    with con:
-        cur = con.cursor()
-        for term in ["Hff", "HSx", "HSy", "HSz", "HZx", "HZy", "HZz"]:
-            result = np.zeros((len(QN), len(QN)), complex)
-            for i, a in enumerate(QN):
-                for j in range(i, len(QN)):
-                    b = QN[j]
-                    string = (
-                        f"J₁ = {a.J} AND mJ₁ = {a.mJ} AND I1₁ = {a.I1} AND m1₁ = {a.m1}"
-                        f" AND I2₁ = {a.I2} AND m2₁ = {a.m2} AND J₂ = {b.J} "
-                        f"AND mJ₂ = {b.mJ} AND I1₂ = {b.I1} AND m1₂ = {b.m1} "
-                        f"AND I2₂ = {b.I2} AND m2₂ = {b.m2}"
-                    )
-                    cur.execute(
-                        f"select value_real, value_imag from {term} WHERE {string}"
-                    )
-                    values = cur.fetchall()
-                    if values:
-                        values = values[0]
-                        result[i, j] = values[0] + 1j * values[1]
-                        if i != j:
-                            result[j, i] = np.conjugate(values[0] + 1j * values[1])
-            H[term] = result.copy()
-    con.close()
+    for term in terms:
+        cur.execute(
+            f"SELECT {', '.join(columns)}, value_real, value_imag FROM {term} "
+            f"WHERE J₁ IN ({placeholders}) AND J₂ IN ({placeholders})",
+            Js + Js,
+        )
+        rows, cols, values = [], [], []
+        for row in cur:
+            bras = indices.get(tuple(float(x) for x in row[:n]), ())
+            kets = indices.get(tuple(float(x) for x in row[n : 2 * n]), ())
+            for i in bras:
+                for j in kets:
+                    rows.append(i)
+                    cols.append(j)
+                    values.append(row[-2] + 1j * row[-1])
+        rows = np.array(rows, dtype=int)
+        cols = np.array(cols, dtype=int)
+        values = np.array(values, dtype=complex)
+
+        upper = rows <= cols
+        result = np.zeros((len(QN), len(QN)), complex)
+        result[rows[upper], cols[upper]] = values[upper]
+        H[term] = result + np.triu(result, 1).conj().T
     return H
 
 
+def retrieve_uncoupled_hamiltonian_X_sqlite(QN, db):
+    return retrieve_hamiltonian_sqlite(
+        QN,
+        db,
+        ["Hff", "HSx", "HSy", "HSz", "HZx", "HZy", "HZz"],
+        ["J", "mJ", "I1", "m1", "I2", "m2"],
+    )
+
+
 def retrieve_coupled_hamiltonian_B_sqlite(QN, db):
-    con = sqlite3.connect(db)
-    H = {}
-    with con:
-        cur = con.cursor()
-        for term in [
-            "Hrot",
-            "H_mhf_Tl",
-            "H_mhf_F",
-            "H_LD",
-            "H_cp1_Tl",
-            "H_c_Tl",
-            "HZz",
-        ]:
-            result = np.zeros((len(QN), len(QN)), complex)
-            for i, a in enumerate(QN):
-                for j in range(i, len(QN)):
-                    b = QN[j]
-                    string = (
-                        f"J₁ = {a.J} AND F1₁ = {a.F1} AND F₁ = {a.F} AND mF₁ = {a.mF} "
-                        f"AND I1₁ = {a.I1} AND I2₁ = {a.I2} AND P₁ = {a.P} "
-                        f"AND J₂ = {b.J} AND F1₂ = {b.F1} AND F₂ = {b.F} "
-                        f"AND mF₂ = {b.mF} AND I1₂ = {b.I1} AND I2₂ = {b.I2} "
-                        f"AND P₂ = {b.P}"
-                    )
-                    cur.execute(
-                        f"select value_real, value_imag from {term} WHERE {string}"
-                    )
-                    values = cur.fetchall()
-                    if values:
-                        values = values[0]
-                        result[i, j] = values[0] + 1j * values[1]
-                        if i != j:
-                            result[j, i] = np.conjugate(values[0] + 1j * values[1])
-            H[term] = result.copy()
-    con.close()
-    return H
+    return retrieve_hamiltonian_sqlite(
+        QN,
+        db,
+        ["Hrot", "H_mhf_Tl", "H_mhf_F", "H_LD", "H_cp1_Tl", "H_c_Tl", "HZz"],
+        ["J", "F1", "F", "mF", "I1", "I2", "P"],
+    )
 
 
 def retrieve_S_transform_uncoupled_to_coupled_sqlite(basis1, basis2, db):
@@ -99,11 +125,7 @@ def retrieve_S_transform_uncoupled_to_coupled_sqlite(basis1, basis2, db):
 
 
 def check_states_hamiltonian(QN, ham):
-    # load json
-    path = Path(__file__).parent.parent / "pre_calculated"
-    js = path / "precalculated.json"
-    with open(js) as json_file:
-        f = json.load(json_file)
+    f = pre_calculated_manifest()
 
     # check if Js are pre-cached
     Js = np.unique([s.J for s in QN])
@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse
+from centrex_TlF.hamiltonian.utils_cache import get_cache_dir
+
+__all__ = ["MatrixStore", "convert_sqlite_to_store", "pre_calculated_store"]
+
+
+def _subscripted(quantum_numbers, subscript):
+    return {f"{name}{subscript}": name for name in quantum_numbers}
+
+
+# pre-calculated sqlite3 databases; the term tables, and the quantum numbers of
+# the row and column states by column name
+PRE_CALCULATED = {
+    "uncoupled_hamiltonian_X": {
+        "terms": ["Hff", "HSx", "HSy", "HSz", "HZx", "HZy", "HZz"],
+        "rows": _subscripted(["J", "mJ", "I1", "m1", "I2", "m2"], "₁"),
+        "columns": _subscripted(["J", "mJ", "I1", "m1", "I2", "m2"], "₂"),
+        "hermitian": True,
+    },
+    "coupled_hamiltonian_B": {
+        "terms": ["Hrot", "H_mhf_Tl", "H_mhf_F", "H_LD", "H_cp1_Tl", "H_c_Tl", "HZz"],
+        "rows": _subscripted(["J", "F1", "F", "mF", "I1", "I2", "P"], "₁"),
+        "columns": _subscripted(["J", "F1", "F", "mF", "I1", "I2", "P"], "₂"),
+        "hermitian": True,
+    },
+    "transformation": {
+        "terms": ["uncoupled_to_coupled"],
+        "rows": {name: name for name in ["J", "mJ", "I1", "m1", "I2", "m2"]},
+        "columns": {
+            "Jc": "J",
+            "F1": "F1",
+            "F": "F",
+            "mF": "mF",
+            "I1c": "I1",
+            "I2c": "I2",
+        },
+        "hermitian": False,
+    },
+}
+
+
+def _quantum_number_index(keys, names):
+    """Sort unique quantum number keys by J and the other quantum numbers, so
+    that the states of each J form a contiguous block
+
+    Args:
+        keys (np.ndarray): quantum numbers, one row per state
+        names (list): names of the quantum numbers, starting with J
+
+    Returns:
+        np.ndarray: structured array with the sorted unique quantum numbers
+    """
+    keys = np.unique(keys, axis=0)
+    keys = keys[np.lexsort(keys.T[::-1])]
+    index = np.zeros(len(keys), dtype=[(name, float) for name in names])
+    for i, name in enumerate(names):
+        index[name] = keys[:, i]
+    return index
+
+
+def convert_sqlite_to_store(db, path, terms, rows, columns, hermitian=False):
+    """Convert matrices stored as one row per element in a sqlite3 database to
+    a MatrixStore. For hermitian matrices elements missing from the database
+    are filled in with the conjugate of the transposed element.
+
+    Args:
+        db (str, Path): path to the database
+        path (str, Path): directory of the store, replaced if it exists
+        terms (list): names of the tables to convert
+        rows (dict): quantum numbers of the row states by column name
+        columns (dict): quantum numbers of the column states by column name
+        hermitian (bool, optional): matrices are hermitian, the row and column
+                                    states have to be of the same kind.
+                                    Defaults to False.
+
+    Returns:
+        MatrixStore: store with the converted matrices
+    """
+    con = sqlite3.connect(Path(db).absolute().as_uri() + "?mode=ro", uri=True)
+    names_rows, names_columns = list(rows.values()), list(columns.values())
+    select = ", ".join(list(rows) + list(columns)) + ", value_real, value_imag"
+    tables = {
+        term: np.array(con.execute(f"SELECT {select} FROM {term}").fetchall(), float)
+        for term in terms
+    }
+    con.close()
+    tables = {
+        term: table.reshape(-1, len(rows) + len(columns) + 2)
+        for term, table in tables.items()
+    }
+
+    n = len(rows)
+    keys_rows = np.concatenate([table[:, :n] for table in tables.values()])
+    keys_columns = np.concatenate(
+        [table[:, n : n + len(columns)] for table in tables.values()]
+    )
+    if hermitian:
+        assert names_rows == names_columns, "hermitian matrices require one basis"
+        index_rows = index_columns = _quantum_number_index(
+            np.concatenate([keys_rows, keys_columns]), names_rows
+        )
+    else:
+        index_rows = _quantum_number_index(keys_rows, names_rows)
+        index_columns = _quantum_number_index(keys_columns, names_columns)
+    shape = (len(index_rows), len(index_columns))
+
+    # written to a temporary directory that replaces the store when complete
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+    np.save(tmp / "rows.npy", index_rows)
+    np.save(tmp / "columns.npy", index_columns)
+
+    positions_rows = {tuple(key): i for i, key in enumerate(index_rows.tolist())}
+    positions_columns = {tuple(key): i for i, key in enumerate(index_columns.tolist())}
+    for term, table in tables.items():
+        row = np.array([positions_rows[tuple(k)] for k in table[:, :n].tolist()], int)
+        col = np.array(
+            [positions_columns[tuple(k)] for k in table[:, n:-2].tolist()], int
+        )
+        values = table[:, -2] + 1j * table[:, -1]
+        if hermitian:
+            # keep the upper triangle, completed with transposed elements from
+            # the lower triangle that are missing from the upper triangle
+            upper = row <= col
+            lower = ~upper & ~np.isin(
+                row * shape[1] + col, (col * shape[1] + row)[upper]
+            )
+            row, col, values = (
+                np.concatenate([row[upper], col[lower]]),
+                np.concatenate([col[upper], row[lower]]),
+                np.concatenate([values[upper], values[lower].conj()]),
+            )
+            upper = scipy.sparse.coo_matrix((values, (row, col)), shape=shape)
+            matrix = upper + scipy.sparse.triu(upper, 1).conj().T
+        else:
+            matrix = scipy.sparse.coo_matrix((values, (row, col)), shape=shape)
+        matrix = scipy.sparse.csr_matrix(matrix)
+        matrix.sort_indices()
+        # a single index dtype, so scipy doesn't copy the memory-mapped arrays
+        dtype = np.int32 if max(matrix.nnz, *shape) < 2 ** 31 else np.int64
+        np.save(tmp / f"{term}.data.npy", matrix.data.astype(complex))
+        np.save(tmp / f"{term}.indices.npy", matrix.indices.astype(dtype))
+        np.save(tmp / f"{term}.indptr.npy", matrix.indptr.astype(dtype))
+
+    with open(tmp / "store.json", "w") as f:
+        json.dump({"terms": list(terms), "shape": shape}, f)
+    if path.exists():
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+    return MatrixStore(path)
+
+
+class MatrixStore:
+    """Matrices stored as CSR arrays in memory-mapped .npy files, with the
+    quantum numbers of the row and column states as index. The states are
+    sorted by J, so the matrix elements of a set of J values are read from
+    contiguous blocks of the files.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "store.json") as f:
+            config = json.load(f)
+        self.terms = config["terms"]
+        self.shape = tuple(config["shape"])
+        self.rows = np.load(self.path / "rows.npy", mmap_mode="r")
+        self.columns = np.load(self.path / "columns.npy", mmap_mode="r")
+        self._positions = {}
+        self._matrices = {}
+
+    def matrix(self, term):
+        """Return the full matrix of a term, backed by the memory-mapped files
+
+        Args:
+            term (str): name of the term
+
+        Returns:
+            scipy.sparse.csr_matrix: matrix of the term
+        """
+        if term not in self._matrices:
+            data, indices, indptr = (
+                np.load(self.path / f"{term}.{name}.npy", mmap_mode="r")
+                for name in ["data", "indices", "indptr"]
+            )
+            self._matrices[term] = scipy.sparse.csr_matrix(
+                (data, indices, indptr), shape=self.shape, copy=False
+            )
+        return self._matrices[term]
+
+    def positions(self, states, axis="rows"):
+        """Return the positions of basis states in the rows or columns of the
+        store, -1 for states that are not in the store
+
+        Args:
+            states (list): basis states
+            axis (str, optional): "rows" or "columns". Defaults to "rows".
+
+        Returns:
+            np.ndarray: positions of the states
+        """
+        index = getattr(self, axis)
+        if axis not in self._positions:
+            self._positions[axis] = {
+                key: i for i, key in enumerate(np.asarray(index).tolist())
+            }
+        positions = self._positions[axis]
+        names = index.dtype.names
+        return np.array(
+            [
+                positions.get(tuple(float(getattr(s, name)) for name in names), -1)
+                for s in states
+            ],
+            dtype=int,
+        )
+
+    def retrieve(self, basis1, basis2=None, terms=None):
+        """Retrieve the matrices of terms in the supplied basis states, with
+        zeros for states that are not in the store
+
+        Args:
+            basis1 (list): basis states of the rows
+            basis2 (list, optional): basis states of the columns. Defaults to
+                                        None, which uses basis1.
+            terms (list, optional): names of the terms. Defaults to None, which
+                                    retrieves all terms.
+
+        Returns:
+            dict: dictionary with the matrix of each term
+        """
+        basis2 = basis1 if basis2 is None else basis2
+        rows = self.positions(basis1, "rows")
+        columns = self.positions(basis2, "columns")
+        present_rows, present_columns = rows >= 0, columns >= 0
+
+        H = {}
+        for term in self.terms if terms is None else terms:
+            matrix = self.matrix(term)
+            # slice contiguous rows without indexing, e.g. a block of J values
+            r = rows[present_rows]
+            if r.size and np.array_equal(r, np.arange(r[0], r[0] + r.size)):
+                matrix = matrix[r[0] : r[0] + r.size]
+            else:
+                matrix = matrix[r]
+            result = np.zeros((len(basis1), len(basis2)), dtype=complex)
+            result[np.ix_(present_rows, present_columns)] = matrix[
+                :, columns[present_columns]
+            ].toarray()
+            H[term] = result
+        return H
+
+
+def pre_calculated_store(name):
+    """Return the MatrixStore of a pre-calculated sqlite3 database, converted
+    to the cache directory on first use and whenever the database is newer
+    than the store
+
+    Args:
+        name (str): name of the database, see PRE_CALCULATED
+
+    Returns:
+        MatrixStore: store, None if caching to disk is disabled
+    """
+    db = Path(__file__).parent.parent / "pre_calculated" / f"{name}.db"
+    cache_dir = get_cache_dir("pre_calculated")
+    if cache_dir is None:
+        return None
+    path = cache_dir / name
+    manifest = path / "store.json"
+    if manifest.exists() and manifest.stat().st_mtime >= db.stat().st_mtime:
+        return MatrixStore(path)
+    try:
+        return convert_sqlite_to_store(db, path, **PRE_CALCULATED[name])
+    except OSError as error:
+        logging.warning(f"can't convert {db} to {path}: {error}")
+        return None
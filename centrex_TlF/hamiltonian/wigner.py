@@ -0,0 +1,339 @@
+import math
+
+import numpy as np
+
+__all__ = ["wigner_3j", "wigner_6j", "clebsch_gordan"]
+
+# table of log(n!), extended whenever larger factorials are required
+_log_factorials = np.array([math.lgamma(n + 1) for n in range(128)])
+_log_factorials_list = _log_factorials.tolist()
+
+
+def _require_log_factorials(n_max):
+    """Extend the table of log(n!) to include n_max
+
+    Args:
+        n_max (int): largest n for which log(n!) is required
+    """
+    global _log_factorials, _log_factorials_list
+    if n_max >= _log_factorials.size:
+        size = max(2 * _log_factorials.size, n_max + 1)
+        _log_factorials = np.array([math.lgamma(n + 1) for n in range(size)])
+        _log_factorials_list = _log_factorials.tolist()
+
+
+def _doubled(value, name):
+    """Convert angular momentum quantum numbers to integers of twice the value,
+    raising a ValueError for values that are not integer or half-integer, like
+    sympy.physics.wigner
+
+    Args:
+        value (float, array_like): quantum numbers
+        name (str): name of the quantum numbers for the error message
+
+    Returns:
+        int, np.ndarray: twice the quantum numbers as integers
+    """
+    if isinstance(value, (int, float, np.number)) or np.ndim(value) == 0:
+        doubled = 2 * float(value)
+        rounded = round(doubled)
+        if abs(doubled - rounded) > 1e-9:
+            raise ValueError(f"{name} values must be integer or half integer")
+        return rounded
+    doubled = 2 * np.asarray(value, dtype=float)
+    rounded = np.rint(doubled)
+    if not np.all(np.abs(doubled - rounded) < 1e-9):
+        raise ValueError(f"{name} values must be integer or half integer")
+    return rounded.astype(np.int64)
+
+
+def _sign(doubled):
+    """(-1)^(n/2) for even integers n"""
+    return 1 - 2 * ((doubled // 2) % 2)
+
+
+def _wigner_3j_scalar(j1, j2, j3, m1, m2, m3):
+    """Wigner 3j symbol from twice the quantum numbers, for scalar arguments"""
+    if (
+        m1 + m2 + m3 != 0
+        or j1 + j2 - j3 < 0
+        or j1 - j2 + j3 < 0
+        or -j1 + j2 + j3 < 0
+        or abs(m1) > j1
+        or abs(m2) > j2
+        or abs(m3) > j3
+        or (j1 - m1) % 2
+        or (j2 - m2) % 2
+        or (j3 - m3) % 2
+    ):
+        return 0.0
+
+    _require_log_factorials((j1 + j2 + j3) // 2 + 1)
+    lf = _log_factorials_list
+    log_prefactor = 0.5 * (
+        lf[(j1 + j2 - j3) // 2]
+        + lf[(j1 - j2 + j3) // 2]
+        + lf[(-j1 + j2 + j3) // 2]
+        - lf[(j1 + j2 + j3) // 2 + 1]
+        + lf[(j1 - m1) // 2]
+        + lf[(j1 + m1) // 2]
+        + lf[(j2 - m2) // 2]
+        + lf[(j2 + m2) // 2]
+        + lf[(j3 - m3) // 2]
+        + lf[(j3 + m3) // 2]
+    )
+
+    k_min = max(0, (j2 - j3 - m1) // 2, (j1 - j3 + m2) // 2)
+    k_max = min((j1 + j2 - j3) // 2, (j1 - m1) // 2, (j2 + m2) // 2)
+    total = 0.0
+    for k in range(k_min, k_max + 1):
+        log_term = log_prefactor - (
+            lf[k]
+            + lf[(j3 - j2 + m1) // 2 + k]
+            + lf[(j3 - j1 - m2) // 2 + k]
+            + lf[(j1 + j2 - j3) // 2 - k]
+            + lf[(j1 - m1) // 2 - k]
+            + lf[(j2 + m2) // 2 - k]
+        )
+        total += (-1) ** k * math.exp(log_term)
+    return _sign(j1 - j2 - m3) * total
+
+
+def _wigner_3j_doubled(j1, j2, j3, m1, m2, m3):
+    """Wigner 3j symbol from twice the quantum numbers, using the Racah
+    formula with log-factorials. Arguments are broadcast against each other.
+    """
+    j1, j2, j3, m1, m2, m3 = np.broadcast_arrays(j1, j2, j3, m1, m2, m3)
+    shape = j1.shape
+    j1, j2, j3, m1, m2, m3 = (x.ravel() for x in (j1, j2, j3, m1, m2, m3))
+    result = np.zeros(j1.size)
+
+    valid = (
+        (m1 + m2 + m3 == 0)
+        & (j1 + j2 - j3 >= 0)
+        & (j1 - j2 + j3 >= 0)
+        & (-j1 + j2 + j3 >= 0)
+        & (np.abs(m1) <= j1)
+        & (np.abs(m2) <= j2)
+        & (np.abs(m3) <= j3)
+        & ((j1 - m1) % 2 == 0)
+        & ((j2 - m2) % 2 == 0)
+        & ((j3 - m3) % 2 == 0)
+    )
+    j1, j2, j3, m1, m2, m3 = (x[valid] for x in (j1, j2, j3, m1, m2, m3))
+    if j1.size == 0:
+        return result.reshape(shape)
+
+    # all factorial arguments below are integers, halve the doubled values
+    _require_log_factorials(int(((j1 + j2 + j3) // 2).max()) + 1)
+    lf = _log_factorials
+    log_prefactor = 0.5 * (
+        lf[(j1 + j2 - j3) // 2]
+        + lf[(j1 - j2 + j3) // 2]
+        + lf[(-j1 + j2 + j3) // 2]
+        - lf[(j1 + j2 + j3) // 2 + 1]
+        + lf[(j1 - m1) // 2]
+        + lf[(j1 + m1) // 2]
+        + lf[(j2 - m2) // 2]
+        + lf[(j2 + m2) // 2]
+        + lf[(j3 - m3) // 2]
+        + lf[(j3 + m3) // 2]
+    )
+
+    k_min = np.maximum.reduce(
+        [np.zeros_like(j1), (j2 - j3 - m1) // 2, (j1 - j3 + m2) // 2]
+    )
+    k_max = np.minimum.reduce([(j1 + j2 - j3) // 2, (j1 - m1) // 2, (j2 + m2) // 2])
+    n_terms = k_max - k_min + 1
+
+    total = np.zeros(j1.size)
+    for t in range(int(n_terms.max())):
+        active = t < n_terms
+        k = np.where(active, k_min + t, k_min)
+        log_term = log_prefactor - (
+            lf[k]
+            + lf[(j3 - j2 + m1) // 2 + k]
+            + lf[(j3 - j1 - m2) // 2 + k]
+            + lf[(j1 + j2 - j3) // 2 - k]
+            + lf[(j1 - m1) // 2 - k]
+            + lf[(j2 + m2) // 2 - k]
+        )
+        total += np.where(active, (1 - 2 * (k % 2)) * np.exp(log_term), 0)
+
+    result[valid] = _sign(j1 - j2 - m3) * total
+    return result.reshape(shape)
+
+
+def wigner_3j(j1, j2, j3, m1, m2, m3):
+    """Wigner 3j symbol, vectorized over arrays of quantum numbers.
+
+    Agrees with sympy.physics.wigner.wigner_3j to double precision for the
+    angular momenta encountered in TlF; symbols that violate the selection
+    rules are zero and quantum numbers that are not integer or half-integer
+    raise a ValueError.
+
+    Args:
+        j1, j2, j3 (float, array_like): angular momenta
+        m1, m2, m3 (float, array_like): projections
+
+    Returns:
+        float, np.ndarray: 3j symbols, broadcast over the arguments
+    """
+    js = [_doubled(j, "j") for j in (j1, j2, j3)]
+    ms = [_doubled(m, "m") for m in (m1, m2, m3)]
+    if all(isinstance(x, int) for x in js + ms):
+        return _wigner_3j_scalar(*js, *ms)
+    return _wigner_3j_doubled(*js, *ms)
+
+
+def clebsch_gordan(j1, m1, j2, m2, j3, m3):
+    """Clebsch-Gordan coefficient <j1 m1 j2 m2|j3 m3>, vectorized over arrays
+    of quantum numbers. The argument order matches
+    sympy.physics.quantum.cg.CG.
+
+    Args:
+        j1, m1 (float, array_like): first angular momentum and projection
+        j2, m2 (float, array_like): second angular momentum and projection
+        j3, m3 (float, array_like): coupled angular momentum and projection
+
+    Returns:
+        float, np.ndarray: Clebsch-Gordan coefficients
+    """
+    j1, j2, j3 = (_doubled(j, "j") for j in (j1, j2, j3))
+    m1, m2, m3 = (_doubled(m, "m") for m in (m1, m2, m3))
+    if all(isinstance(x, int) for x in (j1, j2, j3, m1, m2, m3)):
+        threej = _wigner_3j_scalar(j1, j2, j3, m1, m2, -m3)
+        return _sign(j1 - j2 + m3) * math.sqrt(j3 + 1) * threej
+    threej = _wigner_3j_doubled(j1, j2, j3, m1, m2, -m3)
+    return _sign(j1 - j2 + m3) * np.sqrt(j3 + 1) * threej
+
+
+def _check_triads(triads):
+    """Raise a ValueError for triads of twice the angular momenta that do not
+    sum to an integer, like sympy.physics.wigner.wigner_6j
+    """
+    for a, b, c in triads:
+        if np.any((a + b + c) % 2 != 0):
+            raise ValueError(
+                "j values must be integer or half integer and fulfill the "
+                "triangle relation"
+            )
+
+
+def _wigner_6j_scalar(j1, j2, j3, j4, j5, j6):
+    """Wigner 6j symbol from twice the quantum numbers, for scalar arguments"""
+    triads = [(j1, j2, j3), (j1, j5, j6), (j4, j2, j6), (j4, j5, j3)]
+    if any((a + b + c) % 2 for a, b, c in triads):
+        _check_triads(triads)
+    for a, b, c in triads:
+        if a + b - c < 0 or a - b + c < 0 or -a + b + c < 0:
+            return 0.0
+
+    lower = [(a + b + c) // 2 for a, b, c in triads]
+    upper = [
+        (j1 + j2 + j4 + j5) // 2,
+        (j2 + j3 + j5 + j6) // 2,
+        (j3 + j1 + j6 + j4) // 2,
+    ]
+    _require_log_factorials(max(upper) + 1)
+    lf = _log_factorials_list
+
+    # triangle coefficients
+    log_prefactor = 0.0
+    for a, b, c in triads:
+        log_prefactor += 0.5 * (
+            lf[(a + b - c) // 2]
+            + lf[(a - b + c) // 2]
+            + lf[(-a + b + c) // 2]
+            - lf[(a + b + c) // 2 + 1]
+        )
+
+    total = 0.0
+    for t in range(max(lower), min(upper) + 1):
+        log_term = (
+            log_prefactor
+            + lf[t + 1]
+            - sum(lf[t - x] for x in lower)
+            - sum(lf[x - t] for x in upper)
+        )
+        total += (-1) ** t * math.exp(log_term)
+    return total
+
+
+def _wigner_6j_doubled(j1, j2, j3, j4, j5, j6):
+    """Wigner 6j symbol from twice the quantum numbers, using the Racah
+    formula with log-factorials. Arguments are broadcast against each other.
+    """
+    j1, j2, j3, j4, j5, j6 = np.broadcast_arrays(j1, j2, j3, j4, j5, j6)
+    shape = j1.shape
+    j1, j2, j3, j4, j5, j6 = (x.ravel() for x in (j1, j2, j3, j4, j5, j6))
+    triads = [(j1, j2, j3), (j1, j5, j6), (j4, j2, j6), (j4, j5, j3)]
+    _check_triads(triads)
+
+    valid = np.ones(j1.size, dtype=bool)
+    for a, b, c in triads:
+        valid &= (a + b - c >= 0) & (a - b + c >= 0) & (-a + b + c >= 0)
+    result = np.zeros(j1.size)
+    j1, j2, j3, j4, j5, j6 = (x[valid] for x in (j1, j2, j3, j4, j5, j6))
+    if j1.size == 0:
+        return result.reshape(shape)
+    triads = [(j1, j2, j3), (j1, j5, j6), (j4, j2, j6), (j4, j5, j3)]
+
+    lower = [(a + b + c) // 2 for a, b, c in triads]
+    upper = [
+        (j1 + j2 + j4 + j5) // 2,
+        (j2 + j3 + j5 + j6) // 2,
+        (j3 + j1 + j6 + j4) // 2,
+    ]
+    _require_log_factorials(int(np.maximum.reduce(upper).max()) + 1)
+    lf = _log_factorials
+
+    # triangle coefficients
+    log_prefactor = np.zeros(j1.size)
+    for a, b, c in triads:
+        log_prefactor += 0.5 * (
+            lf[(a + b - c) // 2]
+            + lf[(a - b + c) // 2]
+            + lf[(-a + b + c) // 2]
+            - lf[(a + b + c) // 2 + 1]
+        )
+
+    t_min = np.maximum.reduce(lower)
+    t_max = np.minimum.reduce(upper)
+    n_terms = t_max - t_min + 1
+
+    total = np.zeros(j1.size)
+    for i in range(int(n_terms.max())):
+        active = i < n_terms
+        t = np.where(active, t_min + i, t_min)
+        log_term = (
+            log_prefactor
+            + lf[t + 1]
+            - sum(lf[t - x] for x in lower)
+            - sum(lf[x - t] for x in upper)
+        )
+        total += np.where(active, (1 - 2 * (t % 2)) * np.exp(log_term), 0)
+
+    result[valid] = total
+    return result.reshape(shape)
+
+
+def wigner_6j(j1, j2, j3, j4, j5, j6):
+    """Wigner 6j symbol {j1 j2 j3; j4 j5 j6}, vectorized over arrays of
+    quantum numbers.
+
+    Agrees with sympy.physics.wigner.wigner_6j to double precision for the
+    angular momenta encountered in TlF; symbols that violate the triangle
+    conditions are zero and triads that do not sum to an integer raise a
+    ValueError.
+
+    Args:
+        j1, j2, j3, j4, j5, j6 (float, array_like): angular momenta
+
+    Returns:
+        float, np.ndarray: 6j symbols, broadcast over the arguments
+    """
+    js = [_doubled(j, "j") for j in (j1, j2, j3, j4, j5, j6)]
+    if all(isinstance(j, int) for j in js):
+        return _wigner_6j_scalar(*js)
+    return _wigner_6j_doubled(*js)
@@ -0,0 +1,281 @@
+import atexit
+import logging
+import os
+
+import numpy as np
+from centrex_TlF.hamiltonian.utils_cache import get_cache_dir
+from centrex_TlF.hamiltonian.wigner import clebsch_gordan, wigner_3j, wigner_6j
+
+__all__ = ["CoefficientTable", "build_coefficient_tables"]
+
+# twice the quantum numbers are stored in 10 bit fields of a single 64 bit key
+_FIELD_BITS = 10
+_FIELD_OFFSET = 1 << (_FIELD_BITS - 1)
+_RECORD = np.dtype([("key", "<i8"), ("value", "<f8")])
+
+# local cache files are merged into a single file when there are more
+_MAX_LOCAL_FILES = 64
+
+
+def _key(args):
+    """Pack quantum numbers into an integer key
+
+    Args:
+        args (tuple): integer or half-integer quantum numbers
+
+    Returns:
+        int: key, None if the quantum numbers can't be represented
+    """
+    key = 0
+    for value in args:
+        doubled = 2 * value
+        rounded = int(round(doubled))
+        if rounded != doubled or not -_FIELD_OFFSET <= rounded < _FIELD_OFFSET:
+            return None
+        key = (key << _FIELD_BITS) | (rounded + _FIELD_OFFSET)
+    return key
+
+
+def _keys(doubled):
+    """Pack arrays of twice the quantum numbers into integer keys
+
+    Args:
+        doubled (tuple): arrays of twice the quantum numbers
+
+    Returns:
+        np.ndarray: keys
+    """
+    keys = np.zeros(doubled[0].shape, dtype=np.int64)
+    for values in doubled:
+        keys = (keys << _FIELD_BITS) | (values + _FIELD_OFFSET)
+    return keys
+
+
+class CoefficientTable:
+    """Angular momentum coefficients that persist between processes.
+
+    Coefficients are looked up in a prebuilt table, generated with
+    build_coefficient_tables and memory mapped read-only so that it is shared
+    between processes, and in local cache files to which coefficients missing
+    from the prebuilt table are appended, one per process so that concurrent
+    processes never write to the same file. Both live in the wigner
+    subdirectory of the cache directory, see get_cache_dir. Only nonzero
+    coefficients are stored.
+
+    Args:
+        name (str): name of the table, used for the file names
+        function (callable): function that calculates a coefficient
+        flush_size (int, optional): number of new coefficients to collect
+                                    before appending them to the local cache
+                                    file. Defaults to 1024.
+    """
+
+    def __init__(self, name, function, flush_size=1024):
+        self.name = name
+        self.function = function
+        self.flush_size = flush_size
+        self._loaded = False
+        atexit.register(self.flush)
+
+    def _load(self):
+        self._loaded = True
+        self._keys = None
+        self._values = None
+        self._local = {}
+        self._pending = {}
+        self._path = get_cache_dir("wigner")
+        if self._path is None:
+            return
+
+        try:
+            keys = self._path / f"{self.name}_keys.npy"
+            if keys.exists():
+                self._keys = np.load(keys, mmap_mode="r")
+                self._values = np.load(
+                    self._path / f"{self.name}_values.npy", mmap_mode="r"
+                )
+        except (OSError, ValueError) as error:
+            logging.warning(f"can't load {self.name} coefficient table: {error}")
+            self._keys = None
+            self._values = None
+
+        files = sorted(self._path.glob(f"{self.name}_local*.bin"))
+        for file in files:
+            try:
+                raw = file.read_bytes()
+            except OSError:
+                # removed by another process merging the files
+                continue
+            # ignore a partially written record at the end of the file
+            records = np.frombuffer(
+                raw, dtype=_RECORD, count=len(raw) // _RECORD.itemsize
+            )
+            self._local.update(zip(records["key"].tolist(), records["value"].tolist()))
+        if len(files) > _MAX_LOCAL_FILES:
+            self._merge_local(files)
+
+    def _merge_local(self, files):
+        """Replace the local cache files by a single file with the coefficients
+        loaded from them. Coefficients appended to the files in the meantime
+        are lost, which only means they are calculated again.
+
+        Args:
+            files (list): paths of the local cache files that were loaded
+        """
+        merged = self._path / f"{self.name}_local.{os.getpid()}.bin"
+        tmp = self._path / f"{self.name}_local.{os.getpid()}.tmp"
+        records = np.array(list(self._local.items()), dtype=_RECORD)
+        try:
+            tmp.write_bytes(records.tobytes())
+            os.replace(tmp, merged)
+            for file in files:
+                if file != merged:
+                    file.unlink(missing_ok=True)
+        except OSError as error:
+            logging.warning(f"can't merge {self.name} coefficient table: {error}")
+
+    def reload(self):
+        """Write out new coefficients and reload the table from disk"""
+        self.flush()
+        self._loaded = False
+
+    def __call__(self, *args):
+        if not self._loaded:
+            self._load()
+        key = _key(args)
+        if key is None:
+            return self.function(*args)
+
+        value = self._local.get(key)
+        if value is not None:
+            return value
+        if self._keys is not None:
+            index = np.searchsorted(self._keys, key)
+            if index < self._keys.size and self._keys[index] == key:
+                return float(self._values[index])
+
+        value = float(self.function(*args))
+        if value != 0:
+            self._local[key] = value
+            if self._path is not None:
+                self._pending[key] = value
+                if len(self._pending) >= self.flush_size:
+                    self.flush()
+        return value
+
+    def flush(self):
+        """Append the coefficients calculated since the last flush to the local
+        cache file of this process
+        """
+        if not self._loaded or not self._pending:
+            return
+        records = np.array(list(self._pending.items()), dtype=_RECORD)
+        self._pending = {}
+        try:
+            # the process id is looked up on every flush, forked worker
+            # processes write to their own file
+            local = self._path / f"{self.name}_local.{os.getpid()}.bin"
+            with open(local, "ab") as f:
+                # drop a partial record left by a crashed process with the
+                # same process id
+                size = f.seek(0, os.SEEK_END)
+                if size % _RECORD.itemsize:
+                    f.truncate(size - size % _RECORD.itemsize)
+                f.write(records.tobytes())
+        except OSError as error:
+            logging.warning(f"can't write {self.name} coefficient table: {error}")
+            self._path = None
+
+
+def _quantum_numbers_3j(J_max):
+    """Generate twice the quantum numbers (j1, j2, j3, m1, m2, m3) of all 3j
+    symbols with angular momenta up to J_max that satisfy the selection rules,
+    in chunks of constant j1
+    """
+    js = np.arange(int(round(2 * J_max)) + 1)
+    ms = np.arange(-js[-1], js[-1] + 1)
+    for j1 in js:
+        j2, j3, m1, m2 = (
+            x.ravel()
+            for x in np.meshgrid(js, js, np.arange(-j1, j1 + 1, 2), ms, indexing="ij")
+        )
+        m3 = -m1 - m2
+        valid = (
+            (np.abs(j1 - j2) <= j3)
+            & (j3 <= j1 + j2)
+            & ((j1 + j2 + j3) % 2 == 0)
+            & (np.abs(m2) <= j2)
+            & ((j2 - m2) % 2 == 0)
+            & (np.abs(m3) <= j3)
+        )
+        j2, j3, m1, m2, m3 = (x[valid] for x in (j2, j3, m1, m2, m3))
+        yield np.full(j2.size, j1), j2, j3, m1, m2, m3
+
+
+def _quantum_numbers_6j(J_max):
+    """Generate twice the angular momenta (j1, j2, j3, j4, j5, j6) of all 6j
+    symbols with angular momenta up to J_max that satisfy the triangle
+    conditions, in chunks of constant j1
+    """
+    js = np.arange(int(round(2 * J_max)) + 1)
+    for j1 in js:
+        j2, j3, j4, j5, j6 = (
+            x.ravel() for x in np.meshgrid(js, js, js, js, js, indexing="ij")
+        )
+        valid = np.ones(j2.size, dtype=bool)
+        for a, b, c in [(j1, j2, j3), (j1, j5, j6), (j4, j2, j6), (j4, j5, j3)]:
+            valid &= (np.abs(a - b) <= c) & (c <= a + b) & ((a + b + c) % 2 == 0)
+        j2, j3, j4, j5, j6 = (x[valid] for x in (j2, j3, j4, j5, j6))
+        yield np.full(j2.size, j1), j2, j3, j4, j5, j6
+
+
+def _quantum_numbers_cg(J_max):
+    """Generate twice the quantum numbers (j1, m1, j2, m2, j3, m3) of all
+    Clebsch-Gordan coefficients with angular momenta up to J_max that satisfy
+    the selection rules, in chunks of constant j1
+    """
+    for j1, j2, j3, m1, m2, m3 in _quantum_numbers_3j(J_max):
+        yield j1, m1, j2, m2, j3, -m3
+
+
+def build_coefficient_tables(J_max=10):
+    """Calculate the nonzero 3j symbols, 6j symbols and Clebsch-Gordan
+    coefficients with angular momenta up to J_max and store them as tables
+    that are memory mapped by threej_f, sixj_f and CGc. The number of 6j symbols
+    grows rapidly with J_max.
+
+    Args:
+        J_max (float, optional): largest angular momentum. Defaults to 10.
+    """
+    path = get_cache_dir("wigner")
+    assert path is not None, "no cache directory available for coefficient tables"
+
+    for table, quantum_numbers in [
+        (wigner_3j_table, _quantum_numbers_3j),
+        (wigner_6j_table, _quantum_numbers_6j),
+        (clebsch_gordan_table, _quantum_numbers_cg),
+    ]:
+        keys = []
+        values = []
+        for doubled in quantum_numbers(J_max):
+            coefficients = table.function(*(x / 2 for x in doubled))
+            nonzero = coefficients != 0
+            keys.append(_keys(doubled)[nonzero])
+            values.append(coefficients[nonzero])
+        keys = np.concatenate(keys)
+        values = np.concatenate(values)
+        order = np.argsort(keys)
+
+        # replace the files atomically, processes that have the old tables
+        # memory mapped keep reading those
+        for suffix, data in [("keys", keys[order]), ("values", values[order])]:
+            file = path / f"{table.name}_{suffix}.npy"
+            tmp = path / f"{table.name}_{suffix}.{os.getpid()}.npy"
+            np.save(tmp, data)
+            os.replace(tmp, file)
+        table.reload()
+
+
+wigner_3j_table = CoefficientTable("wigner_3j", wigner_3j)
+wigner_6j_table = CoefficientTable("wigner_6j", wigner_6j)
+clebsch_gordan_table = CoefficientTable("clebsch_gordan", clebsch_gordan)
@@ -6,6 +6,7 @@ from centrex_TlF.lindblad.utils_compact import (
     compact_symbolic_hamiltonian_indices,
     delete_row_column_symbolic,
 )
+from centrex_TlF.states.basis import as_basis
 from centrex_TlF.states.utils import QuantumSelector, get_indices_quantumnumbers
 from centrex_TlF.states.utils_compact import compact_QN_coupled_indices
 from sympy import Symbol, eye, zeros
@@ -68,6 +69,7 @@ def generate_symbolic_hamiltonian(QN, H_rot, couplings, Ωs=None, δs=None, pols
     hamiltonian += H_rot
 
     # add detunings to the hamiltonian
+    basis = as_basis(QN)
     for idc, (δ, coupling) in enumerate(zip(δs, couplings)):
         # check if Δ symbol exists, else create
         if not δ:
@@ -78,9 +80,9 @@ def generate_symbolic_hamiltonian(QN, H_rot, couplings, Ωs=None, δs=None, pols
                 if δ not in δs:
                     break
             δs[idc] = δ
-        indices_ground = [QN.index(s) for s in coupling["ground states"]]
-        idg = QN.index(coupling["ground main"])
-        ide = QN.index(coupling["excited main"])
+        indices_ground = basis.indices_of(coupling["ground states"])
+        idg = basis.index(coupling["ground main"])
+        ide = basis.index(coupling["excited main"])
         # subtract excited state energy over diagonal for first entry:
         if idc == 0:
             hamiltonian -= eye(hamiltonian.shape[0]) * hamiltonian[ide, ide]
@@ -27,11 +27,12 @@ def generate_coupled_hamiltonian_B_sqlite(QN, con, progress = False):
             tab = copy.copy(table)
             if tab in ['Hrot', 'HZz']:
                 tab += '_B'
+            H = centrex.hamiltonian.get_operator(f"coupled.{tab}")
             desc = f"pre-calculating coupled B state Hamiltonian; {table}"
             for i,a in tqdm(enumerate(QN), total = len(QN), disable = not progress, desc = desc):
                 for j in range(i,len(QN)):
                     b = QN[j]
-                    val = (1*a)@(eval(f"centrex.hamiltonian.hamiltonian_B_terms_coupled.{tab}")(b))
+                    val = (1*a)@H(b)
                     if val != 0:
                         try:
                             string = f"{a.J}, {a.F1}, {a.F}, {a.mF}, {a.I1}, {a.I2}, {a.P}, {b.J}, {b.F1}, {b.F}, {b.mF}, {b.I1}, {b.I2}, {b.P}, {val.real}, {val.imag}"
@@ -65,10 +66,11 @@ def generate_uncoupled_hamiltonian_X_sqlite(QN, con, progress = False):
             tab = table + '_X'
         else:
             tab = table
+        H = centrex.hamiltonian.get_operator(f"uncoupled.{tab}")
         desc = f"pre-calculating uncoupled X state Hamiltonian; {table}"
         for a in tqdm(QN, desc = desc):
             for b in QN:
-                val = (1*a)@(eval(f"centrex.hamiltonian.hamiltonian_terms_uncoupled.{tab}")(b))
+                val = (1*a)@H(b)
                 if val != 0:
                     try:
                         string = f"{a.J}, {a.mJ}, {a.I1}, {a.m1}, {a.I2}, {a.m2}, {b.J}, {b.mJ}, {b.I1}, {b.m1}, {b.I2}, {b.m2}, {val.real}, {val.imag}"
@@ -1,6 +1,9 @@
 from . import utils
 from .utils import *
 
+from . import basis
+from .basis import *
+
 from . import states
 from .states import *
 
@@ -9,5 +12,6 @@ from .generate_states import *
 
 
 __all__ = utils.__all__.copy()
+__all__ += basis.__all__.copy()
 __all__ += states.__all__.copy()
 __all__ += generate_states.__all__.copy()
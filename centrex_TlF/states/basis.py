@@ -0,0 +1,398 @@
+import numpy as np
+
+__all__ = [
+    "BasisRegistry",
+    "Basis",
+    "as_basis",
+    "quantum_number_table",
+    "COUPLED_BASIS_FIELDS",
+    "UNCOUPLED_BASIS_FIELDS",
+]
+
+# fields of the quantum number table, quantum numbers that are not defined for
+# a state are NaN or an empty string
+QUANTUM_NUMBER_FIELDS = np.dtype(
+    [
+        ("J", float),
+        ("F1", float),
+        ("F", float),
+        ("mF", float),
+        ("electronic", "U16"),
+        ("P", float),
+        ("Omega", float),
+    ]
+)
+
+# fields of the quantum number arrays from which bases of coupled and uncoupled
+# basis states are generated, in the order of the basis state constructor
+# arguments. Omega and P are NaN and electronic is an empty string if undefined.
+COUPLED_BASIS_FIELDS = np.dtype(
+    [
+        ("F", float),
+        ("mF", float),
+        ("F1", float),
+        ("J", float),
+        ("I1", float),
+        ("I2", float),
+        ("Omega", float),
+        ("P", float),
+        ("electronic", "U16"),
+    ]
+)
+UNCOUPLED_BASIS_FIELDS = np.dtype(
+    [
+        ("J", float),
+        ("mJ", float),
+        ("I1", float),
+        ("m1", float),
+        ("I2", float),
+        ("m2", float),
+        ("Omega", float),
+        ("P", float),
+        ("electronic", "U16"),
+    ]
+)
+
+
+class BasisRegistry:
+    """Registry that assigns a unique integer index to every distinct basis
+    state. State objects store their components as indices into a shared
+    registry, which turns comparisons between basis states into integer
+    comparisons.
+    """
+
+    def __init__(self):
+        self._states = []
+        # tuples of quantum numbers differ in length between coupled and
+        # uncoupled basis states
+        self._index = {}
+        self._coupled = np.zeros(64, dtype=bool)
+
+    def __len__(self):
+        return len(self._states)
+
+    def __getitem__(self, index):
+        return self._states[index]
+
+    def register(self, state):
+        """Return the registry index of a basis state, adding it to the
+        registry if it has not been seen before
+
+        Args:
+            state (CoupledBasisState, UncoupledBasisState): basis state
+
+        Returns:
+            int: registry index of state
+        """
+        key = state._quantum_numbers
+        index = self._index.get(key)
+        if index is None:
+            index = len(self._states)
+            self._index[key] = index
+            self._states.append(state)
+            if index >= self._coupled.size:
+                self._coupled = np.append(
+                    self._coupled, np.zeros(self._coupled.size, dtype=bool)
+                )
+            self._coupled[index] = state.isCoupled
+        return index
+
+    def register_states(self, states):
+        """Return the registry indices of a sequence of basis states
+
+        Args:
+            states (list, np.ndarray): basis states
+
+        Returns:
+            np.ndarray: registry indices of states
+        """
+        register = self.register
+        return np.array([register(state) for state in states], dtype=np.intp)
+
+    def states(self, indices):
+        """Return the basis states belonging to registry indices
+
+        Args:
+            indices (np.ndarray): registry indices
+
+        Returns:
+            list: basis states
+        """
+        states = self._states
+        return [states[index] for index in indices]
+
+    def is_coupled(self, indices):
+        """Return whether the basis states at registry indices are in the
+        coupled basis
+
+        Args:
+            indices (np.ndarray): registry indices
+
+        Returns:
+            np.ndarray: boolean array, True for coupled basis states
+        """
+        return self._coupled[indices]
+
+
+# registry shared by all State objects
+basis_registry = BasisRegistry()
+
+
+def _number(value):
+    """Convert a quantum number from a quantum number array to the type used
+    by the basis state generators: None if undefined, int if integer.
+    """
+    if value != value:
+        return None
+    return int(value) if value.is_integer() else value
+
+
+def _basis_state_arguments(table):
+    """Convert the rows of a quantum number array with COUPLED_BASIS_FIELDS or
+    UNCOUPLED_BASIS_FIELDS to basis state constructor arguments
+
+    Args:
+        table (np.ndarray): structured array of quantum numbers
+
+    Returns:
+        list: tuple of constructor arguments for each row
+    """
+    columns = []
+    for name in table.dtype.names:
+        column = table[name].tolist()
+        if name == "electronic":
+            column = [value or None for value in column]
+        elif name in ["J", "mJ", "Omega", "P"]:
+            column = [_number(value) for value in column]
+        columns.append(column)
+    return list(zip(*columns))
+
+
+class Basis:
+    """Ordered collection of states with constant time lookup of the position
+    of a state. Basis states are looked up by their quantum numbers. Other
+    objects, e.g. superposition states, are looked up by identity, which matches
+    list.index for objects without an equality method.
+
+    A basis of basis states can also be generated from a structured array of
+    quantum numbers with Basis.from_quantum_numbers, in which case the basis
+    state objects are only created when they are accessed.
+
+    Args:
+        states (list, np.ndarray, Basis): states in the basis
+    """
+
+    def __init__(self, states):
+        self._states = []
+        self._positions = {}
+        self._quantum_numbers = None
+        self._table = None
+        for position, state in enumerate(states):
+            self._states.append(state)
+            self._positions.setdefault(self._key(state), position)
+
+    @classmethod
+    def from_quantum_numbers(cls, table):
+        """Create a basis from a structured array of quantum numbers, without
+        creating the basis state objects until they are accessed
+
+        Args:
+            table (np.ndarray): structured array with COUPLED_BASIS_FIELDS or
+                                UNCOUPLED_BASIS_FIELDS, a row for each state
+
+        Returns:
+            Basis: basis of CoupledBasisStates or UncoupledBasisStates
+        """
+        assert table.dtype in [
+            COUPLED_BASIS_FIELDS,
+            UNCOUPLED_BASIS_FIELDS,
+        ], "quantum numbers require COUPLED_BASIS_FIELDS or UNCOUPLED_BASIS_FIELDS"
+        basis = cls.__new__(cls)
+        basis._states = [None] * len(table)
+        basis._positions = None
+        basis._quantum_numbers = None
+        basis._table = table
+        return basis
+
+    @staticmethod
+    def _key(state):
+        if hasattr(state, "isCoupled"):
+            return state._quantum_numbers
+        else:
+            return id(state)
+
+    def _materialize(self, positions):
+        """Create the basis state objects at positions that have not been
+        created yet
+
+        Args:
+            positions (range, np.ndarray): positions in the basis
+        """
+        # imported here because the states module depends on this module
+        from centrex_TlF.states.states import CoupledBasisState, UncoupledBasisState
+
+        positions = [p for p in positions if self._states[p] is None]
+        if not positions:
+            return
+        if self._table.dtype == COUPLED_BASIS_FIELDS:
+            basis_state = CoupledBasisState
+        else:
+            basis_state = UncoupledBasisState
+        arguments = _basis_state_arguments(self._table[positions])
+        for position, (*quantum_numbers, Omega, P, electronic) in zip(
+            positions, arguments
+        ):
+            self._states[position] = basis_state(
+                *quantum_numbers, Omega=Omega, P=P, electronic_state=electronic
+            )
+
+    def _lookup(self):
+        # positions of a basis generated from quantum numbers are determined on
+        # the first lookup
+        if self._positions is None:
+            keys = _basis_state_arguments(self._table)
+            if self._table.dtype == COUPLED_BASIS_FIELDS:
+                # coupled basis states also have a vibrational quantum number
+                keys = [key + (None,) for key in keys]
+            self._positions = {}
+            for position, key in enumerate(keys):
+                self._positions.setdefault(key, position)
+        return self._positions
+
+    def __len__(self):
+        return len(self._states)
+
+    def __getitem__(self, index):
+        if isinstance(index, (slice, list, np.ndarray)):
+            positions = np.arange(len(self))[index]
+            if self._table is not None:
+                return Basis.from_quantum_numbers(self._table[positions])
+            return Basis([self._states[position] for position in positions])
+        if self._table is not None:
+            index = range(len(self))[index]
+            self._materialize([index])
+        return self._states[index]
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __contains__(self, state):
+        return self._key(state) in self._lookup()
+
+    def __reduce__(self):
+        if self._table is not None:
+            return (Basis.from_quantum_numbers, (self._table,))
+        # identity keys are only valid within a single process
+        return (Basis, (self._states,))
+
+    def __repr__(self):
+        return f"Basis({len(self)} states)"
+
+    def index(self, state):
+        """Return the position of a state in the basis
+
+        Args:
+            state (CoupledBasisState, UncoupledBasisState, State): state
+
+        Returns:
+            int: position of state
+        """
+        position = self._lookup().get(self._key(state))
+        if position is None:
+            raise ValueError(f"{state} is not in basis")
+        return position
+
+    def indices_of(self, states):
+        """Return the positions of multiple states in the basis
+
+        Args:
+            states (list, np.ndarray, Basis): states
+
+        Returns:
+            np.ndarray: positions of states
+        """
+        index = self.index
+        return np.array([index(state) for state in states], dtype=int)
+
+    @property
+    def quantum_numbers(self):
+        """Quantum number table of the basis, see quantum_number_table. Computed
+        on first access.
+        """
+        if self._quantum_numbers is None:
+            if self._table is not None:
+                table = np.empty(len(self), dtype=QUANTUM_NUMBER_FIELDS)
+                for name in QUANTUM_NUMBER_FIELDS.names:
+                    if name in self._table.dtype.names:
+                        table[name] = self._table[name]
+                    else:
+                        table[name] = np.nan
+                self._quantum_numbers = table
+            else:
+                self._quantum_numbers = quantum_number_table(self._states)
+        return self._quantum_numbers
+
+    def tolist(self):
+        """Return the states in the basis as a list
+
+        Returns:
+            list: states
+        """
+        if self._table is not None:
+            self._materialize(range(len(self)))
+        return list(self._states)
+
+
+def as_basis(states):
+    """Return states as a Basis, without copying if already a Basis
+
+    Args:
+        states (list, np.ndarray, Basis): states
+
+    Returns:
+        Basis: basis with states
+    """
+    if isinstance(states, Basis):
+        return states
+    return Basis(states)
+
+
+def quantum_number_table(states):
+    """Return a structured array with the quantum numbers J, F1, F, mF,
+    electronic, P and Omega of each state. For superposition states the
+    quantum numbers of the largest component are used.
+
+    Args:
+        states (list, np.ndarray, Basis): states
+
+    Returns:
+        np.ndarray: structured array with a row for each state
+    """
+    # registry index of each state or its largest component
+    indices = np.empty(len(states), dtype=np.intp)
+    register = basis_registry.register
+    for i, state in enumerate(states):
+        if hasattr(state, "isCoupled"):
+            indices[i] = register(state)
+        else:
+            indices[i] = state._indices[np.argmax(np.abs(state._amps) ** 2)]
+
+    def number(value):
+        return np.nan if value is None else value
+
+    # only look up the quantum numbers of each distinct basis state once
+    unique, inverse = np.unique(indices, return_inverse=True)
+    rows = [
+        (
+            number(state.J),
+            number(getattr(state, "F1", None)),
+            number(getattr(state, "F", None)),
+            number(getattr(state, "mF", None)),
+            state.electronic_state or "",
+            number(state.P),
+            number(state.Omega),
+        )
+        for state in basis_registry.states(unique)
+    ]
+    table = np.array(rows, dtype=QUANTUM_NUMBER_FIELDS)
+    return table[inverse]
@@ -3,8 +3,12 @@ from typing import Union
 
 import numpy as np
 from centrex_TlF.constants.constants import I_F, I_Tl
-from centrex_TlF.states.states import CoupledBasisState, UncoupledBasisState
-from centrex_TlF.states.utils import QuantumSelector, get_unique_basisstates, parity_X
+from centrex_TlF.states.basis import (
+    COUPLED_BASIS_FIELDS,
+    UNCOUPLED_BASIS_FIELDS,
+    Basis,
+)
+from centrex_TlF.states.utils import QuantumSelector, parity_X
 
 __all__ = [
     "generate_uncoupled_states_ground",
@@ -14,71 +18,197 @@ __all__ = [
     "generate_coupled_states_base",
     "generate_coupled_states_ground_X",
     "generate_coupled_states_excited_B",
+    "generate_coupled_quantum_numbers",
+    "generate_uncoupled_quantum_numbers",
 ]
 
 
-def generate_uncoupled_states_ground(Js):
-    # convert J to int(J); np.int with (-1)**J throws an exception for negative J
-    QN = np.array(
-        [
-            UncoupledBasisState(
-                int(J),
-                mJ,
-                I_Tl,
-                m1,
-                I_F,
-                m2,
-                Omega=0,
-                P=parity_X(J),
-                electronic_state="X",
-            )
-            for J in Js
-            for mJ in range(-J, J + 1)
-            for m1 in np.arange(-I_Tl, I_Tl + 1)
-            for m2 in np.arange(-I_F, I_F + 1)
-        ]
+def _expand(columns, lower, upper, values=None):
+    """Broadcast each row of columns against the quantum numbers lower, lower +
+    1, ..., upper of that row, or against the values that lie in that range
+
+    Args:
+        columns (dict): arrays of quantum numbers
+        lower (np.ndarray): smallest quantum number for each row
+        upper (np.ndarray): largest quantum number for each row
+        values (list, optional): quantum numbers to keep, in order. Defaults to
+                                    None, which keeps all quantum numbers.
+
+    Returns:
+        tuple: dict with the repeated columns and array with the new quantum
+                number of each row
+    """
+    if values is None:
+        count = int(np.rint(np.max(upper - lower, initial=-1))) + 1
+        candidates = lower[:, None] + np.arange(count)
+    else:
+        candidates = np.broadcast_to(
+            np.asarray(values, dtype=float), (lower.size, len(values))
+        )
+    valid = (
+        (candidates >= lower[:, None])
+        & (candidates <= upper[:, None])
+        & (np.mod(candidates - lower[:, None], 1) == 0)
     )
+    rows, cols = np.nonzero(valid)
+    return {name: x[rows] for name, x in columns.items()}, candidates[rows, cols]
+
+
+def _product(columns, values):
+    """Broadcast each row of columns against a list of values, where callable
+    values are evaluated for the rotational quantum number J of each row
+
+    Args:
+        columns (dict): arrays of quantum numbers, including J
+        values (list): values, None for undefined
+
+    Returns:
+        tuple: dict with the repeated columns and array with the value of each
+                row
+    """
+    J = columns["J"]
+    unique, inverse = np.unique(J, return_inverse=True)
+    candidates = np.empty((J.size, len(values)))
+    for i, value in enumerate(values):
+        if callable(value):
+            value = np.array(
+                [value(int(j) if j.is_integer() else j) for j in unique.tolist()],
+                dtype=float,
+            )[inverse]
+        candidates[:, i] = np.nan if value is None else value
+    rows = np.repeat(np.arange(J.size), len(values))
+    return {name: x[rows] for name, x in columns.items()}, candidates.ravel()
+
+
+def _quantum_number_array(columns, dtype, **constants):
+    """Combine arrays of quantum numbers and quantum numbers that are the same
+    for all rows into a structured array
+
+    Args:
+        columns (dict): arrays of quantum numbers, including J
+        dtype (np.dtype): COUPLED_BASIS_FIELDS or UNCOUPLED_BASIS_FIELDS
+
+    Returns:
+        np.ndarray: structured array of quantum numbers
+    """
+    table = np.empty(columns["J"].size, dtype=dtype)
+    for name, x in {**columns, **constants}.items():
+        table[name] = x
+    return table
+
+
+def _listify(values):
+    if isinstance(values, str) or not np.iterable(values):
+        return [values]
+    return list(values)
+
+
+def generate_coupled_quantum_numbers(
+    Js, electronic_states, Ps, Ωs, F1s=None, Fs=None, mFs=None
+):
+    """Generate the quantum numbers of all CoupledBasisStates with the supplied
+    quantum numbers, ordered by electronic state, J, F1, F, mF, P and Ω, with Ω
+    varying fastest
+
+    Args:
+        Js (list): rotational quantum numbers
+        electronic_states (list, str): electronic states
+        Ps (list): parities, or callables that return the parity for J
+        Ωs (list, int): projections of the electronic angular momentum
+        F1s (list, optional): F1 to include. Defaults to None (all allowed).
+        Fs (list, optional): F to include. Defaults to None (all allowed).
+        mFs (list, optional): mF to include. Defaults to None (all allowed).
+
+    Returns:
+        np.ndarray: structured array with COUPLED_BASIS_FIELDS, see
+                    Basis.from_quantum_numbers
+    """
+    electronic_states = np.asarray(_listify(electronic_states), dtype="U16")
+    Js = np.asarray(_listify(Js), dtype=float)
+    columns = {
+        "electronic": np.repeat(electronic_states, Js.size),
+        "J": np.tile(Js, electronic_states.size),
+    }
+    J = columns["J"]
+    columns, columns["F1"] = _expand(columns, np.abs(J - I_F), J + I_F, F1s)
+    F1 = columns["F1"]
+    columns, columns["F"] = _expand(columns, np.abs(F1 - I_Tl), F1 + I_Tl, Fs)
+    F = columns["F"]
+    columns, columns["mF"] = _expand(columns, -F, F, mFs)
+    columns, columns["P"] = _product(columns, _listify(Ps))
+    columns, columns["Omega"] = _product(columns, _listify(Ωs))
+
+    return _quantum_number_array(columns, COUPLED_BASIS_FIELDS, I1=I_F, I2=I_Tl)
+
+
+def generate_uncoupled_quantum_numbers(Js, electronic_states, Ps, Ωs):
+    """Generate the quantum numbers of all UncoupledBasisStates with the supplied
+    quantum numbers, ordered by electronic state, Ω, J, P, mJ, m1 and m2, with
+    m2 varying fastest
+
+    Args:
+        Js (list): rotational quantum numbers
+        electronic_states (list, str): electronic states
+        Ps (list): parities, or callables that return the parity for J, None
+                    for undefined
+        Ωs (list, int): projections of the electronic angular momentum
+
+    Returns:
+        np.ndarray: structured array with UNCOUPLED_BASIS_FIELDS, see
+                    Basis.from_quantum_numbers
+    """
+    electronic_states = np.asarray(_listify(electronic_states), dtype="U16")
+    Ωs = np.asarray(_listify(Ωs), dtype=float)
+    Js = np.asarray(_listify(Js), dtype=float)
+    columns = {
+        "electronic": np.repeat(electronic_states, Ωs.size * Js.size),
+        "Omega": np.tile(np.repeat(Ωs, Js.size), electronic_states.size),
+        "J": np.tile(Js, electronic_states.size * Ωs.size),
+    }
+    columns, columns["P"] = _product(columns, _listify(Ps))
+    J = columns["J"]
+    columns, columns["mJ"] = _expand(columns, -J, J)
+    size = columns["J"].size
+    columns, columns["m1"] = _expand(columns, np.full(size, -I_Tl), np.full(size, I_Tl))
+    size = columns["J"].size
+    columns, columns["m2"] = _expand(columns, np.full(size, -I_F), np.full(size, I_F))
+
+    return _quantum_number_array(columns, UNCOUPLED_BASIS_FIELDS, I1=I_Tl, I2=I_F)
+
+
+def _unique_quantum_numbers(table):
+    """Remove duplicate rows from a quantum number array, keeping the first
+    occurrence
+    """
+    first = {}
+    for position, row in enumerate(table.tolist()):
+        first.setdefault(row, position)
+    return table[list(first.values())]
+
+
+def _basis_states(table):
+    """Create an array of basis states from a quantum number array"""
+    return np.array(Basis.from_quantum_numbers(table).tolist())
+
+
+def generate_uncoupled_states_ground(Js):
+    QN = _basis_states(generate_uncoupled_quantum_numbers(Js, "X", parity_X, 0))
     return QN
 
 
 def generate_uncoupled_states_excited(Js, Ωs=[-1, 1]):
-    QN = np.array(
-        [
-            UncoupledBasisState(J, mJ, I_Tl, m1, I_F, m2, Omega=Ω, electronic_state="B")
-            for Ω in Ωs
-            for J in Js
-            for mJ in range(-J, J + 1)
-            for m1 in np.arange(-I_Tl, I_Tl + 1)
-            for m2 in np.arange(-I_F, I_F + 1)
-        ]
-    )
+    QN = _basis_states(generate_uncoupled_quantum_numbers(Js, "B", None, Ωs))
     return QN
 
 
 def generate_coupled_states_ground(Js):
-    QN = np.array(
-        [
-            CoupledBasisState(
-                F, mF, F1, J, I_F, I_Tl, electronic_state="X", P=parity_X(J), Omega=0
-            )
-            for J in Js
-            for F1 in np.arange(np.abs(J - I_F), J + I_F + 1)
-            for F in np.arange(np.abs(F1 - I_Tl), F1 + I_Tl + 1)
-            for mF in np.arange(-F, F + 1)
-        ]
-    )
+    QN = _basis_states(generate_coupled_quantum_numbers(Js, "X", parity_X, 0))
     return QN
 
 
-def generate_coupled_states_base(qn_selector: QuantumSelector) -> np.ndarray:
-    """generate CoupledBasisStates for the quantum numbers given by qn_selector
-
-    Args:
-        qn_selector (QuantumSelector): quantum numbers to use to generate the
-                                        CoupledBasisStates
-
-    Returns:
-        np.ndarray: array of CoupledBasisStates for the excited state
+def _selector_quantum_numbers(qn_selector: QuantumSelector) -> np.ndarray:
+    """generate the quantum number array of the CoupledBasisStates for the
+    quantum numbers given by qn_selector, see generate_coupled_states_base
     """
     assert qn_selector.P is not None, "function requires a parity to be set"
     assert (
@@ -89,51 +219,33 @@ def generate_coupled_states_base(qn_selector: QuantumSelector) -> np.ndarray:
     ), "function requires electronic state to be set"
     assert qn_selector.Ω is not None, "function requires Ω to be set"
 
-    # generate all combinations
-    quantum_numbers = []
-    for par in ["J", "F1", "F", "mF", "electronic", "P", "Ω"]:
-        par = getattr(qn_selector, par)
-        quantum_numbers.append(
-            [par] if not isinstance(par, (list, tuple, np.ndarray)) else par
-        )
+    # quantum numbers that are not set select all allowed values
+    F1s, Fs, mFs = (
+        None if value is None else _listify(value)
+        for value in [qn_selector.F1, qn_selector.F, qn_selector.mF]
+    )
+    return generate_coupled_quantum_numbers(
+        qn_selector.J,
+        qn_selector.electronic,
+        qn_selector.P,
+        qn_selector.Ω,
+        F1s=F1s,
+        Fs=Fs,
+        mFs=mFs,
+    )
+
 
-    QN = []
-    # the worst nested loops I've ever created
-    Js, F1s, Fs, mFs, estates, Ps, Ωs = quantum_numbers
-    for estate in estates:
-        for J in Js:
-            F1_allowed = np.arange(np.abs(J - I_F), J + I_F + 1)
-            F1sl = F1s if F1s[0] is not None else F1_allowed
-            for F1 in F1sl:
-                if F1 not in F1_allowed:
-                    continue
-                Fs_allowed = np.arange(np.abs(F1 - I_Tl), F1 + I_Tl + 1)
-                Fsl = Fs if Fs[0] is not None else Fs_allowed
-                for F in Fsl:
-                    if F not in Fs_allowed:
-                        continue
-                    mF_allowed = np.arange(-F, F + 1)
-                    mFsl = mFs if mFs[0] is not None else mF_allowed
-                    for mF in mFsl:
-                        if mF not in mF_allowed:
-                            continue
-                        for P in Ps:
-                            P = P if not callable(P) else P(J)
-                            for Ω in Ωs:
-                                QN.append(
-                                    CoupledBasisState(
-                                        F,
-                                        mF,
-                                        F1,
-                                        J,
-                                        I_F,
-                                        I_Tl,
-                                        electronic_state=estate,
-                                        P=P,
-                                        Ω=Ω,
-                                    )
-                                )
-    return np.asarray(QN)
+def generate_coupled_states_base(qn_selector: QuantumSelector) -> np.ndarray:
+    """generate CoupledBasisStates for the quantum numbers given by qn_selector
+
+    Args:
+        qn_selector (QuantumSelector): quantum numbers to use to generate the
+                                        CoupledBasisStates
+
+    Returns:
+        np.ndarray: array of CoupledBasisStates for the excited state
+    """
+    return _basis_states(_selector_quantum_numbers(qn_selector))
 
 
 def generate_coupled_states_ground_X(
@@ -157,14 +269,16 @@ def generate_coupled_states_ground_X(
         qns.electronic = "X"
         return generate_coupled_states_base(qns)
     elif isinstance(qn_selector, (list, np.ndarray)):
-        coupled_states = []
+        quantum_numbers = []
         for qns in qn_selector:
             qns = copy.copy(qns)
             qns.Ω = 0
             qns.P = parity_X
             qns.electronic = "X"
-            coupled_states.append(generate_coupled_states_base(qns))
-        return get_unique_basisstates(np.concatenate(coupled_states))
+            quantum_numbers.append(_selector_quantum_numbers(qns))
+        return _basis_states(
+            _unique_quantum_numbers(np.concatenate(quantum_numbers))
+        )
     else:
         raise AssertionError(
             "qn_selector required to be of type QuantumSelector, list or np.ndarray"
@@ -191,13 +305,15 @@ def generate_coupled_states_excited_B(
         qns.electronic = "B"
         return generate_coupled_states_base(qns)
     elif isinstance(qn_selector, (list, np.ndarray)):
-        coupled_states = []
+        quantum_numbers = []
         for qns in qn_selector:
             qns = copy.copy(qns)
             qns.Ω = 1
             qns.electronic = "B"
-            coupled_states.append(generate_coupled_states_base(qns))
-        return get_unique_basisstates(np.concatenate(coupled_states))
+            quantum_numbers.append(_selector_quantum_numbers(qns))
+        return _basis_states(
+            _unique_quantum_numbers(np.concatenate(quantum_numbers))
+        )
     else:
         raise AssertionError(
             "qn_selector required to be of type QuantumSelector, list or np.ndarray"
@@ -208,31 +324,23 @@ def generate_coupled_states_excited(Js, Fs=None, F1s=None, Ps=None):
     if not Fs:
         if not Ps:
             Ps = [+1]
-        QN = np.array(
-            [
-                CoupledBasisState(
-                    F, mF, F1, J, I_F, I_Tl, electronic_state="B", P=P, Omega=1
-                )
-                for J in Js
-                for F1 in np.arange(np.abs(J - I_F), J + I_F + 1)
-                for F in np.arange(np.abs(F1 - I_Tl), F1 + I_Tl + 1)
-                for mF in np.arange(-F, F + 1)
-                for P in Ps
-            ]
-        )
+        QN = _basis_states(generate_coupled_quantum_numbers(Js, "B", Ps, 1))
     else:
         assert None not in [Fs, F1s, Ps], (
             "need to supply lists of F, F1 or P"
             "if one of them is used as an input parameter"
         )
-        QN = np.array(
-            [
-                CoupledBasisState(
-                    F, mF, F1, J, I_F, I_Tl, electronic_state="B", P=P, Omega=1
-                )
-                for J, F1, F in zip(Js, F1s, Fs)
-                for mF in np.arange(-F, F + 1)
-                for P in Ps
-            ]
+        columns = {
+            "electronic": np.full(len(Js), "B"),
+            "J": np.asarray(Js, dtype=float),
+            "F1": np.asarray(F1s, dtype=float),
+            "F": np.asarray(Fs, dtype=float),
+        }
+        columns, columns["mF"] = _expand(columns, -columns["F"], columns["F"])
+        columns, columns["P"] = _product(columns, Ps)
+        QN = _basis_states(
+            _quantum_number_array(
+                columns, COUPLED_BASIS_FIELDS, I1=I_F, I2=I_Tl, Omega=1
+            )
         )
     return QN
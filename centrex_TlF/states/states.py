@@ -1,14 +1,29 @@
-import hashlib
-import json
-
 import centrex_TlF
 import numpy as np
 import sympy as sp
+from centrex_TlF.states.basis import basis_registry
 
 __all__ = ["CoupledBasisState", "UncoupledBasisState", "State"]
 
 
 class CoupledBasisState:
+    __slots__ = (
+        "F",
+        "mF",
+        "F1",
+        "J",
+        "I1",
+        "I2",
+        "Omega",
+        "P",
+        "electronic_state",
+        "v",
+        "energy",
+        "_hash",
+    )
+    isCoupled = True
+    isUncoupled = False
+
     # constructor
     def __init__(
         self,
@@ -25,39 +40,123 @@ class CoupledBasisState:
         Ω=None,
         v=None,
     ):
-        self.F, self.mF = F, mF
-        self.F1 = F1
-        self.J = J
-        self.I1 = I1
-        self.I2 = I2
-        self.Omega = Omega
         # add Ω for convenience
-        self.Ω = Ω
         if Ω is not None:
-            self.Omega = Ω
-        self.P = P
-        self.electronic_state = electronic_state
-        self.energy = energy
-        self.isCoupled = True
-        self.isUncoupled = False
-        self.v = v
+            Omega = Ω
+        # basis states are immutable, except for the energy
+        _set = object.__setattr__
+        _set(self, "F", F)
+        _set(self, "mF", mF)
+        _set(self, "F1", F1)
+        _set(self, "J", J)
+        _set(self, "I1", I1)
+        _set(self, "I2", I2)
+        _set(self, "Omega", Omega)
+        _set(self, "P", P)
+        _set(self, "electronic_state", electronic_state)
+        _set(self, "v", v)
+        _set(self, "energy", energy)
+        _set(self, "_hash", None)
+
+    @property
+    def _quantum_numbers(self):
+        return (
+            self.F,
+            self.mF,
+            self.F1,
+            self.J,
+            self.I1,
+            self.I2,
+            self.Omega,
+            self.P,
+            self.electronic_state,
+            self.v,
+        )
 
-    # equality testing
-    def __eq__(self, other):
-        # return self.__hash__() == other.__hash__()
+    @property
+    def Ω(self):
+        return self.Omega
+
+    def __setattr__(self, name, value):
+        if name != "energy":
+            raise AttributeError(
+                f"{type(self).__name__} is immutable, cannot set {name}"
+            )
+        object.__setattr__(self, name, value)
+
+    def __reduce__(self):
         return (
-            self.F == other.F
-            and self.mF == other.mF
-            and self.I1 == other.I1
-            and self.I2 == other.I2
-            and self.F1 == other.F1
-            and self.J == other.J
-            and self.Omega == other.Omega
-            and self.P == other.P
-            and self.electronic_state == other.electronic_state
-            and self.v == other.v
+            CoupledBasisState,
+            (
+                self.F,
+                self.mF,
+                self.F1,
+                self.J,
+                self.I1,
+                self.I2,
+                self.Omega,
+                self.P,
+                self.electronic_state,
+                self.energy,
+                None,
+                self.v,
+            ),
         )
 
+    # states pickled before basis states were immutable store their __dict__
+    def __setstate__(self, state):
+        state = state[1] if isinstance(state, tuple) else state
+        self.__init__(
+            state["F"],
+            state["mF"],
+            state["F1"],
+            state["J"],
+            state["I1"],
+            state["I2"],
+            Omega=state.get("Omega"),
+            P=state.get("P"),
+            electronic_state=state.get("electronic_state"),
+            energy=state.get("energy"),
+            v=state.get("v"),
+        )
+
+    def replace(self, **quantum_numbers):
+        """Return a copy of the basis state with some of the quantum numbers
+        replaced
+
+        Args:
+            **quantum_numbers: quantum numbers to replace, e.g. J=None
+
+        Returns:
+            CoupledBasisState: basis state with replaced quantum numbers
+        """
+        kwargs = dict(
+            F=self.F,
+            mF=self.mF,
+            F1=self.F1,
+            J=self.J,
+            I1=self.I1,
+            I2=self.I2,
+            Omega=self.Omega,
+            P=self.P,
+            electronic_state=self.electronic_state,
+            energy=self.energy,
+            v=self.v,
+        )
+        kwargs.update(quantum_numbers)
+        return CoupledBasisState(**kwargs)
+
+    # equality testing
+    def __eq__(self, other):
+        if other.__class__ is not CoupledBasisState:
+            return NotImplemented
+        return self._quantum_numbers == other._quantum_numbers
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash(self._quantum_numbers))
+        return self._hash
+
     # inner product
     def __matmul__(self, other):
         if other.isCoupled:
@@ -81,26 +180,16 @@ class CoupledBasisState:
 
     # scalar product (psi * a)
     def __mul__(self, a):
-        return State([(a, self)])
+        return State._from_arrays(
+            np.array([a], dtype=complex),
+            np.array([basis_registry.register(self)], dtype=np.intp),
+            coupled=(self.isCoupled, self.isCoupled),
+        )
 
     # scalar product (a * psi)
     def __rmul__(self, a):
         return self * a
 
-    def __hash__(self):
-        quantum_numbers = (
-            self.J,
-            self.F1,
-            self.F,
-            self.mF,
-            self.I1,
-            self.I2,
-            self.P,
-            self.Omega,
-            self.electronic_state,
-        )
-        return int(hashlib.md5(json.dumps(quantum_numbers).encode()).hexdigest(), 16)
-
     def __repr__(self):
         return self.state_string()
 
@@ -168,29 +257,30 @@ class CoupledBasisState:
         m1s = np.arange(-I1, I1 + 1, 1)
         m2s = np.arange(-I2, I2 + 1, 1)
 
-        uncoupled_state = State()
+        # Clebsch-Gordan coefficients for all combinations of projections at once
+        mF1, mJ, m1, m2 = (
+            x.ravel() for x in np.meshgrid(mF1s, mJs, m1s, m2s, indexing="ij")
+        )
+        amps = centrex_TlF.hamiltonian.wigner.clebsch_gordan(
+            J, mJ, I1, m1, F1, mF1
+        ) * centrex_TlF.hamiltonian.wigner.clebsch_gordan(F1, mF1, I2, m2, F, mF)
 
-        for mF1 in mF1s:
-            for mJ in mJs:
-                for m1 in m1s:
-                    for m2 in m2s:
-                        amp = centrex_TlF.states.utils.CGc(
-                            J, mJ, I1, m1, F1, mF1
-                        ) * centrex_TlF.states.utils.CGc(F1, mF1, I2, m2, F, mF)
-                        basis_state = UncoupledBasisState(
-                            J,
-                            mJ,
-                            I1,
-                            m1,
-                            I2,
-                            m2,
-                            P=P,
-                            Omega=Omega,
-                            electronic_state=electronic_state,
-                        )
-                        uncoupled_state = uncoupled_state + State([(amp, basis_state)])
+        data = []
+        for idx in np.nonzero(amps)[0]:
+            basis_state = UncoupledBasisState(
+                J,
+                mJ[idx],
+                I1,
+                m1[idx],
+                I2,
+                m2[idx],
+                P=P,
+                Omega=Omega,
+                electronic_state=electronic_state,
+            )
+            data.append((amps[idx], basis_state))
 
-        return uncoupled_state.normalize()
+        return State(data).normalize()
 
     # Method for transforming parity eigenstate to Omega eigenstate basis
     def transform_to_omega_basis(self):
@@ -307,6 +397,22 @@ class CoupledBasisState:
 
 # Class for uncoupled basis states
 class UncoupledBasisState:
+    __slots__ = (
+        "J",
+        "mJ",
+        "I1",
+        "m1",
+        "I2",
+        "m2",
+        "Omega",
+        "P",
+        "electronic_state",
+        "energy",
+        "_hash",
+    )
+    isCoupled = False
+    isUncoupled = True
+
     # constructor
     def __init__(
         self,
@@ -321,29 +427,109 @@ class UncoupledBasisState:
         electronic_state=None,
         energy=None,
     ):
-        self.J, self.mJ = J, mJ
-        self.I1, self.m1 = I1, m1
-        self.I2, self.m2 = I2, m2
-        self.Omega = Omega
-        self.P = P
-        self.electronic_state = electronic_state
-        self.isCoupled = False
-        self.isUncoupled = True
-        self.energy = energy
+        # basis states are immutable, except for the energy
+        _set = object.__setattr__
+        _set(self, "J", J)
+        _set(self, "mJ", mJ)
+        _set(self, "I1", I1)
+        _set(self, "m1", m1)
+        _set(self, "I2", I2)
+        _set(self, "m2", m2)
+        _set(self, "Omega", Omega)
+        _set(self, "P", P)
+        _set(self, "electronic_state", electronic_state)
+        _set(self, "energy", energy)
+        _set(self, "_hash", None)
+
+    @property
+    def _quantum_numbers(self):
+        return (
+            self.J,
+            self.mJ,
+            self.I1,
+            self.m1,
+            self.I2,
+            self.m2,
+            self.Omega,
+            self.P,
+            self.electronic_state,
+        )
 
-    # equality testing
-    def __eq__(self, other):
+    def __setattr__(self, name, value):
+        if name != "energy":
+            raise AttributeError(
+                f"{type(self).__name__} is immutable, cannot set {name}"
+            )
+        object.__setattr__(self, name, value)
+
+    def __reduce__(self):
         return (
-            self.J == other.J
-            and self.mJ == other.mJ
-            and self.I1 == other.I1
-            and self.I2 == other.I2
-            and self.m1 == other.m1
-            and self.m2 == other.m2
-            and self.Omega == other.Omega
-            and self.P == other.P
-            and self.electronic_state == other.electronic_state
+            UncoupledBasisState,
+            (
+                self.J,
+                self.mJ,
+                self.I1,
+                self.m1,
+                self.I2,
+                self.m2,
+                self.Omega,
+                self.P,
+                self.electronic_state,
+                self.energy,
+            ),
+        )
+
+    # states pickled before basis states were immutable store their __dict__
+    def __setstate__(self, state):
+        state = state[1] if isinstance(state, tuple) else state
+        self.__init__(
+            state["J"],
+            state["mJ"],
+            state["I1"],
+            state["m1"],
+            state["I2"],
+            state["m2"],
+            Omega=state.get("Omega"),
+            P=state.get("P"),
+            electronic_state=state.get("electronic_state"),
+            energy=state.get("energy"),
+        )
+
+    def replace(self, **quantum_numbers):
+        """Return a copy of the basis state with some of the quantum numbers
+        replaced
+
+        Args:
+            **quantum_numbers: quantum numbers to replace, e.g. J=None
+
+        Returns:
+            UncoupledBasisState: basis state with replaced quantum numbers
+        """
+        kwargs = dict(
+            J=self.J,
+            mJ=self.mJ,
+            I1=self.I1,
+            m1=self.m1,
+            I2=self.I2,
+            m2=self.m2,
+            Omega=self.Omega,
+            P=self.P,
+            electronic_state=self.electronic_state,
+            energy=self.energy,
         )
+        kwargs.update(quantum_numbers)
+        return UncoupledBasisState(**kwargs)
+
+    # equality testing
+    def __eq__(self, other):
+        if other.__class__ is not UncoupledBasisState:
+            return NotImplemented
+        return self._quantum_numbers == other._quantum_numbers
+
+    def __hash__(self):
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash(self._quantum_numbers))
+        return self._hash
 
     # inner product
     def __matmul__(self, other):
@@ -368,26 +554,16 @@ class UncoupledBasisState:
 
     # scalar product (psi * a)
     def __mul__(self, a):
-        return State([(a, self)])
+        return State._from_arrays(
+            np.array([a], dtype=complex),
+            np.array([basis_registry.register(self)], dtype=np.intp),
+            coupled=(self.isCoupled, self.isCoupled),
+        )
 
     # scalar product (a * psi)
     def __rmul__(self, a):
         return self * a
 
-    def __hash__(self):
-        quantum_numbers = (
-            self.J,
-            self.mJ,
-            self.I1,
-            self.m1,
-            self.I2,
-            self.m2,
-            self.P,
-            self.Omega,
-            self.electronic_state,
-        )
-        return hashlib.md5(json.dumps(quantum_numbers).encode())
-
     def __repr__(self):
         return self.state_string()
 
@@ -509,54 +685,174 @@ class UncoupledBasisState:
         return state
 
 
+# states with fewer components than this are combined with broadcasting instead
+# of sorting
+_SMALL_STATE_SIZE = 256
+
+
 # Define a class for superposition states
 class State:
     # constructor
     def __init__(self, data=[], remove_zero_amp_cpts=True, name=None, energy=0):
+        if len(data) > 0:
+            amps, cpts = zip(*data)
+            amps = np.array(amps, dtype=complex)
+            indices = basis_registry.register_states(cpts)
+            coupled = {cpt.isCoupled for cpt in cpts}
+            coupled = (True in coupled, False not in coupled)
+        else:
+            amps = np.zeros(0, dtype=complex)
+            indices = np.zeros(0, dtype=np.intp)
+            coupled = (False, True)
         # check for duplicates
-        for i in range(len(data)):
-            amp1, cpt1 = data[i][0], data[i][1]
-            for amp2, cpt2 in data[i + 1 :]:
-                if cpt1 == cpt2:
-                    raise AssertionError("duplicate components!")
+        if indices.size > 1 and len(set(indices.tolist())) != indices.size:
+            raise AssertionError("duplicate components!")
         # remove components with zero amplitudes
-        if remove_zero_amp_cpts:
-            self.data = [(amp, cpt) for amp, cpt in data if amp != 0]
-        else:
-            self.data = data
+        if remove_zero_amp_cpts and np.count_nonzero(amps) < amps.size:
+            mask = amps != 0
+            amps, indices = amps[mask], indices[mask]
+        # amplitudes and registry indices of the basis states
+        self._amps = amps
+        self._indices = indices
+        self._coupled = coupled
         # for iteration over the State
-        self.index = len(self.data)
+        self.index = indices.size
         # Store energy of state
         self.energy = energy
         # Give the state a name if desired
         self.name = name
 
+    @classmethod
+    def _from_arrays(
+        cls, amps, indices, remove_zero_amp_cpts=True, energy=0, coupled=None
+    ):
+        """Construct a State directly from an amplitude array and registry
+        indices, skipping the duplicate check. Components with equal indices
+        have to be merged beforehand. coupled optionally holds the
+        (any coupled, all coupled) flags of the components, removing zero
+        amplitude components keeps these valid for the inner product.
+        """
+        if remove_zero_amp_cpts and np.count_nonzero(amps) < amps.size:
+            mask = amps != 0
+            amps, indices = amps[mask], indices[mask]
+        state = cls.__new__(cls)
+        state._amps = amps
+        state._indices = indices
+        state._coupled = coupled
+        state.index = indices.size
+        state.energy = energy
+        state.name = None
+        return state
+
+    @classmethod
+    def _from_columns(cls, V, QN, tol=0):
+        """Construct a State from each column of V, with amplitudes of the basis
+        states in QN. Components with an absolute amplitude not larger than tol
+        are removed. The amplitudes of a State are a view of its column of V if
+        no components are removed, and all States share the registry indices of
+        QN, so V should not be modified afterwards.
+        """
+        indices = basis_registry.register_states(QN)
+        if indices.size > 1 and np.unique(indices).size != indices.size:
+            raise AssertionError("duplicate components!")
+        coupled = basis_registry.is_coupled(indices)
+        coupled = (bool(coupled.any()), bool(coupled.all()))
+        keep = np.abs(V) > tol
+        complete = keep.all(axis=0)
+        states = []
+        for i in range(V.shape[1]):
+            if complete[i]:
+                amps, cpts = V[:, i], indices
+            else:
+                amps, cpts = V[keep[:, i], i], indices[keep[:, i]]
+            states.append(cls._from_arrays(amps, cpts, False, coupled=coupled))
+        return states
+
+    def _basis_flags(self):
+        """Return whether any and whether all of the components are coupled
+        basis states
+        """
+        if self._coupled is None:
+            coupled = basis_registry.is_coupled(self._indices)
+            self._coupled = (bool(coupled.any()), bool(coupled.all()))
+        return self._coupled
+
+    @property
+    def data(self):
+        return list(zip(self._amps, basis_registry.states(self._indices)))
+
+    # pickle the basis states themselves, registry indices are only valid
+    # within a single process
+    def __getstate__(self):
+        return {"data": self.data, "energy": self.energy, "name": self.name}
+
+    def __setstate__(self, state):
+        self.__init__(
+            state["data"],
+            remove_zero_amp_cpts=False,
+            name=state.get("name"),
+            energy=state.get("energy", 0),
+        )
+
     # superposition: addition
-    # (highly inefficient and ugly but should work)
     def __add__(self, other):
-        data = []
-        # add components that are in self but not in other
-        for amp1, cpt1 in self.data:
-            only_in_self = True
-            for amp2, cpt2 in other.data:
-                if cpt2 == cpt1:
-                    only_in_self = False
-            if only_in_self:
-                data.append((amp1, cpt1))
-        # add components that are in other but not in self
-        for amp1, cpt1 in other:
-            only_in_other = True
-            for amp2, cpt2 in self.data:
-                if cpt2 == cpt1:
-                    only_in_other = False
-            if only_in_other:
-                data.append((amp1, cpt1))
-        # add components that are both in self and in other
-        for amp1, cpt1 in self.data:
-            for amp2, cpt2 in other.data:
-                if cpt2 == cpt1:
-                    data.append((amp1 + amp2, cpt1))
-        return State(data)
+        # components only in self, components only in other and finally the
+        # components in both
+        if self._indices.size == 0:
+            return State._from_arrays(
+                other._amps, other._indices, False, coupled=other._coupled
+            )
+        if other._indices.size == 0:
+            return State._from_arrays(
+                self._amps, self._indices, False, coupled=self._coupled
+            )
+        if self._coupled is not None and other._coupled is not None:
+            coupled = (
+                self._coupled[0] or other._coupled[0],
+                self._coupled[1] and other._coupled[1],
+            )
+        else:
+            coupled = None
+        if self._indices.size * other._indices.size <= _SMALL_STATE_SIZE:
+            indices1 = self._indices.tolist()
+            indices2 = other._indices.tolist()
+            amps2 = dict(zip(indices2, other._amps.tolist()))
+            only1, shared = [], []
+            for index, amp in zip(indices1, self._amps.tolist()):
+                if index in amps2:
+                    shared.append((index, amp + amps2.pop(index)))
+                else:
+                    only1.append((index, amp))
+            data = only1 + list(amps2.items()) + shared
+            if not data:
+                return State()
+            indices, amps = zip(*data)
+            return State._from_arrays(
+                np.array(amps, dtype=complex),
+                np.array(indices, dtype=np.intp),
+                coupled=coupled,
+            )
+        in_other = np.isin(self._indices, other._indices)
+        in_self = np.isin(other._indices, self._indices)
+        order = np.argsort(other._indices)
+        matches = order[
+            np.searchsorted(other._indices[order], self._indices[in_other])
+        ]
+        amps = np.concatenate(
+            (
+                self._amps[~in_other],
+                other._amps[~in_self],
+                self._amps[in_other] + other._amps[matches],
+            )
+        )
+        indices = np.concatenate(
+            (
+                self._indices[~in_other],
+                other._indices[~in_self],
+                self._indices[in_other],
+            )
+        )
+        return State._from_arrays(amps, indices, coupled=coupled)
 
     # superposition: subtraction
     def __sub__(self, other):
@@ -564,7 +860,9 @@ class State:
 
     # scalar product (psi * a)
     def __mul__(self, a):
-        return State([(a * amp, psi) for amp, psi in self.data])
+        return State._from_arrays(
+            a * self._amps, self._indices, coupled=self._coupled
+        )
 
     # scalar product (a * psi)
     def __rmul__(self, a):
@@ -580,21 +878,46 @@ class State:
 
     # inner product
     def __matmul__(self, other):
-        result = 0
-        for amp1, psi1 in self:
-            for amp2, psi2 in other:
-                result += amp1.conjugate() * amp2 * (psi1 @ psi2)
+        if self._indices.size * other._indices.size <= _SMALL_STATE_SIZE:
+            idx1, idx2 = np.nonzero(self._indices[:, np.newaxis] == other._indices)
+        else:
+            _, idx1, idx2 = np.intersect1d(
+                self._indices, other._indices, assume_unique=True, return_indices=True
+            )
+        result = np.vdot(self._amps[idx1], other._amps[idx2])
+
+        # components in different bases (coupled and uncoupled) require a basis
+        # transformation to calculate the overlap
+        any1, all1 = self._basis_flags()
+        any2, all2 = other._basis_flags()
+        if any1 and not all2:
+            coupled1 = basis_registry.is_coupled(self._indices)
+            coupled2 = basis_registry.is_coupled(other._indices)
+            result += self._select(coupled1).transform_to_uncoupled() @ (
+                other._select(~coupled2)
+            )
+        if not all1 and any2:
+            coupled1 = basis_registry.is_coupled(self._indices)
+            coupled2 = basis_registry.is_coupled(other._indices)
+            result += self._select(~coupled1) @ (
+                other._select(coupled2).transform_to_uncoupled()
+            )
         return result
 
+    def _select(self, mask):
+        return State._from_arrays(
+            self._amps[mask], self._indices[mask], coupled=self._coupled
+        )
+
     # iterator methods
     def __iter__(self):
-        return ((amp, state) for amp, state in self.data)
+        return zip(self._amps, basis_registry.states(self._indices))
 
     def __next__(self):
         if self.index == 0:
             raise StopIteration
         self.index -= 1
-        return self.data[self.index]
+        return self[self.index]
 
     # def __hash__(self):
     #     h = tuple(np.abs(a)*s.__hash__() for a,s in self)
@@ -605,7 +928,9 @@ class State:
 
     # direct access to a component
     def __getitem__(self, i):
-        return self.data[i]
+        if isinstance(i, slice):
+            return self.data[i]
+        return (self._amps[i], basis_registry[self._indices[i]])
 
     # this breaks the code, havent figured out why yet
     # def __len__(self):
@@ -621,7 +946,7 @@ class State:
                 continue
             string += f"{amp:.2f} x {state}"
             idx += 1
-            if (idx > 4) or (idx == len(ordered.data)):
+            if (idx > 4) or (idx == ordered._indices.size):
                 break
             string += "\n"
         if idx == 0:
@@ -632,12 +957,8 @@ class State:
     # Some utility functions
     # Function for normalizing states
     def normalize(self):
-        data = []
         N = np.sqrt(self @ self)
-        for amp, basis_state in self.data:
-            data.append([amp / N, basis_state])
-
-        return State(data)
+        return State._from_arrays(self._amps / N, self._indices)
 
     # Function that displays the state as a sum of the basis states
     def print_state(self, tol=0.1, probabilities=False):
@@ -653,8 +974,32 @@ class State:
 
     # Function that returns state vector in given basis
     def state_vector(self, QN):
-        state_vector = [1 * state @ self for state in QN]
-        return np.array(state_vector, dtype=complex)
+        basis_states = (CoupledBasisState, UncoupledBasisState)
+        if all(isinstance(state, basis_states) for state in QN):
+            indices = basis_registry.register_states(QN)
+            coupled = np.concatenate(
+                (
+                    basis_registry.is_coupled(indices),
+                    basis_registry.is_coupled(self._indices),
+                )
+            )
+        else:
+            coupled = np.array([True, False])
+        # amplitudes can only be picked out directly if QN and the state are in
+        # the same basis
+        if coupled.any() and not coupled.all():
+            state_vector = [1 * state @ self for state in QN]
+            return np.array(state_vector, dtype=complex)
+
+        state_vector = np.zeros(len(QN), dtype=complex)
+        if self._indices.size == 0:
+            return state_vector
+        order = np.argsort(self._indices)
+        positions = np.searchsorted(self._indices[order], indices)
+        positions[positions == order.size] = 0
+        match = self._indices[order][positions] == indices
+        state_vector[match] = self._amps[order[positions[match]]]
+        return state_vector
 
     # Method that generates a density matrix from state
     def density_matrix(self, QN):
@@ -668,30 +1013,17 @@ class State:
 
     # Method that removes components that are smaller than tolerance from the state
     def remove_small_components(self, tol=1e-3):
-        purged_data = []
-        for amp, basis_state in self.data:
-            if np.abs(amp) > tol:
-                purged_data.append((amp, basis_state))
-
-        return State(purged_data, energy=self.energy)
+        mask = np.abs(self._amps) > tol
+        return State._from_arrays(
+            self._amps[mask], self._indices[mask], energy=self.energy
+        )
 
     # Method for ordering states in descending order of amp^2
     def order_by_amp(self):
-        data = self.data
-        amp_array = np.zeros(len(data))
-
-        # Make an numpy array of the amplitudes
-        for i, d in enumerate(data):
-            amp_array[i] = np.abs((data[i][0])) ** 2
+        # Find ordering of amplitudes in descending order
+        index = np.argsort(-1 * np.abs(self._amps) ** 2)
 
-        # Find ordering of array in descending order
-        index = np.argsort(-1 * amp_array)
-
-        # Reorder data
-        reordered_data = data
-        reordered_data = [reordered_data[i] for i in index]
-
-        return State(reordered_data)
+        return State._from_arrays(self._amps[index], self._indices[index])
 
     # Method for printing largest component basis states
     def print_largest_components(self, n=1):
@@ -702,16 +1034,16 @@ class State:
         string = ""
 
         for i in range(0, n):
-            basis_state = state.data[i][1]
+            basis_state = state[i][1]
             basis_state.print_quantum_numbers()
 
         return string
 
     def find_largest_component(self):
-        # Order the state by amplitude
-        state = self.order_by_amp()
+        # component with the largest amplitude
+        index = np.argmax(np.abs(self._amps) ** 2)
 
-        return state.data[0][1]
+        return basis_registry[self._indices[index]]
 
     # Method for converting the state into the coupled basis
     def transform_to_coupled(self):
@@ -721,7 +1053,7 @@ class State:
 
         for amp, basis_state in self.data:
             if basis_state.isCoupled:
-                state_in_coupled_basis += State((amp, basis_state))
+                state_in_coupled_basis += State([(amp, basis_state)])
             if basis_state.isUncoupled:
                 state_in_coupled_basis += amp * basis_state.transform_to_coupled()
 
@@ -735,7 +1067,7 @@ class State:
 
         for amp, basis_state in self.data:
             if basis_state.isUncoupled:
-                state_in_uncoupled_basis += State((amp, basis_state))
+                state_in_uncoupled_basis += State([(amp, basis_state)])
             if basis_state.isCoupled:
                 state_in_uncoupled_basis += amp * basis_state.transform_to_uncoupled()
 
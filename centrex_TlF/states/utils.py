@@ -1,12 +1,19 @@
 from dataclasses import dataclass
 from functools import lru_cache
-from itertools import product
 from typing import List, SupportsFloat, Union
 
 import numpy as np
+import scipy.optimize
+import scipy.sparse
 from centrex_TlF.hamiltonian.utils import reorder_evecs
+from centrex_TlF.hamiltonian.wigner_table import clebsch_gordan_table
+from centrex_TlF.states.basis import (
+    Basis,
+    as_basis,
+    basis_registry,
+    quantum_number_table,
+)
 from centrex_TlF.states.states import CoupledBasisState, State
-from sympy.physics.quantum.cg import CG
 
 __all__ = [
     "find_state_idx_from_state",
@@ -20,65 +27,124 @@ __all__ = [
     "QuantumSelector",
     "get_unique_basisstates",
     "SystemParameters",
+    "states_to_matrix",
 ]
 
 
 @lru_cache(maxsize=int(1e6))
 def CGc(j1, m1, j2, m2, j3, m3):
-    return complex(CG(j1, m1, j2, m2, j3, m3).doit())
+    return complex(clebsch_gordan_table(j1, m1, j2, m2, j3, m3))
 
 
 def parity_X(J):
     return (-1) ** J
 
 
-def find_states_idxs_from_states(H, reference_states, QN, V_ref=None):
-    # find eigenvectors of the given Hamiltonian
-    E, V = np.linalg.eigh(H)
+def _registry_matrix(states):
+    """Sparse matrix with the amplitudes of states in its columns and a row for
+    every basis state in the basis registry
 
-    if V_ref is not None:
-        E, V = reorder_evecs(V, E, V_ref)
+    Args:
+        states (list): State objects or basis states
 
-    indices = []
-    for reference_state in reference_states:
-        # determine state vector of reference state
-        reference_state_vec = reference_state.state_vector(QN)
+    Returns:
+        (scipy.sparse.csc_matrix, np.ndarray): amplitude matrix and registry
+                                                indices of all components
+    """
+    amps = [np.zeros(0, dtype=complex)]
+    indices = [np.zeros(0, dtype=np.intp)]
+    for state in states:
+        if isinstance(state, State):
+            amps.append(state._amps)
+            indices.append(state._indices)
+        else:
+            amps.append(np.ones(1, dtype=complex))
+            indices.append(np.array([basis_registry.register(state)], dtype=np.intp))
+    columns = np.repeat(np.arange(len(states)), [index.size for index in indices[1:]])
+    indices = np.concatenate(indices)
+    matrix = scipy.sparse.csc_matrix(
+        (np.concatenate(amps), (indices, columns)),
+        shape=(len(basis_registry), len(states)),
+    )
+    return matrix, indices
 
-        overlaps = np.dot(np.conj(reference_state_vec), V)
-        probabilities = overlaps * np.conj(overlaps)
 
-        indices.append(np.argmax(probabilities))
-    return indices
+def states_to_matrix(states, basis, sparse=False):
+    """Express states in a basis, equivalent to calling State.state_vector(basis)
+    for each state, with a single sparse matrix product
 
+    Args:
+        states (list): State objects or basis states
+        basis (list, np.ndarray, Basis): states defining the basis
+        sparse (bool, optional): return a sparse matrix. Defaults to False.
 
-def find_state_idx_from_state(H, reference_state, QN, V_ref=None):
-    """Determine the index of the state vector most closely corresponding to an
-    input state
+    Returns:
+        np.ndarray, scipy.sparse.csc_matrix: matrix with the state vectors of
+                                            states as columns
+    """
+    basis_matrix, basis_indices = _registry_matrix(basis)
+    states_matrix, states_indices = _registry_matrix(states)
+    coupled = basis_registry.is_coupled(np.append(basis_indices, states_indices))
+    if coupled.any() and not coupled.all():
+        # overlaps between coupled and uncoupled basis states require a basis
+        # transformation
+        matrix = np.array([(1 * state).state_vector(basis) for state in states]).T
+        matrix = matrix.reshape(len(basis), len(states))
+        return scipy.sparse.csc_matrix(matrix) if sparse else matrix
+    # resize in case the registry grew while building the states matrix
+    basis_matrix.resize(states_matrix.shape[0], basis_matrix.shape[1])
+    matrix = (basis_matrix.conj().T @ states_matrix).tocsc()
+    return matrix if sparse else matrix.toarray()
+
+
+def find_states_idxs_from_states(H, reference_states, QN, V_ref=None, one_to_one=False):
+    """Determine the indices of the eigenvectors of H most closely corresponding
+    to a set of reference states. H is diagonalized once and the overlaps of
+    all reference states with all eigenvectors are calculated in a single
+    matrix product.
 
     Args:
         H (np.ndarray): Hamiltonian to compare to
-        reference_state (State): state to find closest state in H to
+        reference_states (list): states to find the closest eigenvectors of H to
         QN (list): list of state objects defining the basis for H
+        V_ref (np.ndarray, optional): reference eigenvector matrix used to order
+                                        the eigenvectors. Defaults to None.
+        one_to_one (bool, optional): assign each reference state to a different
+                                    eigenvector by maximizing the total overlap
+                                    probability. Defaults to False.
 
     Returns:
-        int: index of closest state vector of H corresponding to reference_state
+        np.ndarray: indices of the closest eigenvectors of H
     """
-
-    # determine state vector of reference state
-    reference_state_vec = reference_state.state_vector(QN)
-
     # find eigenvectors of the given Hamiltonian
     E, V = np.linalg.eigh(H)
 
     if V_ref is not None:
         E, V = reorder_evecs(V, E, V_ref)
 
-    overlaps = np.dot(np.conj(reference_state_vec), V)
-    probabilities = overlaps * np.conj(overlaps)
+    reference_vectors = states_to_matrix(reference_states, QN)
+    overlaps = reference_vectors.conj().T @ V
+    probabilities = np.abs(overlaps) ** 2
 
-    idx = np.argmax(probabilities)
+    if one_to_one:
+        _, indices = scipy.optimize.linear_sum_assignment(probabilities, maximize=True)
+        return indices
+    return np.argmax(probabilities, axis=1)
 
-    return idx
+
+def find_state_idx_from_state(H, reference_state, QN, V_ref=None):
+    """Determine the index of the state vector most closely corresponding to an
+    input state
+
+    Args:
+        H (np.ndarray): Hamiltonian to compare to
+        reference_state (State): state to find closest state in H to
+        QN (list): list of state objects defining the basis for H
+
+    Returns:
+        int: index of closest state vector of H corresponding to reference_state
+    """
+    return find_states_idxs_from_states(H, [reference_state], QN, V_ref)[0]
 
 
 def find_closest_vector_idx(state_vec, vector_array):
@@ -100,23 +166,26 @@ def find_closest_vector_idx(state_vec, vector_array):
     return idx
 
 
-def find_exact_states(states_approx, H, QN, V_ref=None):
+def find_exact_states(states_approx, H, QN, V_ref=None, one_to_one=False):
     """Find closest approximate eigenstates corresponding to states_approx
 
     Args:
         states_approx (list): list of State objects
         H (np.ndarray): Hamiltonian, diagonal in basis QN
         QN (list): list of State objects defining the basis for H
+        V_ref (np.ndarray, optional): reference eigenvector matrix used to order
+                                        the eigenvectors. Defaults to None.
+        one_to_one (bool, optional): prevent multiple approximate states from
+                                    mapping to the same eigenstate.
+                                    Defaults to False.
 
     Returns:
         list: list of eigenstates of H closest to states_approx
     """
-    states = []
-    for state_approx in states_approx:
-        i = find_state_idx_from_state(H, state_approx, QN, V_ref)
-        states.append(QN[i])
-
-    return states
+    indices = find_states_idxs_from_states(
+        H, states_approx, QN, V_ref=V_ref, one_to_one=one_to_one
+    )
+    return [QN[i] for i in indices]
 
 
 def check_approx_state_exact_state(approx, exact):
@@ -145,12 +214,11 @@ def check_approx_state_exact_state(approx, exact):
 def BasisStates_from_State(states):
     if not isinstance(states, (list, np.ndarray, tuple)):
         states = [states]
-    unique = []
+    unique = {}
     for state in states:
         for amp, basisstate in state:
-            if basisstate not in unique:
-                unique.append(basisstate)
-    return np.array(unique)
+            unique.setdefault(basisstate)
+    return np.array(list(unique))
 
 
 NumberType = type(SupportsFloat)
@@ -167,6 +235,9 @@ class QuantumSelector:
         F (Union[NumberType, list, np.ndarray]):
         mF (Union[NumberType, list, np.ndarray]):
         electronic (Union[str, list, np.ndarray]): electronic state
+        P (Union[NumberType, list, np.ndarray]): parity
+        Ω (Union[NumberType, list, np.ndarray]): projection of the electronic
+                                                angular momentum
     """
 
     J: Union[NumberType, list, np.ndarray] = None
@@ -211,61 +282,36 @@ def get_indices_quantumnumbers_base(
                                         indices for
         QN (Union[list, np.ndarray]): list or array of states
 
-    Raises:
-        AssertionError: only supports State and CoupledBasisState types the States list
-        or array
-
     Returns:
         np.ndarray: indices corresponding to the quantum numbers
     """
     assert isinstance(
         qn_selector, QuantumSelector
     ), "supply a QuantumSelector object to select states"
-    if isinstance(QN[0], State):
-        Js = np.array([s.find_largest_component().J for s in QN])
-        F1s = np.array([s.find_largest_component().F1 for s in QN])
-        Fs = np.array([s.find_largest_component().F for s in QN])
-        mFs = np.array([s.find_largest_component().mF for s in QN])
-        estates = np.array([s.find_largest_component().electronic_state for s in QN])
-    elif isinstance(QN[0], CoupledBasisState):
-        Js = np.array([s.J for s in QN])
-        F1s = np.array([s.F1 for s in QN])
-        Fs = np.array([s.F for s in QN])
-        mFs = np.array([s.mF for s in QN])
-        estates = np.array([s.electronic_state for s in QN])
-    else:
-        raise AssertionError(
-            "get_indices_quantumnumbers_base() only supports State and "
-            "CoupledBasisState types the States list or array"
-        )
+    assert (
+        qn_selector.electronic is not None
+    ), "supply the electronic state to select states"
 
-    J = qn_selector.J
-    F1 = qn_selector.F1
-    F = qn_selector.F
-    mF = qn_selector.mF
-    estate = qn_selector.electronic
-    assert estate is not None, "supply the electronic state to select states"
-
-    # generate all combinations
-    fields = []
-    for par in ["J", "F1", "F", "mF", "electronic"]:
-        par = getattr(qn_selector, par)
-        fields.append([par] if not isinstance(par, (list, tuple, np.ndarray)) else par)
-    combinations = product(*fields)
-
-    mask = np.zeros(len(QN), dtype=bool)
-    mask_all = np.ones(len(QN), dtype=bool)
-    for J, F1, F, mF, estate in combinations:
-        # generate the masks for states in QN where the conditions are met
-        mask_J = Js == J if J is not None else mask_all
-        mask_F1 = F1s == F1 if F1 is not None else mask_all
-        mask_F = Fs == F if F is not None else mask_all
-        mask_mF = mFs == mF if mF is not None else mask_all
-        mask_es = (
-            estates == estate if estate is not None else np.zeros(len(QN), dtype=bool)
-        )
-        # get the indices of the states in QN to compact
-        mask = mask | (mask_J & mask_F1 & mask_F & mask_mF & mask_es)
+    if isinstance(QN, Basis):
+        quantum_numbers = QN.quantum_numbers
+    else:
+        quantum_numbers = quantum_number_table(QN)
+
+    # states are selected if they match any of the values given for each
+    # quantum number
+    mask = np.ones(len(QN), dtype=bool)
+    for field, par in [
+        ("J", "J"),
+        ("F1", "F1"),
+        ("F", "F"),
+        ("mF", "mF"),
+        ("electronic", "electronic"),
+        ("P", "P"),
+        ("Omega", "Ω"),
+    ]:
+        values = getattr(qn_selector, par)
+        if values is not None:
+            mask &= np.isin(quantum_numbers[field], values)
 
     if mode == "python":
         return np.where(mask)[0]
@@ -299,6 +345,8 @@ def get_indices_quantumnumbers(
     if isinstance(qn_selector, QuantumSelector):
         return get_indices_quantumnumbers_base(qn_selector, QN)
     elif isinstance(qn_selector, (list, np.ndarray)):
+        # compute the quantum number table only once for all selectors
+        QN = as_basis(QN)
         return np.unique(
             np.concatenate(
                 [get_indices_quantumnumbers_base(qns, QN) for qns in qn_selector]
@@ -319,10 +367,7 @@ def get_unique_basisstates(states: Union[list, np.ndarray]) -> Union[list, np.nd
     Returns:
         Union[list, np.ndarray]: list/array of unique BasisStates
     """
-    states_unique = []
-    for state in states:
-        if state not in states_unique:
-            states_unique.append(state)
+    states_unique = list(dict.fromkeys(states))
 
     if isinstance(states, np.ndarray):
         states_unique = np.asarray(states_unique)
@@ -330,66 +375,44 @@ def get_unique_basisstates(states: Union[list, np.ndarray]) -> Union[list, np.nd
     return states_unique
 
 
-def matrix_to_states(V: np.ndarray, QN: List)-> List[State]:
+def matrix_to_states(V: np.ndarray, QN: List, tol: float = 0) -> List[State]:
     """
     Converts matrix of eigenvectors (each column a vector) to a list of states
-    in the basis defined by QN
+    in the basis defined by QN. The largest component of each state is made
+    positive. The amplitudes of the States are views of a single sign corrected
+    copy of V where possible.
 
     Args:
         V (np.ndarray)  :   numpy array to be converted to State-objects.
                             Each column corresponds to a state vector.
         QN (List)       :   List of BasisStates that defines the basis for
                             the state vectors
+        tol (float)     :   components with an absolute amplitude not larger
+                            than tol are omitted. Defaults to 0.
     Returns:
-        List[State]     :   List of States corresponding to columns of V    
+        List[State]     :   List of States corresponding to columns of V
     """
+    V = np.asarray(V, dtype=complex)
+    # ensure that largest component of each state has positive sign
+    index = np.argmax(np.abs(V), axis=0)
+    V = V * np.sign(V[index, np.arange(V.shape[1])])
+    return State._from_columns(V, QN, tol=tol)
 
-    #Find dimensions of matrix
-    matrix_dimensions = V.shape
-    
-    #Initialize a list for storing eigenstates
-    eigenstates = []
-    
-    for i in range(0,matrix_dimensions[1]):
-        #Find state vector
-        state_vector = V[:,i]
-
-        #Ensure that largest component has positive sign
-        index = np.argmax(np.abs(state_vector))
-        state_vector = state_vector * np.sign(state_vector[index])
-        
-        state = State()
-        
-        #Get data in correct format for initializing state object
-        for j, amp in enumerate(state_vector):
-            state += amp*QN[j]
-
-        #Store the state in the list
-        eigenstates.append(state)
-        
-    
-    #Return the list of states
-    return eigenstates
 
 def vector_to_state(state_vector: np.ndarray, QN: List) -> State:
     """
     Converts a state vector into a State in the basis defined by QN.
 
     Args:
-        state_vector (np.ndarray):   
+        state_vector (np.ndarray):
             numpy array to be converted to State.
         QN (List):
             List of BasisStates that defines the basis for
             the state vector
     Returns:
         State:
-            State corresponding to state vector       
+            State corresponding to state vector
 
     """
-    state = State()
-    
-    #Get data in correct format for initializing state object
-    for j, amp in enumerate(state_vector):
-        state += amp*QN[j]
-        
-    return state
+    state_vector = np.array(state_vector, dtype=complex)
+    return State._from_columns(state_vector[:, np.newaxis], QN)[0]
@@ -1,4 +1,5 @@
 import numpy as np
+from centrex_TlF.states.basis import quantum_number_table
 
 __all__ = [""]
 
@@ -13,30 +14,19 @@ def compact_QN_coupled_indices(QN, indices_compact):
     Returns:
         list: compacted states
     """
-    QNc = [QN[idx] for idx in indices_compact]
-
-    def slc(s):
-        return s.find_largest_component()
-
-    Js = np.unique([slc(s).J for s in QNc if slc(s).J is not None])
-    F1s = np.unique([slc(s).F1 for s in QNc if slc(s).F1 is not None])
-    Fs = np.unique([slc(s).F for s in QNc if slc(s).F is not None])
-    mFs = np.unique([slc(s).mF for s in QNc if slc(s).mF is not None])
-    Ps = np.unique([slc(s).P for s in QNc if slc(s).P is not None])
+    table = quantum_number_table([QN[idx] for idx in indices_compact])
 
     QNcompact = [qn for idx, qn in enumerate(QN) if idx not in indices_compact[1:]]
 
+    # quantum numbers that differ between the compacted states are removed from
+    # the representative state
     state_rep = QNcompact[indices_compact[0]].find_largest_component()
-    if len(Js) != 1:
-        state_rep.J = None
-    if len(F1s) != 1:
-        state_rep.F1 = None
-    if len(Fs) != 1:
-        state_rep.F = None
-    if len(mFs) != 1:
-        state_rep.mF = None
-    if len(Ps) != 1:
-        state_rep.P = None
+    quantum_numbers = {}
+    for name in ["J", "F1", "F", "mF", "P"]:
+        values = table[name][~np.isnan(table[name])]
+        if np.unique(values).size != 1:
+            quantum_numbers[name] = None
+    state_rep = state_rep.replace(**quantum_numbers)
 
     # make it a state again instead of uncoupled basisstate
     QNcompact[indices_compact[0]] = (1.0 + 0j) * state_rep
@@ -1,20 +1,23 @@
-import json
-import pickle
 from functools import lru_cache
-from pathlib import Path
 
 import numpy as np
 import scipy
 import scipy.linalg
 from centrex_TlF.hamiltonian import (
+    eigh_partial,
     generate_coupled_hamiltonian_B,
     generate_coupled_hamiltonian_B_function,
+    generate_coupled_basis,
     generate_diagonalized_hamiltonian,
+    generate_transform_matrix_uncoupled_to_coupled,
+    generate_uncoupled_basis,
     generate_uncoupled_hamiltonian_X,
     generate_uncoupled_hamiltonian_X_function,
     matrix_to_states,
+    pre_calculated_manifest,
+    pre_calculated_transitions,
 )
-from centrex_TlF.states.states import CoupledBasisState
+from centrex_TlF.states.states import CoupledBasisState, State
 from centrex_TlF.states.utils import (
     BasisStates_from_State,
     find_closest_vector_idx,
@@ -67,17 +70,19 @@ def calculate_energies(
     nprocs=1,
 ):
 
-    # transform coupled basis to uncoupled
-    QN_X_uc = [s.transform_to_uncoupled() for s in ground_states]
-    # grab unique BasisStates from the State objects
-    QN_X_uc = BasisStates_from_State(QN_X_uc)
+    # uncoupled basis states that make up the ground states
+    ground_basis = BasisStates_from_State([1 * s for s in ground_states])
+    QN_X_uc = generate_uncoupled_basis(ground_basis)
     # calculate and diagonalize the X state Hamiltonian
     H_X = generate_uncoupled_hamiltonian_X(QN_X_uc, nprocs=nprocs)
     H_X = generate_uncoupled_hamiltonian_X_function(H_X)(E, B)
     H_X, V_X = generate_diagonalized_hamiltonian(H_X, keep_order=False)
-    # generate the corresponding ground states in coupled basis
-    QN_X = matrix_to_states(V_X, QN_X_uc)
-    QN_X = [s.transform_to_coupled() for s in QN_X]
+    # generate the corresponding ground states in coupled basis, with the
+    # largest uncoupled component positive as in matrix_to_states
+    V_X = V_X * np.sign(V_X[np.argmax(np.abs(V_X), axis=0), np.arange(V_X.shape[1])])
+    QN_X_c = generate_coupled_basis(QN_X_uc)
+    S = generate_transform_matrix_uncoupled_to_coupled(QN_X_uc, QN_X_c)
+    QN_X = [State(list(zip(vector, QN_X_c))) for vector in (S.conj().T @ V_X).T]
 
     # calculate and diagonalize the B state Hamiltonian
     H_B = generate_coupled_hamiltonian_B(excited_states, nprocs=nprocs)
@@ -97,7 +102,7 @@ def calculate_energies(
     return QN, H_tot
 
 
-def calculate_state_energy(state, H, QN):
+def calculate_state_energy(state, H, QN, partial=False):
     """
     Function that calculates the energy of the given state.
 
@@ -106,6 +111,7 @@ def calculate_state_energy(state, H, QN):
     H           : Hamiltonian that is used to calculate the energies of states 1 and 2
                   (assumed to be in angular frequency units - 2pi*Hz)
     QN          : List of State objects that defines the basis for the Hamiltonian
+    partial     : only calculate the eigenstates near the state, see eigh_partial
 
     returns:
     energy        : Energy of state in joules
@@ -114,6 +120,10 @@ def calculate_state_energy(state, H, QN):
     if not isinstance(state, np.ndarray):
         state1 = state.state_vector(QN)
 
+    if partial:
+        D, _ = eigh_partial(H, reference=state1)
+        return D[0] * hbar
+
     # Diagonalize hamiltonian
     D, V = np.linalg.eigh(H)
 
@@ -127,7 +137,7 @@ def calculate_state_energy(state, H, QN):
     return E
 
 
-def calculate_transition_frequency(state1, state2, H, QN):
+def calculate_transition_frequency(state1, state2, H, QN, partial=False):
     """
     Function that outputs the frequency of the transition between state1 and state2
     which are assumed to be eigenstates of the Hamiltonian H whose basis is defined by
@@ -143,6 +153,8 @@ def calculate_transition_frequency(state1, state2, H, QN):
     H           : Hamiltonian that is used to calculate the energies of states 1 and 2
                     (assumed to be in angular frequency units - 2pi*Hz)
     QN          : List of State objects that defines the basis for the Hamiltonian
+    partial     : only calculate the eigenstates near states 1 and 2 with a sparse
+                    solver, see eigh_partial
 
     returns:
     freq        : Transition frequency between states 1 and 2 in Hz
@@ -154,6 +166,10 @@ def calculate_transition_frequency(state1, state2, H, QN):
     if not isinstance(state2, np.ndarray):
         state2 = state2.state_vector(QN)
 
+    if partial:
+        D, _ = eigh_partial(H, reference=np.stack([state1, state2], axis=1))
+        return np.abs(D[0] - D[1]) / (2 * np.pi)
+
     # Diagonalize hamiltonian
     D, V = np.linalg.eigh(H)
 
@@ -171,10 +187,7 @@ def calculate_transition_frequency(state1, state2, H, QN):
 
 def _check_precached(state, config=None):
     if not config:
-        path = Path(__file__).parent.parent / "pre_calculated"
-        js = path / "precalculated.json"
-        with open(js) as json_file:
-            config = json.load(json_file)
+        config = pre_calculated_manifest()
 
     Js = np.unique([s.J for _, s in state])
     es = state.find_largest_component().electronic_state
@@ -200,15 +213,12 @@ def generate_transition_frequency(state1, state2):
     Returns:
         frequency: transition frequency in 2π⋅Hz
     """
-    path = Path(__file__).parent.parent / "pre_calculated"
-
     # check if state1 and state2 are included in the pre-cached transitions
     _check_precached(state1)
     _check_precached(state2)
 
-    with open(path / "transitions.pickle", "rb") as f:
-        _ = pickle.load(f)
-        QN, H = _["QN"], _["H"]
+    transitions = pre_calculated_transitions()
+    QN, H = transitions["QN"], transitions["H"]
 
     return calculate_transition_frequency(state1, state2, H, QN)
 
@@ -225,16 +235,13 @@ def generate_transition_frequencies(states1, states2):
     Returns:
         frequency: transition frequency in 2π⋅Hz
     """
-    path = Path(__file__).parent.parent / "pre_calculated"
-
     # check if states1 and states2 are included in the pre-cached transitions
     for state1, state2 in zip(states1, states2):
         _check_precached(state1)
         _check_precached(state2)
 
-    with open(path / "transitions.pickle", "rb") as f:
-        _ = pickle.load(f)
-        QN, H = _["QN"], _["H"]
+    transitions = pre_calculated_transitions()
+    QN, H = transitions["QN"], transitions["H"]
 
     indices1 = find_states_idxs_from_states(H, states1, QN)
     indices2 = find_states_idxs_from_states(H, states2, QN)
@@ -1,6 +1,7 @@
 import numpy as np
 import scipy.constants as cst
 from centrex_TlF.couplings.utils_compact import delete_row_column
+from centrex_TlF.states.basis import as_basis
 from centrex_TlF.states.utils import QuantumSelector
 
 __all__ = [
@@ -114,6 +115,9 @@ def generate_thermal_population_states(states_to_fill, states, T):
     Returns:
         np.ndarray: density matrix with trace normalized to 1
     """
+    # quantum numbers of all states are only computed once
+    states = as_basis(states)
+
     # branch for single QuantumSelector use
     if isinstance(states_to_fill, QuantumSelector):
         # get all involved Js
@@ -140,7 +144,7 @@ def generate_thermal_population_states(states_to_fill, states, T):
 
     # remove duplicates from Js and indices_to_fill
     Js = np.unique(Js)
-    indices_to_fill = np.unique(indices_to_fill)
+    indices_to_fill = np.unique(indices_to_fill).astype(int)
 
     # thermal population per hyperfine level for each involved J
     thermal_populations = dict(
@@ -149,10 +153,8 @@ def generate_thermal_population_states(states_to_fill, states, T):
     # generate an empty density matrix
     ρ = np.zeros([len(states), len(states)], dtype=complex)
     # fill the density matrix
-    for idρ in indices_to_fill:
-        state = states[idρ].find_largest_component()
-        thermal_pop = thermal_populations[state.J]
-        ρ[idρ, idρ] = thermal_pop
+    for idρ, J in zip(indices_to_fill, states.quantum_numbers["J"][indices_to_fill]):
+        ρ[idρ, idρ] = thermal_populations[J]
     # normalize the trace to 1 and return the density matrix
     return ρ / np.trace(ρ)
 
@@ -0,0 +1,29 @@
+import numpy as np
+from centrex_TlF.hamiltonian import (
+    calculate_transform_matrix,
+    generate_coupled_basis,
+    generate_transform_matrix,
+    generate_uncoupled_basis,
+)
+from centrex_TlF.states import (
+    BasisStates_from_State,
+    generate_coupled_states_ground,
+    generate_uncoupled_states_ground,
+)
+
+
+def test_generate_transform_matrix():
+    QN = generate_uncoupled_states_ground([0, 1, 2])
+    QNc = generate_coupled_states_ground([0, 1, 2])
+    S = generate_transform_matrix(QN, QNc)
+    S_ref = calculate_transform_matrix(QN, QNc, nprocs=1)
+    assert np.allclose(S, S_ref, atol=1e-14)
+    assert np.allclose(generate_transform_matrix(QNc, QN), S.conj().T)
+
+
+def test_generate_uncoupled_basis():
+    QNc = generate_coupled_states_ground([1, 2])
+    QN = generate_uncoupled_basis(QNc)
+    QN_ref = BasisStates_from_State([s.transform_to_uncoupled() for s in QNc])
+    assert QN == list(QN_ref)
+    assert set(generate_coupled_basis(QN)) == set(QNc)
@@ -0,0 +1,41 @@
+import numpy as np
+from centrex_TlF.hamiltonian import (
+    field_scan,
+    generate_uncoupled_hamiltonian_X,
+    generate_uncoupled_hamiltonian_X_function,
+    track_field_scan,
+)
+from centrex_TlF.states import generate_uncoupled_states_ground
+
+
+def test_field_scan():
+    H = generate_uncoupled_hamiltonian_X(generate_uncoupled_states_ground([0, 1, 2]))
+    H_function = generate_uncoupled_hamiltonian_X_function(H)
+    E_array = np.zeros((5, 3))
+    E_array[:, 2] = np.linspace(0, 200, 5)
+    B = [0, 0, 0.1]
+
+    energies, eigenvectors = field_scan(H, E_array, B, chunk_size=2, nthreads=2)
+    for E, D, V in zip(E_array, energies, eigenvectors):
+        H_field = H_function(E, B)
+        assert np.allclose(D, np.linalg.eigvalsh(H_field))
+        assert np.allclose(H_field @ V, V * D, atol=1e-3)
+    assert np.allclose(field_scan(H, E_array, B, energies_only=True), energies)
+
+
+def test_track_field_scan():
+    QN = generate_uncoupled_states_ground([0, 1, 2])
+    H = generate_uncoupled_hamiltonian_X(QN)
+    E_array = np.zeros((41, 3))
+    E_array[:, 2] = np.linspace(0, 100, 41)
+    B = [0, 0, 0.5]
+
+    energies, eigenvectors, labels = track_field_scan(H, E_array, B, QN=QN)
+    assert all(s.isCoupled for s in labels)
+    assert [s.J for s in labels] == sorted(s.J for s in labels)
+    energies_sorted = field_scan(H, E_array, B, energies_only=True)
+    assert np.allclose(np.sort(energies, axis=1), energies_sorted)
+    # tracked energies are smooth where sorted energies swap at crossings
+    assert np.abs(np.diff(energies, 2, axis=0)).max() < 0.2 * np.abs(
+        np.diff(energies_sorted, 2, axis=0)
+    ).max()
@@ -0,0 +1,50 @@
+import functools
+
+import numpy as np
+import pytest
+from centrex_TlF.hamiltonian import (
+    get_operator,
+    hamiltonian_B_terms_coupled,
+    hamiltonian_terms_uncoupled,
+    operator_key,
+    register_operator,
+    registered_operators,
+)
+from centrex_TlF.hamiltonian.generate_hamiltonian import HMatElems
+from centrex_TlF.states import (
+    generate_coupled_states_excited,
+    generate_uncoupled_states_ground,
+)
+
+
+def test_HMatElems():
+    QN = generate_coupled_states_excited([1, 2], Ps=[-1, 1])
+    H = hamiltonian_B_terms_coupled.H_LD
+    H_ref = np.array([[(1 * a) @ H(b) for b in QN] for a in QN])
+    assert np.allclose(HMatElems(H, QN), H_ref)
+
+
+def test_HMatElems_parallel():
+    QN = generate_coupled_states_excited([1, 2], Ps=[-1, 1])
+    H = hamiltonian_B_terms_coupled.H_mhf_Tl
+    assert np.array_equal(HMatElems(H, QN, nprocs=2), HMatElems(H, QN))
+
+
+def test_HMatElems_registered_operator():
+    QN = generate_uncoupled_states_ground([0, 1])
+    register_operator("test.Hc1", hamiltonian_terms_uncoupled.Hc1, c1=1.0)
+    H = hamiltonian_terms_uncoupled.Hc1(QN[4], c1=1.0)
+    assert np.allclose(HMatElems("test.Hc1", QN)[:, 4], [(1 * a) @ H for a in QN])
+    assert np.array_equal(
+        HMatElems("test.Hc1", QN, nprocs=2), HMatElems(get_operator("test.Hc1"), QN)
+    )
+
+
+def test_HMatElems_unregistered_operator():
+    QN = generate_uncoupled_states_ground([0, 1])
+    H = functools.partial(hamiltonian_terms_uncoupled.Hc1, c1=1.0)
+    operators = registered_operators()
+    assert np.array_equal(HMatElems(H, QN, nprocs=2), HMatElems(H, QN))
+    assert registered_operators() == operators
+    with pytest.raises(KeyError):
+        operator_key(H)
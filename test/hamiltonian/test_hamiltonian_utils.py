@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+from centrex_TlF.hamiltonian import (
+    block_indices,
+    eigh_blocked,
+    eigh_incremental,
+    eigh_partial,
+    generate_diagonalized_hamiltonian,
+    generate_uncoupled_hamiltonian_X,
+    generate_uncoupled_hamiltonian_X_function,
+    matrix_to_states,
+    utils,
+)
+from centrex_TlF.states import find_exact_states, generate_uncoupled_states_ground
+
+
+def test_eigh_blocked():
+    rng = np.random.default_rng(0)
+    H = np.zeros((7, 7), dtype=complex)
+    for indices in [[0, 3, 5], [1, 6], [2, 4]]:
+        block = rng.normal(size=(len(indices),) * 2) + 1j * rng.normal(
+            size=(len(indices),) * 2
+        )
+        H[np.ix_(indices, indices)] = block + block.conj().T
+    assert [b.tolist() for b in block_indices(H)] == [[0, 3, 5], [1, 6], [2, 4]]
+
+    D, V = eigh_blocked(H)
+    assert np.allclose(D, np.linalg.eigvalsh(H))
+    assert np.allclose(H @ V, V * D)
+    assert np.allclose(V.conj().T @ V, np.eye(7))
+
+
+def test_generate_uncoupled_hamiltonian_X_function_real():
+    H = generate_uncoupled_hamiltonian_X(generate_uncoupled_states_ground([0, 1]))
+    H_function = generate_uncoupled_hamiltonian_X_function(H)
+    E, B = [10, 0, 100], [0.1, 0, 0.5]
+    H_real = H_function(E, B)
+    assert H_real.dtype == np.float64
+    assert H_function([0, 10, 0], B).dtype == np.complex128
+
+    H_complex = 2 * np.pi * (
+        H["Hff"]
+        + E[0] * H["HSx"]
+        + E[2] * H["HSz"]
+        + B[0] * H["HZx"]
+        + B[2] * H["HZz"]
+    )
+    assert np.allclose(H_real, H_complex)
+    assert np.allclose(np.linalg.eigvalsh(H_real), np.linalg.eigvalsh(H_complex))
+
+
+def test_eigh_partial():
+    QN = generate_uncoupled_states_ground([0, 1, 2, 3])
+    H = generate_uncoupled_hamiltonian_X(QN)
+    H = generate_uncoupled_hamiltonian_X_function(H)([0, 0, 50], [0, 0, 0.5])
+    D, V = np.linalg.eigh(H)
+
+    window = (D[10] - 1, D[20] + 1)
+    D_window, V_window = eigh_partial(H, window=window)
+    assert np.allclose(D_window, D[10:21])
+    assert np.allclose(H @ V_window, V_window * D_window, atol=1e-2)
+
+    assert np.allclose(eigh_partial(H, k=3, sigma=D[30])[0], D[29:32])
+
+    reference = np.zeros(len(QN))
+    reference[7] = 1
+    D_reference, _ = eigh_partial(H, reference=reference)
+    assert D_reference[0] == pytest.approx(D[np.argmax(np.abs(V[7]))])
+
+
+def test_eigh_partial_exact_eigenvector():
+    # the shift-invert shift is exactly an eigenvalue
+    H = np.diag(np.arange(20.0))
+    reference = np.zeros((20, 2))
+    reference[[3, 12], [0, 1]] = 1
+    D, V = eigh_partial(H, reference=reference)
+    assert np.allclose(D, [3, 12])
+    assert np.allclose(np.abs(V), reference)
+    assert np.allclose(eigh_partial(H, window=(4, 6))[0], [4, 5, 6])
+
+
+def test_generate_diagonalized_hamiltonian_window():
+    QN = generate_uncoupled_states_ground([0, 1, 2, 3])
+    H = generate_uncoupled_hamiltonian_X(QN)
+    H = generate_uncoupled_hamiltonian_X_function(H)([0, 0, 50], [0, 0, 0.5])
+    D = np.linalg.eigh(H)[0]
+
+    H_diag, V, V_ref = generate_diagonalized_hamiltonian(
+        H, return_V_ref=True, window=(D[10] - 1, D[20] + 1)
+    )
+    assert V.shape == (len(QN), 11) and V_ref.shape == H_diag.shape == (11, 11)
+    QN_diag = matrix_to_states(V, QN)
+    states = find_exact_states([1 * QN_diag[3]], H_diag, QN_diag, V_ref=V_ref)
+    assert states[0] is QN_diag[3]
+
+
+def test_eigh_incremental(monkeypatch):
+    calls = []
+
+    def eigh_blocked_spy(H, nthreads=1):
+        calls.append(1)
+        return eigh_blocked(H, nthreads)
+
+    monkeypatch.setattr(utils, "eigh_blocked", eigh_blocked_spy)
+    QN = generate_uncoupled_states_ground([0, 1, 2, 3])
+    H = generate_uncoupled_hamiltonian_X(QN)
+    H = generate_uncoupled_hamiltonian_X_function(H)
+    _, V_start = np.linalg.eigh(H([50, 20, 50], [0, 0, 0.5]))
+
+    # small steps are updated perturbatively, large steps diagonalized fully
+    atol = 2 * np.pi
+    for step, fallback in [(0.01, False), (1, None), (1000, True)]:
+        H_step = H([50 + step, 20, 50 + step], [0, 0, 0.5])
+        calls.clear()
+        D, V = eigh_incremental(H_step, V_start, atol)
+        if fallback is not None:
+            assert bool(calls) == fallback
+        assert np.allclose(D, np.linalg.eigh(H_step)[0], rtol=0, atol=atol)
+        assert np.linalg.norm(H_step @ V - V * D, axis=0).max() <= atol
+        assert np.allclose(V.conj().T @ V, np.eye(len(QN)))
+
+    # a strongly mixed near-degenerate pair is diagonalized as a cluster, the
+    # other states are still updated perturbatively
+    rng = np.random.default_rng(0)
+    H = rng.normal(size=(40, 40))
+    H = np.diag(1000.0 * np.arange(40)) + 2.5 * (H + H.T)
+    H[10, 10] = H[11, 11]
+    H[10, 11] = H[11, 10] = 300
+    calls.clear()
+    D, V = eigh_incremental(H, np.eye(40), 1e-3)
+    assert not calls
+    assert np.allclose(D, np.linalg.eigvalsh(H))
+    assert np.linalg.norm(H @ V - V * D, axis=0).max() <= 1e-3
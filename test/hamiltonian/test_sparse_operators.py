@@ -0,0 +1,20 @@
+import numpy as np
+from centrex_TlF.hamiltonian import (
+    SparseOperators,
+    hamiltonian_terms_uncoupled,
+    sparse_operators,
+)
+from centrex_TlF.hamiltonian.generate_hamiltonian import HMatElems
+from centrex_TlF.states import generate_uncoupled_states_ground
+
+
+def test_sparse_operators():
+    QN = generate_uncoupled_states_ground([1, 3])
+    operators = SparseOperators(QN)
+    assert np.allclose(np.diag(operators.project(operators["Jz"])), [s.mJ for s in QN])
+
+    # products pass through states outside of the basis, e.g. J = 2
+    for name in ["HI1R", "Hc3_alt"]:
+        H = operators.project(getattr(sparse_operators, name)(operators))
+        H_ref = HMatElems(getattr(hamiltonian_terms_uncoupled, name), QN)
+        assert np.allclose(np.triu(H), np.triu(H_ref))
@@ -0,0 +1,154 @@
+import functools
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from centrex_TlF.hamiltonian import (
+    cached_result,
+    cached_terms,
+    evict_cache,
+    generate_coupled_hamiltonian_B,
+    generate_hamiltonian,
+    generate_total_reduced_hamiltonian,
+    hamiltonian_terms_uncoupled,
+    load_cached_file,
+    utils_cache,
+)
+from centrex_TlF.states import (
+    QuantumSelector,
+    generate_coupled_states_excited,
+    generate_coupled_states_excited_B,
+    generate_coupled_states_ground_X,
+)
+
+
+def test_cached_terms(tmp_path, monkeypatch):
+    monkeypatch.setenv("CENTREX_TLF_CACHE_DIR", str(tmp_path))
+    QN = generate_coupled_states_excited([7], Ps=[-1, 1])
+    H = generate_coupled_hamiltonian_B(QN)
+    assert len(list((tmp_path / "hamiltonian").glob("*.npz"))) == len(H)
+
+    def not_called(QN, nprocs):
+        raise AssertionError("terms not retrieved from the cache")
+
+    monkeypatch.setattr(
+        generate_hamiltonian, "calculate_coupled_hamiltonian_B", not_called
+    )
+    H_cached = generate_coupled_hamiltonian_B(QN)
+    for term in H:
+        assert np.array_equal(H[term], H_cached[term])
+
+    with pytest.raises(AssertionError):
+        generate_coupled_hamiltonian_B(generate_coupled_states_excited([7], Ps=[1]))
+
+
+def test_cached_terms_source(tmp_path, monkeypatch):
+    monkeypatch.setenv("CENTREX_TLF_CACHE_DIR", str(tmp_path))
+    QN = generate_coupled_states_excited([7], Ps=[-1, 1])
+    calls = []
+
+    def calculate():
+        calls.append(1)
+        return {"H": np.eye(len(QN))}
+
+    # a changed operator implementation is calculated again
+    for c in [1.0, 1.0, 2.0]:
+        source = functools.partial(hamiltonian_terms_uncoupled.Hc1, c1=c)
+        cached_terms("test", QN, ["H"], calculate, sources=(source,))
+    assert len(calls) == 2
+
+
+def test_evict_cache(tmp_path):
+    for i in range(4):
+        (tmp_path / f"{i}.npz").write_bytes(bytes(1024 ** 2))
+    evict_cache(tmp_path, max_size=2.5)
+    assert len(list(tmp_path.glob("*.npz"))) == 2
+
+
+def test_load_cached_file(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"X": [0, 1]}))
+    manifest = load_cached_file(path, json.load)
+    assert load_cached_file(path, json.load) is manifest
+
+    path.write_text(json.dumps({"X": [0, 1, 2]}))
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 10 ** 9))
+    assert load_cached_file(path, json.load) == {"X": [0, 1, 2]}
+
+
+def test_cached_result(tmp_path, monkeypatch):
+    monkeypatch.setenv("CENTREX_TLF_CACHE_DIR", str(tmp_path))
+    calls = []
+
+    def calculate():
+        calls.append(1)
+        return {"H": np.eye(2)}
+
+    result = cached_result("test", "key", calculate, to_disk=True)
+    result["H"][0, 0] = 2
+    assert cached_result("test", "key", calculate, to_disk=True)["H"][0, 0] == 1
+    assert len(calls) == 1
+
+    # retrieved from disk once dropped from memory
+    utils_cache._result_cache.clear()
+    assert cached_result("test", "key", calculate, to_disk=True)["H"][0, 0] == 1
+    assert len(calls) == 1
+    cached_result("test", "other key", calculate)
+    assert len(calls) == 2
+    assert len(list((tmp_path / "test").glob("*.pickle"))) == 1
+
+
+def test_generate_total_reduced_hamiltonian_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("CENTREX_TLF_CACHE_DIR", str(tmp_path))
+    select = (
+        'QuantumSelector(J=[0, 1], electronic="X")',
+        'QuantumSelector(J=1, F=1, F1=1 / 2, P=1, electronic="B")',
+    )
+    ground = generate_coupled_states_ground_X(eval(select[0]))
+    excited = generate_coupled_states_excited_B(eval(select[1]))
+
+    # written to disk by another process, in which the basis states are
+    # registered in a different order
+    script = "\n".join(
+        [
+            "from centrex_TlF.hamiltonian import *",
+            "from centrex_TlF.states import *",
+            f"ground = generate_coupled_states_ground_X({select[0]})",
+            f"excited = generate_coupled_states_excited_B({select[1]})",
+            "generate_total_reduced_hamiltonian(ground, excited, cache_to_disk=True)",
+        ]
+    )
+    subprocess.run(
+        [sys.executable, "-c", script],
+        check=True,
+        cwd=Path(__file__).parents[2],
+        env=os.environ,
+    )
+    directory = tmp_path / "reduced_hamiltonian"
+    assert len(list(directory.glob("*.pickle"))) == 1
+
+    utils_cache._result_cache.clear()
+    result = generate_total_reduced_hamiltonian(ground, excited, cache_to_disk=True)
+    assert len(list(directory.glob("*.pickle"))) == 1
+    expected = generate_total_reduced_hamiltonian(ground, excited, cache=False)
+    assert np.allclose(result[3], expected[3])
+    for states, states_expected in zip(result[:3], expected[:3]):
+        assert len(states) == len(states_expected)
+        for state, state_expected in zip(states, states_expected):
+            amps, cpts = zip(*state.data)
+            amps_expected, cpts_expected = zip(*state_expected.data)
+            assert np.allclose(amps, amps_expected)
+            assert cpts == cpts_expected
+
+    # calculated again when the pre-calculated data is updated
+    data = shutil.copytree(utils_cache.PRE_CALCULATED_DIR, tmp_path / "data")
+    os.utime(data / "transformation.db", ns=(0, 10 ** 9))
+    monkeypatch.setattr(utils_cache, "PRE_CALCULATED_DIR", data)
+    utils_cache._result_cache.clear()
+    generate_total_reduced_hamiltonian(ground, excited, cache_to_disk=True)
+    assert len(list(directory.glob("*.pickle"))) == 2
@@ -0,0 +1,26 @@
+import sqlite3
+from pathlib import Path
+
+import centrex_TlF
+import numpy as np
+from centrex_TlF.hamiltonian.utils_sqlite import retrieve_uncoupled_hamiltonian_X_sqlite
+from centrex_TlF.states import generate_uncoupled_states_ground
+
+db = Path(centrex_TlF.__file__).parent / "pre_calculated" / "uncoupled_hamiltonian_X.db"
+
+
+def test_retrieve_uncoupled_hamiltonian_X_sqlite():
+    QN = generate_uncoupled_states_ground([0, 1])
+    H = retrieve_uncoupled_hamiltonian_X_sqlite(QN, db)["Hff"]
+    assert np.allclose(H, H.conj().T)
+
+    con = sqlite3.connect(db)
+    for i, a in enumerate(QN):
+        for j, b in enumerate(QN):
+            values = con.execute(
+                "SELECT value_real FROM Hff WHERE J₁ = ? AND mJ₁ = ? AND m1₁ = ? "
+                "AND m2₁ = ? AND J₂ = ? AND mJ₂ = ? AND m1₂ = ? AND m2₂ = ?",
+                (a.J, a.mJ, a.m1, a.m2, b.J, b.mJ, b.m1, b.m2),
+            ).fetchall()
+            assert H[i, j] == (values[0][0] if values else 0)
+    con.close()
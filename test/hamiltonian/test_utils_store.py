@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import centrex_TlF
+import numpy as np
+from centrex_TlF.hamiltonian import (
+    convert_sqlite_to_store,
+    generate_transform_matrix,
+    pre_calculated_store,
+)
+from centrex_TlF.hamiltonian.utils_sqlite import retrieve_coupled_hamiltonian_B_sqlite
+from centrex_TlF.hamiltonian.utils_store import PRE_CALCULATED
+from centrex_TlF.states import (
+    generate_coupled_states_excited,
+    generate_coupled_states_ground,
+    generate_uncoupled_states_ground,
+)
+
+path = Path(centrex_TlF.__file__).parent / "pre_calculated"
+
+
+def test_convert_sqlite_to_store(tmp_path):
+    db = path / "coupled_hamiltonian_B.db"
+    store = convert_sqlite_to_store(
+        db, tmp_path / "B", **PRE_CALCULATED["coupled_hamiltonian_B"]
+    )
+    QN = generate_coupled_states_excited([2, 3], Ps=[-1, 1])
+    H = store.retrieve(QN)
+    H_sqlite = retrieve_coupled_hamiltonian_B_sqlite(QN, db)
+    for term in store.terms:
+        assert np.array_equal(H[term], H_sqlite[term])
+
+
+def test_pre_calculated_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("CENTREX_TLF_CACHE_DIR", str(tmp_path))
+    store = pre_calculated_store("transformation")
+    assert (tmp_path / "pre_calculated" / "transformation" / "store.json").exists()
+    QN = generate_uncoupled_states_ground([0, 1])
+    QNc = generate_coupled_states_ground([0, 1])
+    S = store.retrieve(QN, QNc)["uncoupled_to_coupled"]
+    assert np.allclose(S, generate_transform_matrix(QN, QNc))
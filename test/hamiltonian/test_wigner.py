@@ -0,0 +1,53 @@
+import itertools
+
+import numpy as np
+import pytest
+from centrex_TlF.hamiltonian import clebsch_gordan, wigner_3j, wigner_6j
+from sympy import S
+from sympy.physics.quantum.cg import CG
+from sympy.physics.wigner import wigner_3j as wigner_3j_sympy
+from sympy.physics.wigner import wigner_6j as wigner_6j_sympy
+
+
+def test_wigner_3j():
+    js = np.arange(0, 3, 0.5)
+    for j1, j2, j3 in itertools.product(js, repeat=3):
+        for m1, m2 in itertools.product(np.arange(-j1, j1 + 1), np.arange(-j2, j2 + 1)):
+            m3 = -m1 - m2
+            args = (j1, j2, j3, m1, m2, m3)
+            expected = float(wigner_3j_sympy(*[S(2 * a) / 2 for a in args]))
+            assert wigner_3j(*args) == pytest.approx(expected, abs=1e-14)
+
+
+def test_wigner_3j_vectorized():
+    m1 = np.arange(-2, 3)
+    values = wigner_3j(2, 1, 2, -m1, 0, m1)
+    expected = [float(wigner_3j_sympy(2, 1, 2, -int(m), 0, int(m))) for m in m1]
+    assert np.allclose(values, expected, atol=1e-14)
+
+
+def test_wigner_6j():
+    js = np.arange(0, 2.5, 0.5)
+    for args in itertools.product(js, repeat=6):
+        try:
+            expected = float(wigner_6j_sympy(*[S(2 * a) / 2 for a in args]))
+        except ValueError:
+            with pytest.raises(ValueError):
+                wigner_6j(*args)
+            continue
+        assert wigner_6j(*args) == pytest.approx(expected, abs=1e-14)
+
+
+def test_clebsch_gordan():
+    j1, j2 = 3 / 2, 1
+    for j3 in [1 / 2, 3 / 2, 5 / 2]:
+        for m1, m2 in itertools.product(np.arange(-j1, j1 + 1), np.arange(-j2, j2 + 1)):
+            m3 = m1 + m2
+            args = (j1, m1, j2, m2, j3, m3)
+            expected = float(CG(*[S(2 * a) / 2 for a in args]).doit())
+            assert clebsch_gordan(*args) == pytest.approx(expected, abs=1e-14)
+
+
+def test_wigner_3j_invalid():
+    with pytest.raises(ValueError):
+        wigner_3j(0.3, 1, 1, 0, 0, 0)
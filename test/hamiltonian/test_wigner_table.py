@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+from centrex_TlF.hamiltonian import (
+    CoefficientTable,
+    build_coefficient_tables,
+    wigner_3j,
+    wigner_6j,
+)
+from centrex_TlF.hamiltonian.wigner_table import (
+    _RECORD,
+    _key,
+    wigner_3j_table,
+    wigner_6j_table,
+)
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("CENTREX_TLF_CACHE_DIR", str(tmp_path))
+    for table in [wigner_3j_table, wigner_6j_table]:
+        table.reload()
+    yield tmp_path / "wigner"
+    for table in [wigner_3j_table, wigner_6j_table]:
+        table.reload()
+
+
+def test_build_coefficient_tables(cache_dir):
+    build_coefficient_tables(J_max=2)
+    assert (cache_dir / "wigner_3j_keys.npy").exists()
+    assert wigner_3j_table(2, 1, 1.5, -1, 0.5, 0.5) == pytest.approx(
+        wigner_3j(2, 1, 1.5, -1, 0.5, 0.5), abs=1e-15
+    )
+    assert wigner_6j_table(1.5, 1, 0.5, 1, 0.5, 1) == pytest.approx(
+        wigner_6j(1.5, 1, 0.5, 1, 0.5, 1), abs=1e-15
+    )
+    wigner_3j_table.flush()
+    assert not list(cache_dir.glob("wigner_3j_local*.bin"))
+
+
+def test_coefficient_table_local_cache(cache_dir):
+    table = CoefficientTable("test", wigner_3j, flush_size=1)
+    value = table(3, 1, 3, -2, 0, 2)
+    assert (cache_dir / f"test_local.{os.getpid()}.bin").exists()
+
+    def not_called(*args):
+        raise AssertionError("coefficient not retrieved from local cache")
+
+    table = CoefficientTable("test", not_called)
+    assert table(3, 1, 3, -2, 0, 2) == value
+
+
+def test_coefficient_table_local_files(cache_dir):
+    # files of two other processes, one ending in a partially written record
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    records = np.array([(_key((1, 1)), 0.25), (_key((2, 2)), 0.5)], dtype=_RECORD)
+    (cache_dir / "test_local.1.bin").write_bytes(records[:1].tobytes())
+    (cache_dir / "test_local.2.bin").write_bytes(records[1:].tobytes() + b"\0" * 5)
+
+    def not_called(*args):
+        raise AssertionError("coefficient not retrieved from local cache")
+
+    table = CoefficientTable("test", not_called)
+    assert table(1, 1) == 0.25
+    assert table(2, 2) == 0.5
+
+
+def test_coefficient_table_invalid(cache_dir):
+    with pytest.raises(ValueError):
+        wigner_6j_table(0.5, 0.5, 0.5, 0.5, 0.5, 0.5)
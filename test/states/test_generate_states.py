@@ -0,0 +1,43 @@
+import numpy as np
+from centrex_TlF.states import (
+    Basis,
+    CoupledBasisState,
+    QuantumSelector,
+    generate_coupled_quantum_numbers,
+    generate_coupled_states_excited_B,
+    generate_coupled_states_ground,
+    parity_X,
+)
+
+
+def test_generate_coupled_states_ground():
+    QN = [
+        CoupledBasisState(
+            F, mF, F1, J, 1 / 2, 1 / 2, electronic_state="X", P=parity_X(J), Omega=0
+        )
+        for J in [0, 1, 2]
+        for F1 in np.arange(np.abs(J - 1 / 2), J + 1)
+        for F in np.arange(np.abs(F1 - 1 / 2), F1 + 1)
+        for mF in np.arange(-F, F + 1)
+    ]
+    assert list(generate_coupled_states_ground([0, 1, 2])) == QN
+
+
+def test_generate_coupled_states_excited_B_selector():
+    QN = generate_coupled_states_excited_B(
+        [QuantumSelector(J=1, F1=1.5, F=[1, 2], P=-1), QuantumSelector(J=1, F=1, P=-1)]
+    )
+    assert len(QN) == 11
+    assert all(s.F in [1, 2] and s.F1 in [0.5, 1.5] and s.P == -1 for s in QN)
+    assert [s.F1 for s in QN[-3:]] == [0.5, 0.5, 0.5]
+
+
+def test_basis_from_quantum_numbers():
+    table = generate_coupled_quantum_numbers([0, 1, 2], "X", parity_X, 0)
+    QN = Basis.from_quantum_numbers(table)
+    assert all(state is None for state in QN._states)
+    assert QN[5] == generate_coupled_states_ground([0, 1, 2])[5]
+    assert sum(state is not None for state in QN._states) == 1
+    assert QN.index(QN[7]) == 7
+    assert list(QN.quantum_numbers["F"]) == list(table["F"])
+    assert list(QN[table["J"] == 1]) == list(generate_coupled_states_ground([1]))
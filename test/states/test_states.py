@@ -0,0 +1,98 @@
+import copy
+import pickle
+
+import numpy as np
+from centrex_TlF.states import (
+    Basis,
+    CoupledBasisState,
+    State,
+    generate_uncoupled_states_ground,
+)
+
+
+def test_state_addition():
+    QN = generate_uncoupled_states_ground([0, 1])
+    a = 1 * QN[0] + 2 * QN[1]
+    b = 3 * QN[1] - 1 * QN[0] + 1j * QN[2]
+    c = a + b
+    assert len(c.data) == 2
+    assert c[0] == (1j, QN[2])
+    assert c[1] == (5, QN[1])
+
+
+def test_state_inner_product():
+    QN = generate_uncoupled_states_ground([0, 1])
+    a = 1j * QN[0] + 2 * QN[1]
+    b = 3 * QN[1] + 1 * QN[0]
+    assert a @ b == -1j + 6
+    assert a @ a == 5
+    assert (1 * QN[0]) @ (1 * QN[3]) == 0
+
+
+def test_state_inner_product_mixed_basis():
+    coupled = CoupledBasisState(
+        F=1,
+        mF=0,
+        F1=1 / 2,
+        J=0,
+        I1=1 / 2,
+        I2=1 / 2,
+        Omega=0,
+        P=1,
+        electronic_state="X",
+    )
+    uncoupled = coupled.transform_to_uncoupled()
+    assert np.isclose((1 * coupled) @ uncoupled, 1)
+    assert np.isclose(uncoupled @ (1 * coupled), 1)
+
+
+def test_state_duplicate_components():
+    QN = generate_uncoupled_states_ground([0])
+    try:
+        State([(1, QN[0]), (2, QN[0])])
+    except AssertionError:
+        pass
+    else:
+        raise AssertionError("duplicate components not detected")
+
+
+def test_state_normalize_and_vector():
+    QN = generate_uncoupled_states_ground([0, 1])
+    state = (3 * QN[1] + 4 * QN[5]).normalize()
+    vector = state.state_vector(QN)
+    assert np.allclose(vector[[1, 5]], [0.6, 0.8])
+    assert np.isclose(np.linalg.norm(vector), 1)
+    assert state.find_largest_component() == QN[5]
+
+
+def test_state_pickle():
+    QN = generate_uncoupled_states_ground([0])
+    state = 1 * QN[0] - 0.5j * QN[1]
+    restored = pickle.loads(pickle.dumps(state))
+    assert restored.data == state.data
+
+
+def test_basis_index():
+    QN = generate_uncoupled_states_ground([0, 1])
+    basis = Basis(QN)
+    assert basis.index(QN[3]) == 3
+    assert basis.index(copy.copy(QN[5])) == 5
+    assert np.all(basis.indices_of(QN[::-1]) == np.arange(len(QN))[::-1])
+    states = [1 * qn for qn in QN]
+    basis = Basis(states)
+    assert basis.index(states[2]) == 2
+    assert 1 * QN[2] not in basis
+
+
+def test_basis_state_hash_and_immutability():
+    QN = generate_uncoupled_states_ground([0, 1])
+    assert len(set(QN) | set(copy.copy(qn) for qn in QN)) == len(QN)
+    assert hash(QN[1]) == hash(pickle.loads(pickle.dumps(QN[1])))
+    try:
+        QN[0].J = 2
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("basis states should be immutable")
+    state = QN[0].replace(J=None)
+    assert state.J is None and QN[0].J == 0
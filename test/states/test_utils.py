@@ -0,0 +1,60 @@
+import numpy as np
+from centrex_TlF.states import (
+    Basis,
+    QuantumSelector,
+    find_exact_states,
+    find_states_idxs_from_states,
+    generate_coupled_states_excited,
+    generate_coupled_states_ground,
+    quantum_number_table,
+    states_to_matrix,
+)
+from centrex_TlF.states.utils import matrix_to_states
+
+
+def test_find_states_idxs_from_states():
+    QN = generate_coupled_states_ground([0, 1])
+    H = np.diag(np.arange(len(QN), dtype=float))
+    reference_states = [1 * QN[3], 1 * QN[0], 0.6 * QN[5] + 0.8 * QN[2]]
+    indices = find_states_idxs_from_states(H, reference_states, QN)
+    assert list(indices) == [3, 0, 2]
+    assert find_exact_states(reference_states, H, QN) == [QN[3], QN[0], QN[2]]
+
+
+def test_find_states_idxs_from_states_one_to_one():
+    QN = generate_coupled_states_ground([0, 1])
+    H = np.diag(np.arange(len(QN), dtype=float))
+    reference_states = [0.6 * QN[5] + 0.8 * QN[2], 1 * QN[2]]
+    assert list(find_states_idxs_from_states(H, reference_states, QN)) == [2, 2]
+    indices = find_states_idxs_from_states(H, reference_states, QN, one_to_one=True)
+    assert list(indices) == [5, 2]
+
+
+def test_quantum_selector_parity():
+    QN = generate_coupled_states_excited([1, 2], Ps=[-1, 1])
+    indices = QuantumSelector(J=1, P=-1, electronic="B").get_indices(QN)
+    assert len(indices) > 0
+    assert all(QN[idx].J == 1 and QN[idx].P == -1 for idx in indices)
+    assert len(QuantumSelector(Ω=0, electronic="B").get_indices(QN)) == 0
+    assert len(QuantumSelector(Ω=1, electronic="B").get_indices(QN)) == len(QN)
+
+
+def test_quantum_number_table():
+    QN = generate_coupled_states_ground([0, 1])
+    states = [0.6 * QN[1] + 0.8 * QN[4], 1 * QN[0]]
+    table = quantum_number_table(states)
+    assert table["mF"][0] == QN[4].mF
+    assert table["J"][1] == 0
+    assert table["electronic"][1] == "X"
+    assert np.array_equal(Basis(QN).quantum_numbers, quantum_number_table(QN))
+
+
+def test_states_to_matrix():
+    QN = generate_coupled_states_ground([0, 1])
+    rng = np.random.default_rng(0)
+    V = np.linalg.qr(rng.normal(size=(len(QN), len(QN))))[0]
+    states = matrix_to_states(V, QN, tol=1e-12)
+    matrix = states_to_matrix(states, QN)
+    assert np.allclose(np.abs(matrix), np.abs(V))
+    assert np.allclose(matrix[:, 2], states[2].state_vector(QN))
+    assert np.allclose(states_to_matrix(states, QN, sparse=True).toarray(), matrix)